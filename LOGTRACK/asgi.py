@@ -2,6 +2,8 @@
 ASGI config for LOGTRACK project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The dashboards and review endpoints are async views, so serve this rather than
+wsgi.py, e.g. ``gunicorn LOGTRACK.asgi:application -k uvicorn_worker.UvicornWorker``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +16,5 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LOGTRACK.settings")
 
 application = get_asgi_application()
+
+app = application
@@ -1,10 +1,27 @@
+import csv
+import time
+from datetime import timedelta
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Submission
+from .models import ArchivedStats, CustomUser, DepartmentDay, SiwesSession, StudentStats, Submission, SupervisorDay
 from django.contrib import messages
 from django.db import models
 from django import forms
-from .forms_admin import CustomUserForm  # Import the form from forms_admin.py
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .analytics import (
+    GAP_WORKING_DAYS, chart_points, department_report, format_duration, format_median_latency, rolled_up_through,
+    students_with_gaps, supervisor_report,
+)
+from .forms_admin import CustomUserForm, RosterImportForm  # Import the form from forms_admin.py
+from .mapping import assign_students, map_students
+from .roster import RosterError, load_roster, unique_usernames
+from .search import search_submissions
 
 # @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -13,7 +30,8 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('user_type', 'department', 'is_staff', 'is_active')
     search_fields = ('email', 'matric_number', 'lecturer_id', 'first_name', 'last_name', 'department')
     ordering = ('email',)
-    actions = ['map_students_to_supervisors']
+    list_select_related = ('supervisor',)
+    actions = ['map_students_to_supervisors', 'preview_student_mapping']
     
     base_fieldsets = (
         (None, {'fields': ('email', 'password', 'user_type', 'title', 'department', 'matric_number', 'lecturer_id')}),
@@ -91,15 +109,7 @@ class CustomUserAdmin(UserAdmin):
     def save_model(self, request, obj, form, change):
         # Auto-generate a unique username if not provided
         if not obj.username:
-            base_username = obj.email.split('@')[0]
-            unique_username = base_username
-            counter = 1
-            while CustomUser.objects.filter(username=unique_username).exists():
-                unique_username = f"{base_username}{counter}"
-                counter += 1
-            obj.username = unique_username
-        
-        super().save_model(request, obj, form, change)
+            obj.username = unique_usernames([obj.email])[obj.email]
         
         # Save supervisor for students only if the field exists in cleaned_data
         if (obj.user_type == 'student' and 
@@ -107,67 +117,233 @@ class CustomUserAdmin(UserAdmin):
             'supervisor' in form.cleaned_data and 
             form.cleaned_data['supervisor'] is not None):
             obj.supervisor = form.cleaned_data['supervisor']
-            obj.save()
+
+        super().save_model(request, obj, form, change)
             
         # Save assigned students for supervisors only if the field exists in cleaned_data
         if (obj.user_type == 'supervisor' and 
             hasattr(form, 'cleaned_data') and 
             'students' in form.cleaned_data):
-            students = form.cleaned_data['students']
-            # Set supervisor for selected students
-            for student in students:
-                student.supervisor = obj
-                student.save()
-            # Unassign students not selected
-            CustomUser.objects.filter(user_type='student', supervisor=obj).exclude(id__in=[s.id for s in students]).update(supervisor=None)
+            assign_students(obj, form.cleaned_data['students'])
     
     def map_students_to_supervisors(self, request, queryset):
         """Map students to supervisors based on lecturer_id"""
-        total_mapped = 0
-        for supervisor in queryset.filter(user_type='supervisor'):
-            if not supervisor.lecturer_id:
-                continue
-                
-            # Find students whose matric number starts with lecturer_id
-            students = CustomUser.objects.filter(
-                user_type='student', 
-                matric_number__startswith=supervisor.lecturer_id,
-                supervisor__isnull=True  # Only unassigned students
-            )
-            
-            # Assign supervisor to these students
-            count = students.count()
-            if count > 0:
-                students.update(supervisor=supervisor)
-                total_mapped += count
-                
-                self.message_user(
-                    request, 
-                    f"Assigned {count} students to {supervisor.get_full_name() or supervisor.username}",
-                    messages.SUCCESS
-                )
-        
-        if total_mapped == 0:
+        plan = map_students(queryset)
+        self.report_mapping(request, plan)
+        if plan.assignments:
             self.message_user(
                 request,
-                "No new student assignments were made. Check lecturer IDs and student matric numbers.",
-                messages.WARNING
+                f"Successfully mapped {len(plan.assignments)} students to supervisors based on lecturer ID.",
+                messages.SUCCESS
             )
         else:
             self.message_user(
                 request,
-                f"Successfully mapped {total_mapped} students to supervisors based on lecturer ID.",
-                messages.SUCCESS
+                "No new student assignments were made. Check lecturer IDs and student matric numbers.",
+                messages.WARNING
             )
     
     map_students_to_supervisors.short_description = "Map selected supervisors to students by lecturer ID"
 
+    def get_urls(self):
+        urls = [
+            path('import-roster/', self.admin_site.admin_view(self.import_roster_view), name='SIWES_customuser_import_roster'),
+        ]
+        return urls + super().get_urls()
+
+    def import_roster_view(self, request):
+        """Create students and supervisors in bulk from an uploaded CSV/XLSX roster"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        errors = []
+        form = RosterImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            roster = form.cleaned_data['roster']
+            try:
+                # Hashed in this process: a web request shouldn't spawn a pool of workers, each
+                # setting Django up; manage.py import_roster uses every CPU for large rosters
+                result = load_roster(roster, roster.name, workers=1, dry_run=form.cleaned_data['dry_run'])
+            except RosterError as exc:
+                form.add_error('roster', str(exc))
+            else:
+                errors = result.errors
+                if form.cleaned_data['dry_run'] and not errors:
+                    self.message_user(
+                        request,
+                        f"Dry run: {result.students} students and {result.supervisors} supervisors would be imported.",
+                        messages.INFO
+                    )
+                elif not errors:
+                    self.message_user(
+                        request,
+                        f"Imported {result.students} students and {result.supervisors} supervisors.",
+                        messages.SUCCESS
+                    )
+                    if form.cleaned_data['map_students']:
+                        self.message_user(request, map_students().summary(), messages.INFO)
+                    if result.links:
+                        return self.set_password_links(request, result.links)
+                    return redirect('admin:SIWES_customuser_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import roster',
+            'form': form,
+            'errors': errors,
+        }
+        return TemplateResponse(request, 'admin/SIWES/customuser/import_roster.html', context)
+
+    def set_password_links(self, request, links):
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="set-password-links.csv"'
+        writer = csv.writer(response)
+        writer.writerow(['email', 'set_password_url'])
+        writer.writerows((email, request.build_absolute_uri(path)) for email, path in links)
+        return response
+
+    def preview_student_mapping(self, request, queryset):
+        """Report what map_students_to_supervisors would do, without changing anything"""
+        plan = map_students(queryset, dry_run=True)
+        self.message_user(request, f"Dry run: {plan.summary()}", messages.INFO)
+        self.report_mapping(request, plan)
+
+    preview_student_mapping.short_description = "Preview mapping of selected supervisors (dry run)"
+
+    def report_mapping(self, request, plan, limit=10):
+        for supervisor_id, count in plan.per_supervisor.most_common(limit):
+            self.message_user(request, f"{count} students for {plan.supervisor_names[supervisor_id]}", messages.INFO)
+        for conflict in plan.conflicts[:limit]:
+            self.message_user(request, conflict.message, messages.WARNING)
+        if len(plan.conflicts) > limit:
+            self.message_user(
+                request,
+                f"{len(plan.conflicts) - limit} more conflicts; run manage.py map_students --dry-run for all of them.",
+                messages.WARNING
+            )
+
 # Remove this line since you're using the @admin.register decorator above
 admin.site.register(CustomUser, CustomUserAdmin)
 
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
-    list_display = ('student', 'matric_number', 'date', 'approved', 'reviewed_by')
+    list_display = ('student', 'matric_number', 'date', 'approved', 'reviewed_by', 'reviewed_at')
     list_filter = ('approved', 'date')
     search_fields = ('student__email', 'matric_number', 'reviewed_by__email')
-    date_hierarchy = 'date'
\ No newline at end of file
+    list_select_related = ('student', 'reviewed_by')
+
+    def save_model(self, request, obj, form, change):
+        # Submission.save stamps reviewed_at when approved is ticked; the reviewer is whoever ticked it
+        if obj.approved and obj.reviewed_by_id is None and 'approved' in form.changed_data:
+            obj.reviewed_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            # Also match the log content through the full-text index instead of icontains scans
+            matches = search_submissions(Submission.objects.all(), search_term).values('pk')
+            results = results | queryset.filter(pk__in=matches)
+        return results, may_have_duplicates
+    date_hierarchy = 'date'
+
+@admin.register(StudentStats)
+class StudentStatsAdmin(admin.ModelAdmin):
+    list_display = ('student', 'total', 'approved', 'pending', 'last_submission_at', 'days_logged', 'days_missed')
+    search_fields = ('student__email', 'student__matric_number')
+    list_select_related = ('student',)
+    readonly_fields = ('student', 'total', 'approved', 'first_submission_at', 'last_submission_at', 'days_logged')
+
+@admin.register(ArchivedStats)
+class ArchivedStatsAdmin(admin.ModelAdmin):
+    list_display = ('session', 'student', 'total', 'approved', 'days_logged')
+    list_filter = ('session',)
+    search_fields = ('student__email', 'student__matric_number')
+    list_select_related = ('session', 'student')
+    readonly_fields = ('session', 'student', 'total', 'approved', 'first_submission_at', 'last_submission_at', 'days_logged')
+
+@admin.register(SiwesSession)
+class SiwesSessionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'starts_on', 'ends_on', 'closed', 'archived_at', 'archived_count')
+    list_filter = ('closed',)
+
+    def get_prepopulated_fields(self, request, obj=None):
+        return {'slug': ('name',)} if obj is None else {}
+
+    def get_readonly_fields(self, request, obj=None):
+        # The dates are the bounds of the session's partition, and an archive is final
+        if obj is None:
+            return ('archived_at', 'archived_count')
+        if obj.archived:
+            return ('name', 'slug', 'starts_on', 'ends_on', 'closed', 'archived_at', 'archived_count')
+        return ('slug', 'starts_on', 'ends_on', 'archived_at', 'archived_count')
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Rollups are written by manage.py rollup_analytics only."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DepartmentDay)
+class DepartmentDayAdmin(RollupAdmin):
+    list_display = ('day', 'department', 'students', 'students_logged', 'submissions')
+    list_filter = ('department',)
+    date_hierarchy = 'day'
+    # Days shown on the analytics page, picked with ?days=
+    analytics_ranges = (30, 90, 365)
+
+    def get_urls(self):
+        urls = [
+            path('analytics/', self.admin_site.admin_view(self.analytics_view), name='SIWES_analytics'),
+        ]
+        return urls + super().get_urls()
+
+    def analytics_view(self, request):
+        """Compliance charts and tables, read from the rollups and StudentStats only"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        started = time.perf_counter()
+        days = request.GET.get('days', '')
+        days = int(days) if days.isdigit() and int(days) in self.analytics_ranges else self.analytics_ranges[0]
+        # '*' for every department; '' is the students without one
+        department = request.GET.get('department', '*')
+        selected = None if department == '*' else department
+        end = rolled_up_through() or timezone.localdate() - timedelta(days=1)
+        start = end - timedelta(days=days - 1)
+
+        departments = department_report(start, end, selected)
+        for entry in departments:
+            entry['points'] = chart_points([row.rate for row in entry['days']], 600, 80, top=1)
+        supervisors = supervisor_report(start, end, selected)
+        for entry in supervisors:
+            entry['median_display'] = format_median_latency(entry['median_latency'])
+            entry['mean_display'] = format_duration(entry['mean_latency'])
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Analytics',
+            'start': start,
+            'end': end,
+            'rolled_up_through': rolled_up_through(),
+            'days': days,
+            'ranges': self.analytics_ranges,
+            'department': department,
+            'department_choices': DepartmentDay.objects.values_list('department', flat=True).distinct().order_by('department'),
+            'departments': departments,
+            'supervisors': supervisors,
+            'gaps': students_with_gaps(selected),
+            'gap_days': GAP_WORKING_DAYS,
+        }
+        context['elapsed_ms'] = (time.perf_counter() - started) * 1000
+        return TemplateResponse(request, 'admin/SIWES/analytics.html', context)
+
+
+@admin.register(SupervisorDay)
+class SupervisorDayAdmin(RollupAdmin):
+    list_display = ('day', 'supervisor', 'submissions', 'reviewed', 'pending')
+    list_select_related = ('supervisor',)
+    date_hierarchy = 'day'
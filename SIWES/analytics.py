@@ -0,0 +1,286 @@
+"""
+Daily rollups for compliance reporting, and the reports read from them.
+
+``rollup_days`` adds a DepartmentDay row per department and a SupervisorDay row per
+supervisor for every closed day (up to yesterday) after the last one rolled up. It
+reads only the logs and approvals of those new days, with a few grouped queries,
+plus one query for the backlog they start from. Rows are never revisited: a day's
+numbers are what was known when it was rolled up, so logs deleted or archived later
+still count in history.
+
+Review latency is the time from a log's creation to its approval. A median can't be
+combined from daily medians, so each SupervisorDay keeps a histogram of its
+approvals over LATENCY_BUCKETS, and the median over any range is reported as the
+bucket of the merged histograms it falls in.
+
+The reports only read the rollup tables and StudentStats, so they take the same few
+milliseconds however many logs there are.
+"""
+import math
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CustomUser, DepartmentDay, StudentStats, Submission, SupervisorDay
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+# Upper bounds, in seconds, of the review latency buckets; a last, open bucket holds the rest
+LATENCY_BUCKETS = (HOUR, 4 * HOUR, 12 * HOUR, DAY, 2 * DAY, 3 * DAY, 7 * DAY, 14 * DAY)
+# A student is listed with a gap once their last log is this many working days old
+GAP_WORKING_DAYS = 3
+GAP_LIMIT = 50
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _in_department(lookup, department):
+    # Rollups file students without a department under '', whether theirs is blank or NULL
+    if department:
+        return Q(**{lookup: department})
+    return Q(**{lookup: ''}) | Q(**{f'{lookup}__isnull': True})
+
+
+def latency_bucket(seconds):
+    return bisect_left(LATENCY_BUCKETS, seconds)
+
+
+def _rollup_start():
+    last = DepartmentDay.objects.aggregate(last=Max('day'))['last']
+    if last is not None:
+        return last + timedelta(days=1)
+    first = Submission.objects.aggregate(first=Min('date'))['first']
+    return timezone.localdate(first) if first else None
+
+
+def rollup_days(until=None):
+    """
+    Roll up every day after the last one rolled up, through ``until`` (yesterday by
+    default, as today isn't over). Returns the number of days added.
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    start = _rollup_start()
+    if start is None or start > until:
+        return 0
+    days = [start + timedelta(days=offset) for offset in range((until - start).days + 1)]
+    low, high = _midnight(start), _midnight(until + timedelta(days=1))
+    logs = Submission.objects.filter(date__gte=low, date__lt=high).annotate(day=TruncDate('date'))
+
+    by_department = {
+        (day, department or ''): (submissions, students)
+        for day, department, submissions, students in logs.values_list('day', 'student__department')
+        .annotate(submissions=Count('id'), students=Count('student_id', distinct=True))
+        .values_list('day', 'student__department', 'submissions', 'students')
+    }
+    enrolled = Counter()
+    for department, count in (
+        CustomUser.objects.filter(user_type='student').values_list('department').annotate(count=Count('id'))
+        .values_list('department', 'count')
+    ):
+        enrolled[department or ''] += count
+    departments = set(enrolled) | {department for _, department in by_department}
+
+    created = {
+        (day, supervisor_id): count
+        for day, supervisor_id, count in logs.filter(student__supervisor__isnull=False)
+        .values_list('day', 'student__supervisor').annotate(count=Count('id'))
+        .values_list('day', 'student__supervisor', 'count')
+    }
+    reviewed = defaultdict(Counter)
+    latency_seconds = Counter()
+    histograms = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    approvals = Submission.objects.filter(
+        reviewed_at__gte=low, reviewed_at__lt=high, approved=True, student__supervisor__isnull=False,
+    ).values_list('student__supervisor', 'date', 'reviewed_at')
+    for supervisor_id, date, reviewed_at in approvals.iterator():
+        day = timezone.localdate(reviewed_at)
+        seconds = max(0, int((reviewed_at - date).total_seconds()))
+        reviewed[day][supervisor_id] += 1
+        latency_seconds[day, supervisor_id] += seconds
+        histograms[day, supervisor_id][latency_bucket(seconds)] += 1
+    # Logs still pending when the first new day began; the backlog is carried forward from there
+    pending = Counter(dict(
+        Submission.objects.filter(date__lt=low, student__supervisor__isnull=False)
+        .filter(Q(approved=False) | Q(reviewed_at__gte=low))
+        .values_list('student__supervisor').annotate(count=Count('id')).values_list('student__supervisor', 'count')
+    ))
+    supervisors = set(
+        CustomUser.objects.filter(user_type='supervisor', students__isnull=False).values_list('pk', flat=True)
+    ) | set(pending) | {supervisor_id for _, supervisor_id in created}
+
+    department_rows, supervisor_rows = [], []
+    for day in days:
+        for department in sorted(departments):
+            submissions, students_logged = by_department.get((day, department), (0, 0))
+            department_rows.append(DepartmentDay(
+                day=day, department=department, students=enrolled[department],
+                students_logged=students_logged, submissions=submissions,
+            ))
+        for supervisor_id in sorted(supervisors):
+            pending[supervisor_id] = max(
+                0, pending[supervisor_id] + created.get((day, supervisor_id), 0) - reviewed[day][supervisor_id],
+            )
+            supervisor_rows.append(SupervisorDay(
+                day=day, supervisor_id=supervisor_id, submissions=created.get((day, supervisor_id), 0),
+                reviewed=reviewed[day][supervisor_id], pending=pending[supervisor_id],
+                latency_seconds=latency_seconds[day, supervisor_id],
+                latency_histogram=histograms[day, supervisor_id] if (day, supervisor_id) in histograms else [],
+            ))
+    with transaction.atomic():
+        DepartmentDay.objects.bulk_create(department_rows, batch_size=1000)
+        SupervisorDay.objects.bulk_create(supervisor_rows, batch_size=1000)
+    return len(days)
+
+
+def clear_rollups(since=None):
+    """Delete the rollups from ``since`` on (all of them if None), so rollup_days recomputes them."""
+    department_days, supervisor_days = DepartmentDay.objects.all(), SupervisorDay.objects.all()
+    if since is not None:
+        department_days, supervisor_days = department_days.filter(day__gte=since), supervisor_days.filter(day__gte=since)
+    with transaction.atomic():
+        department_days.delete()
+        supervisor_days.delete()
+
+
+def histogram_median(histogram):
+    """
+    The upper bound, in seconds, of the latency bucket holding the median of a
+    latency histogram: the median is at most this. math.inf if it falls in the
+    open last bucket, None if the histogram is empty.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if seen >= total / 2:
+            return LATENCY_BUCKETS[bucket] if bucket < len(LATENCY_BUCKETS) else math.inf
+    return None
+
+
+def merge_histograms(histograms):
+    merged = [0] * (len(LATENCY_BUCKETS) + 1)
+    for histogram in histograms:
+        for bucket, count in enumerate(histogram):
+            merged[bucket] += count
+    return merged
+
+
+def department_report(start, end, department=None):
+    """
+    Per department over [start, end]: daily rows for the chart, and totals, with the
+    average share of students logging on working days.
+    """
+    rows = DepartmentDay.objects.filter(day__gte=start, day__lte=end).order_by('department', 'day')
+    if department is not None:
+        rows = rows.filter(department=department)
+    report = {}
+    for row in rows:
+        entry = report.setdefault(row.department, {
+            'department': row.department, 'days': [], 'submissions': 0, 'students': row.students,
+            'working_days': 0, 'rate_total': 0.0,
+        })
+        entry['days'].append(row)
+        entry['submissions'] += row.submissions
+        entry['students'] = row.students
+        if row.day.weekday() < 5:
+            entry['working_days'] += 1
+            entry['rate_total'] += row.rate
+    for entry in report.values():
+        entry['rate'] = entry['rate_total'] / entry['working_days'] if entry['working_days'] else 0
+    return sorted(report.values(), key=lambda entry: entry['department'])
+
+
+def supervisor_report(start, end, department=None):
+    """Per supervisor over [start, end]: logs received, approvals, median and mean latency, backlog at the end."""
+    rows = SupervisorDay.objects.filter(day__gte=start, day__lte=end)
+    if department is not None:
+        rows = rows.filter(_in_department('supervisor__department', department))
+    totals = {
+        row['supervisor']: row for row in rows.values('supervisor').annotate(
+            submissions_total=Sum('submissions'), reviewed_total=Sum('reviewed'), latency_total=Sum('latency_seconds'),
+            last_day=Max('day'),
+        )
+    }
+    histograms = defaultdict(list)
+    backlog = {}
+    for supervisor_id, day, pending, histogram in rows.values_list('supervisor', 'day', 'pending', 'latency_histogram'):
+        if histogram:
+            histograms[supervisor_id].append(histogram)
+        if day == totals[supervisor_id]['last_day']:
+            backlog[supervisor_id] = pending
+    supervisors = CustomUser.objects.filter(pk__in=totals).only('title', 'first_name', 'last_name', 'email', 'department')
+    report = []
+    for supervisor in supervisors:
+        total = totals[supervisor.pk]
+        report.append({
+            'supervisor': supervisor,
+            'submissions': total['submissions_total'],
+            'reviewed': total['reviewed_total'],
+            'median_latency': histogram_median(merge_histograms(histograms[supervisor.pk])),
+            'mean_latency': total['latency_total'] / total['reviewed_total'] if total['reviewed_total'] else None,
+            'pending': backlog.get(supervisor.pk, 0),
+        })
+    report.sort(key=lambda entry: (entry['median_latency'] is None, -(entry['median_latency'] or 0)))
+    return report
+
+
+def students_with_gaps(department=None, working_days=GAP_WORKING_DAYS, limit=GAP_LIMIT):
+    """
+    Students whose last log is ``working_days`` or more working days old (or who never
+    logged), longest gap first, read from StudentStats.
+    """
+    cutoff = timezone.localdate()
+    remaining = working_days
+    while remaining:
+        cutoff -= timedelta(days=1)
+        if cutoff.weekday() < 5:
+            remaining -= 1
+    stats = StudentStats.objects.filter(
+        Q(last_submission_at__lt=_midnight(cutoff)) | Q(last_submission_at__isnull=True),
+        student__is_active=True,
+    ).select_related('student').only(
+        'total', 'approved', 'first_submission_at', 'last_submission_at', 'days_logged',
+        'student__first_name', 'student__last_name', 'student__email', 'student__matric_number', 'student__department',
+    ).order_by(F('last_submission_at').asc(nulls_first=True))
+    if department is not None:
+        stats = stats.filter(_in_department('student__department', department))
+    return list(stats[:limit])
+
+
+def rolled_up_through():
+    return DepartmentDay.objects.aggregate(last=Max('day'))['last']
+
+
+def chart_points(values, width, height, top=None):
+    """SVG polyline points plotting ``values`` left to right, scaled to ``top`` (their max by default)."""
+    top = top or max(values, default=0) or 1
+    step = width / max(len(values) - 1, 1)
+    return ' '.join(f'{index * step:.1f},{height - value / top * height:.1f}' for index, value in enumerate(values))
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < HOUR:
+        return f'{seconds / 60:.0f} min'
+    if seconds < 2 * DAY:
+        return f'{seconds / HOUR:.1f} h'
+    return f'{seconds / DAY:.1f} d'
+
+
+def format_median_latency(seconds):
+    """A histogram_median for display."""
+    if seconds is None:
+        return '-'
+    if seconds == math.inf:
+        return f'over {format_duration(LATENCY_BUCKETS[-1])}'
+    return f'up to {format_duration(seconds)}'
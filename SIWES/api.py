@@ -0,0 +1,143 @@
+"""
+Read-only JSON API over submissions, for the mobile frontend and for clients that poll.
+
+Responses carry an ETag built from a watermark of the filtered submissions (their
+newest ``updated_at`` and their count), which one aggregate query yields. A client
+that sends it back with If-None-Match gets a 304 from that query alone, without the
+rows being read or serialised. There is no Last-Modified: HTTP dates have whole
+seconds, so If-Modified-Since would miss an edit made in the second of the last fetch.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.urls import reverse
+
+from .images import previewable
+from .search import search_submissions
+
+API_VERSION = 1
+# Query parameters that select submissions; the rest (e.g. cursor) only pick a page
+FILTER_PARAMS = ('student', 'start_date', 'end_date', 'filter_date', 'status', 'q')
+# Columns serialised for each submission
+SUBMISSION_FIELDS = ('id', 'student_id', 'matric_number', 'date', 'updated_at', 'overview', 'text', 'file', 'approved', 'remark')
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_submissions(submissions, params):
+    """
+    Apply the dashboard filters in ``params`` to ``submissions``: ``student`` (matric
+    number), ``start_date`` and ``end_date`` (inclusive), ``filter_date`` (one day),
+    ``status`` (approved or pending) and ``q`` (full-text search). Malformed dates are ignored.
+    """
+    if params.get('student'):
+        submissions = submissions.filter(matric_number=params['student'])
+    start = _parse_date(params.get('start_date'))
+    if start:
+        submissions = submissions.filter(date__gte=start)
+    end = _parse_date(params.get('end_date'))
+    if end:
+        submissions = submissions.filter(date__lt=end + timedelta(days=1))
+    day = _parse_date(params.get('filter_date'))
+    if day:
+        submissions = submissions.filter(date__gte=day, date__lt=day + timedelta(days=1))
+    if params.get('status') == 'approved':
+        submissions = submissions.filter(approved=True)
+    elif params.get('status') == 'pending':
+        submissions = submissions.filter(approved=False)
+    query = params.get('q', '').strip()
+    if query:
+        submissions = search_submissions(submissions, query)
+    return submissions
+
+
+def submissions_watermark(submissions):
+    """(newest updated_at or None, count) of ``submissions``, in one query."""
+    watermark = submissions.order_by().aggregate(last_modified=Max('updated_at'), total=Count('id'))
+    return watermark['last_modified'], watermark['total']
+
+
+def submissions_etag(user, params, watermark):
+    """
+    A strong ETag for one user's view of a page of submissions.
+
+    Any create, edit, approval or delete in range moves the watermark; the user and the
+    query parameters are mixed in so different pages and filters never share a tag.
+    """
+    last_modified, total = watermark
+    scope = json.dumps([
+        API_VERSION, user.pk, sorted(params.items()), last_modified.isoformat() if last_modified else '', total,
+    ])
+    return '"{}"'.format(hashlib.sha256(scope.encode()).hexdigest()[:32])
+
+
+def serialize_submission(submission):
+    data = {
+        'id': submission.id,
+        'student': submission.student_id,
+        'matric_number': submission.matric_number,
+        'date': submission.date.isoformat(),
+        'updated_at': submission.updated_at.isoformat(),
+        'overview': submission.overview or '',
+        'text': submission.text,
+        'approved': submission.approved,
+        'remark': submission.remark or '',
+        'file': submission.file.url if submission.file else None,
+        'preview': None,
+    }
+    if submission.file and previewable(submission.file.name):
+        data['preview'] = reverse('attachment_preview', args=[submission.id])
+    return data
+
+
+def submissions_payload(page, watermark):
+    last_modified, total = watermark
+    return {
+        'version': API_VERSION,
+        'count': total,
+        'last_modified': last_modified.isoformat() if last_modified else None,
+        'next_cursor': page.next_cursor or None,
+        'results': [serialize_submission(submission) for submission in page],
+    }
+
+
+def archived_submissions_etag(user, params, manifest):
+    """A strong ETag for a page of an archive, which never changes once written."""
+    scope = json.dumps([API_VERSION, user.pk, sorted(params.items()), manifest['sha256']])
+    return '"{}"'.format(hashlib.sha256(scope.encode()).hexdigest()[:32])
+
+
+def serialize_archived_submission(row):
+    """An archived log (see SIWES.archive) in the shape serialize_submission gives a live one."""
+    return {
+        'id': row['id'],
+        'student': row['student'],
+        'matric_number': row['matric_number'],
+        'date': row['date'].isoformat(),
+        'updated_at': row['updated_at'].isoformat(),
+        'overview': row['overview'] or '',
+        'text': row['text'],
+        'approved': row['approved'],
+        'remark': row['remark'] or '',
+        'file': default_storage.url(row['file']) if row['file'] else None,
+        # Previews are only generated for live submissions
+        'preview': None,
+    }
+
+
+def archived_submissions_payload(session, rows, total, next_offset):
+    return {
+        'version': API_VERSION,
+        'session': session.slug,
+        'count': total,
+        'next_offset': next_offset,
+        'results': [serialize_archived_submission(row) for row in rows],
+    }
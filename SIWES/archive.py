@@ -0,0 +1,250 @@
+"""
+Cold archives of closed SIWES sessions.
+
+``archive_session`` exports a closed session's logs to ``<slug>/`` in the ``archive``
+storage and takes them out of the submission table (see SIWES.partitions):
+
+``submissions.ndjson.gz``
+    One JSON object per log, grouped by student and newest first within each. Each
+    student's logs are a gzip member of their own, so a reader seeks straight to the
+    students it wants instead of inflating the whole session.
+``attachments.ndjson``
+    One line per attached file: its log, its storage name and its size. The files
+    themselves stay in media storage, where the archived rows still point.
+``manifest.json``
+    The session, the number of logs, each student's offset and count in the data
+    file, and the data file's SHA-256.
+
+The files are written to a local staging directory and then saved to the storage,
+the manifest last. The manifest and the data file's SHA-256 are read back from the
+storage before the rows are removed, in the transaction that marks the session
+archived, so a failed run can simply be repeated. StudentStats are left as they are:
+they describe a student's whole placement, archived logs included, and each
+student's counts for the session are kept as ArchivedStats so rebuilding them
+(see SIWES.stats) still includes the archived logs.
+
+The rows are gone once archived, so the ``archive`` storage (see STORAGES in the
+settings) must be durable and shared by every instance; the local directory it
+defaults to, ARCHIVE_ROOT, is only right for a single server with a persistent disk.
+"""
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage, storages
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import fragments, partitions, stats
+from .exports import EXPORT_CHUNK_SIZE
+from .models import SiwesSession
+
+ARCHIVE_FORMAT = 1
+DATA_FILE = 'submissions.ndjson.gz'
+ATTACHMENTS_FILE = 'attachments.ndjson'
+MANIFEST_FILE = 'manifest.json'
+# (key in the archive, column) for each archived field; the keys match the JSON API's
+ARCHIVE_FIELDS = (
+    ('id', 'id'), ('student', 'student_id'), ('matric_number', 'matric_number'), ('date', 'date'),
+    ('updated_at', 'updated_at'), ('overview', 'overview'), ('text', 'text'), ('file', 'file'),
+    ('approved', 'approved'), ('reviewed_by', 'reviewed_by_id'), ('reviewed_at', 'reviewed_at'), ('remark', 'remark'),
+)
+DATETIME_FIELDS = ('date', 'updated_at', 'reviewed_at')
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_storage():
+    return storages['archive']
+
+
+def archive_name(session, filename):
+    """The storage name of one of ``session``'s archive files."""
+    return f'{session.slug}/{filename}'
+
+
+def _encode(value):
+    # Full precision, unlike DjangoJSONEncoder, which cuts datetimes to milliseconds
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _attachment(row):
+    try:
+        size = default_storage.size(row['file'])
+    except (OSError, NotImplementedError):
+        size = None
+    return {'submission': row['id'], 'student': row['student'], 'file': row['file'], 'size': size}
+
+
+def _sha256(file):
+    digest = hashlib.sha256()
+    while chunk := file.read(HASH_BUFFER_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sha256_of(path):
+    with open(path, 'rb') as file:
+        return _sha256(file)
+
+
+def _write_archive(directory, session, rows):
+    """Write ``rows``, ordered by student, and their manifest into ``directory``; returns the manifest."""
+    students = {}
+    with open(directory / DATA_FILE, 'wb') as data, open(directory / ATTACHMENTS_FILE, 'w') as attachments:
+        member = None
+        for row in rows:
+            key = str(row['student'])
+            if key not in students:
+                if member is not None:
+                    member.close()
+                students[key] = {'offset': data.tell(), 'count': 0}
+                member = gzip.GzipFile(fileobj=data, mode='wb', mtime=0)
+            member.write(json.dumps(row, default=_encode).encode() + b'\n')
+            students[key]['count'] += 1
+            if row['file']:
+                attachments.write(json.dumps(_attachment(row)) + '\n')
+        if member is not None:
+            member.close()
+        for file in (data, attachments):
+            file.flush()
+            os.fsync(file.fileno())
+    manifest = {
+        'format': ARCHIVE_FORMAT,
+        'session': {
+            'name': session.name, 'slug': session.slug,
+            'starts_on': session.starts_on.isoformat(), 'ends_on': session.ends_on.isoformat(),
+        },
+        'archived_at': timezone.now().isoformat(),
+        'fields': [key for key, _ in ARCHIVE_FIELDS],
+        'count': sum(entry['count'] for entry in students.values()),
+        'students': students,
+        'sha256': _sha256_of(directory / DATA_FILE),
+    }
+    with open(directory / MANIFEST_FILE, 'w') as file:
+        json.dump(manifest, file, indent=1)
+        file.flush()
+        os.fsync(file.fileno())
+    return manifest
+
+
+def _store_archive(directory, session):
+    """Save the files in ``directory`` to the archive storage, the manifest last."""
+    storage = archive_storage()
+    # Left by an earlier failed run: an archive without a manifest is incomplete
+    storage.delete(archive_name(session, MANIFEST_FILE))
+    for filename in (DATA_FILE, ATTACHMENTS_FILE, MANIFEST_FILE):
+        name = archive_name(session, filename)
+        storage.delete(name)
+        with open(directory / filename, 'rb') as file:
+            stored = storage.save(name, File(file))
+        if stored != name:
+            raise ArchiveError(f'The archive storage saved {name} as {stored}.')
+
+
+def _verify_archive(session, manifest):
+    """Check the stored archive against ``manifest`` before anything is taken out of the database."""
+    if load_manifest(session) != manifest:
+        raise ArchiveError(f'The stored manifest of {session} does not match the one written.')
+    with archive_storage().open(archive_name(session, DATA_FILE), 'rb') as data:
+        if _sha256(data) != manifest['sha256']:
+            raise ArchiveError(f'The stored data file of {session} does not match its SHA-256.')
+
+
+def archive_session(session):
+    """
+    Move the logs of the closed ``session`` to the archive storage and out of the
+    database. Returns the archive's manifest.
+    """
+    with tempfile.TemporaryDirectory(prefix='logtrack-archive-') as staging, transaction.atomic():
+        session = SiwesSession.objects.select_for_update().get(pk=session.pk)
+        if not session.closed:
+            raise ArchiveError(f'{session} is not closed.')
+        if session.archived:
+            raise ArchiveError(f'{session} is already archived.')
+        partitions.lock_session(connection, session)
+        rows = (
+            dict(zip((key for key, _ in ARCHIVE_FIELDS), values))
+            for values in partitions.session_submissions(session)
+            .order_by('student_id', '-date', '-id')
+            .values_list(*(column for _, column in ARCHIVE_FIELDS))
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        manifest = _write_archive(Path(staging), session, rows)
+        _store_archive(Path(staging), session)
+        _verify_archive(session, manifest)
+        stats.record_archived(session, partitions.session_submissions(session))
+        partitions.drop_session_rows(connection, session)
+        fragments.bump_submission_versions(int(student_id) for student_id in manifest['students'])
+        session.archived_at = timezone.now()
+        session.archived_count = manifest['count']
+        session.save(update_fields=['archived_at', 'archived_count'])
+    return manifest
+
+
+def load_manifest(session):
+    name = archive_name(session, MANIFEST_FILE)
+    try:
+        with archive_storage().open(name, 'rb') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise ArchiveError(f'The archive of {session} is missing its manifest, {name}.') from None
+
+
+def _decode(line):
+    row = json.loads(line)
+    for field in DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = datetime.fromisoformat(row[field])
+    return row
+
+
+def _student_rows(member, count):
+    with gzip.GzipFile(fileobj=io.BytesIO(member), mode='rb') as rows:
+        for _ in range(count):
+            yield _decode(rows.readline())
+
+
+def read_archive(session, student_ids=None, manifest=None):
+    """
+    The archived logs of ``session``, newest first, as dicts keyed like the JSON
+    API; only those of ``student_ids`` if given. The data file is opened once and
+    only those students' (compressed) parts are read from it; they are inflated
+    lazily.
+    """
+    manifest = manifest or load_manifest(session)
+    entries = manifest['students']
+    if student_ids is not None:
+        entries = {key: entries[key] for key in map(str, student_ids) if key in entries}
+    # Each member runs to the next one's offset, the last to the end of the file
+    offsets = sorted(entry['offset'] for entry in manifest['students'].values())
+    ends = dict(zip(offsets, [*offsets[1:], None]))
+    members = []
+    with archive_storage().open(archive_name(session, DATA_FILE), 'rb') as data:
+        for entry in sorted(entries.values(), key=lambda entry: entry['offset']):
+            data.seek(entry['offset'])
+            end = ends[entry['offset']]
+            members.append((data.read() if end is None else data.read(end - entry['offset']), entry['count']))
+    return heapq.merge(
+        *(_student_rows(member, count) for member, count in members),
+        key=lambda row: (row['date'], row['id']), reverse=True,
+    )
+
+
+def archived_count(manifest, student_ids=None):
+    entries = manifest['students']
+    if student_ids is None:
+        return manifest['count']
+    return sum(entries[key]['count'] for key in map(str, student_ids) if key in entries)
@@ -0,0 +1,62 @@
+"""
+An authentication backend that resolves ``request.user`` from the cache.
+
+Django's ModelBackend loads the user with a query on every authenticated request.
+CachedModelBackend keeps the row in the default cache for USER_CACHE_TIMEOUT seconds
+instead. The entry is dropped when the user is saved or deleted (which covers password
+changes and last_login), when they log out, and by the bulk updates in SIWES.mapping
+that bypass save(). With sessions in the cache as well (SESSION_ENGINE), a steady
+stream of requests from a logged-in user needs no auth queries at all.
+
+Dropping an entry only reaches the cache it is in, so the backend only caches when
+SHARED_CACHE says every instance uses the same one; otherwise it reads the row each
+time, as ModelBackend does.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+USER_KEY = 'siwes:user:{}'
+
+
+def _key(user_id):
+    return USER_KEY.format(user_id)
+
+
+def forget_users(user_ids):
+    """
+    Drop the cached users ``user_ids`` once the current transaction commits.
+
+    Dropping them sooner would let a concurrent request cache the old row again.
+    """
+    keys = [_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not settings.SHARED_CACHE:
+            return super().get_user(user_id)
+        user = cache.get(_key(user_id))
+        if user is None:
+            try:
+                user = get_user_model()._default_manager.get(pk=user_id)
+            except get_user_model().DoesNotExist:
+                return None
+            cache.set(_key(user_id), user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        if not settings.SHARED_CACHE:
+            return await super().aget_user(user_id)
+        user = await cache.aget(_key(user_id))
+        if user is None:
+            try:
+                user = await get_user_model()._default_manager.aget(pk=user_id)
+            except get_user_model().DoesNotExist:
+                return None
+            await cache.aset(_key(user_id), user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,197 @@
+"""
+Live submission events for the supervisor dashboard, fanned out over Server-Sent Events.
+
+Writes publish small events (``created``, ``edited``, ``approved``, ``remarked``,
+``deleted``) addressed to the supervisor of the students concerned, once the write
+commits. An event lists up to EVENT_BATCH_SIZE submissions, so a bulk approval is a
+handful of events rather than one per row. Each process keeps a ``Broker`` that hands events to the SSE streams it
+serves; how events get from the writer to every process's broker is up to the backend
+named by SUBMISSION_EVENTS_BACKEND:
+
+``SIWES.events.LocalBackend``
+    Delivers within the publishing process only. Right for a single worker, for
+    ``runserver`` and for tests, as it needs nothing outside the process.
+``SIWES.events.PostgresBackend``
+    NOTIFYs on the default PostgreSQL database; each process LISTENs from a
+    background thread and passes what it hears to its broker, so any worker's writes
+    reach every worker's streams.
+
+Events are best-effort: a stream that falls too far behind is sent ``reset`` and
+closed, and the page reloads its list. Nothing is replayed after a reconnect.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('created', 'edited', 'approved', 'remarked', 'deleted')
+# Events a stream may fall behind by before it is reset
+QUEUE_SIZE = 256
+# Submissions per event; a full event's ids stay well inside NOTIFY's 8000 byte payload limit
+EVENT_BATCH_SIZE = 200
+RESET = {'type': 'reset'}
+
+
+class Broker:
+    """
+    This process's SSE subscribers, by supervisor id.
+
+    ``dispatch`` may be called from any thread; events are handed to each subscriber's
+    queue on the event loop that subscriber is waiting on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    @asynccontextmanager
+    async def subscribe(self, supervisor_id):
+        """An asyncio.Queue receiving ``supervisor_id``'s events while the block runs."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(supervisor_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(supervisor_id, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._subscribers.pop(supervisor_id, None)
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event['supervisor'], ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes as it unwinds
+                pass
+
+
+def _offer(queue, event):
+    if queue.full():
+        # Too far behind to patch the page: swap the backlog for a reset, which ends the stream
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESET)
+    else:
+        queue.put_nowait(event)
+
+
+class LocalBackend:
+    """Delivers events to this process's broker only."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, events):
+        for event in events:
+            self.broker.dispatch(event)
+
+    def has_subscribers(self):
+        """Whether a published event could reach any stream; if not, publishing is skipped."""
+        return self.broker.has_subscribers()
+
+    def start(self):
+        pass
+
+
+class PostgresBackend(LocalBackend):
+    """Delivers events to every process's broker through PostgreSQL LISTEN/NOTIFY."""
+
+    channel = 'siwes_submission_events'
+    # Seconds to wait before listening again after losing the connection
+    retry_delay = 5
+
+    def __init__(self, broker):
+        super().__init__(broker)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def has_subscribers(self):
+        # The streams may be in any process
+        return True
+
+    def publish(self, events):
+        with connection.cursor() as cursor:
+            for event in events:
+                cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps(event)])
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='siwes-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg
+
+        params = connection.get_connection_params()
+        params.pop('cursor_factory', None)
+        while True:
+            try:
+                with psycopg.connect(**params, autocommit=True) as listener:
+                    listener.execute(f'LISTEN {self.channel}')
+                    for notify in listener.notifies():
+                        self.broker.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception('Lost the submission events listener; retrying in %ss.', self.retry_delay)
+                time.sleep(self.retry_delay)
+
+
+broker = Broker()
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.SUBMISSION_EVENTS_BACKEND)(broker)
+
+
+def publish_submission_events(event_type, rows):
+    """
+    Publish ``event_type`` for the (submission id, student id) pairs in ``rows`` once
+    the current transaction commits: one event per supervisor, listing their students'
+    submissions in batches of EVENT_BATCH_SIZE.
+
+    Rows may also be (submission id, student id, supervisor id) triples, which saves
+    looking the supervisors up. Nothing is looked up when no stream could hear the events.
+    """
+    rows = list(rows)
+    if not rows or not get_backend().has_subscribers():
+        return
+    if all(len(row) == 3 for row in rows):
+        supervisors = {student_id: supervisor_id for _, student_id, supervisor_id in rows if supervisor_id is not None}
+    else:
+        supervisors = dict(
+            CustomUser.objects.filter(pk__in={row[1] for row in rows}, supervisor__isnull=False)
+            .values_list('pk', 'supervisor_id')
+        )
+    by_supervisor = {}
+    for submission_id, student_id, *_ in rows:
+        if student_id in supervisors:
+            by_supervisor.setdefault(supervisors[student_id], []).append([submission_id, student_id])
+    events = [
+        {'type': event_type, 'supervisor': supervisor_id, 'submissions': submissions[start:start + EVENT_BATCH_SIZE]}
+        for supervisor_id, submissions in by_supervisor.items()
+        for start in range(0, len(submissions), EVENT_BATCH_SIZE)
+    ]
+    if events:
+        # robust: a broker failure must not fail the write that has already committed
+        transaction.on_commit(lambda: get_backend().publish(events), robust=True)
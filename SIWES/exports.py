@@ -0,0 +1,210 @@
+import csv
+import hashlib
+import io
+import json
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer
+
+# Rows fetched per round-trip from the server-side cursor while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_HEADER = ['Matric Number', 'Student Name', 'Date', 'Text', 'File', 'Approved', 'Remark']
+CSV_COLUMNS = (
+    'matric_number', 'student__first_name', 'student__last_name', 'student__email',
+    'date', 'text', 'file', 'approved', 'remark',
+)
+
+# Generated logbook PDFs are kept in default storage under this directory
+LOGBOOK_DIR = 'logbooks'
+PDF_COLUMNS = (
+    'student_id', 'student__matric_number', 'student__first_name', 'student__last_name', 'student__email',
+    'date', 'overview', 'text', 'file', 'approved', 'remark',
+)
+# Query parameters that don't change the content of an export
+NON_FILTER_PARAMS = ('export', 'cursor')
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_row(matric_number, first_name, last_name, email, date, text, file, approved, remark):
+    full_name = f'{first_name} {last_name}'.strip()
+    return [
+        matric_number,
+        full_name or email,
+        date,
+        text,
+        default_storage.url(file) if file else '',
+        'Yes' if approved else 'No',
+        remark or '',
+    ]
+
+
+def submission_csv_rows(queryset):
+    """Yield the CSV header and one row per submission, reading plain tuples in chunks."""
+    yield CSV_HEADER
+    for values in queryset.values_list(*CSV_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _csv_row(*values)
+
+
+def _next_chunk(rows):
+    return list(islice(rows, EXPORT_CHUNK_SIZE))
+
+
+async def asubmission_csv_rows(queryset):
+    """Async twin of submission_csv_rows, for responses served from async views."""
+    yield CSV_HEADER
+    # Each chunk is fetched in a worker thread. QuerySet.aiterator() can't be used here:
+    # for values_list() it opens the cursor in the event loop and fails.
+    rows = queryset.values_list(*CSV_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while chunk := await sync_to_async(_next_chunk)(rows):
+        for values in chunk:
+            yield _csv_row(*values)
+
+
+def _csv_response(lines, filename):
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_submissions_csv(queryset, filename='submissions.csv'):
+    """
+    Stream a CSV export of ``queryset`` without building it in memory.
+
+    Only the exported columns are selected, and ``iterator()`` uses a server-side
+    cursor on PostgreSQL, so memory stays flat and the header goes out before the
+    first chunk of rows has been read.
+    """
+    writer = csv.writer(Echo())
+    return _csv_response((writer.writerow(row) for row in submission_csv_rows(queryset)), filename)
+
+
+def astream_submissions_csv(queryset, filename='submissions.csv'):
+    """
+    stream_submissions_csv for async views.
+
+    Under ASGI a synchronous iterator would be collected into a list before the
+    first byte is sent, so the rows are produced by an async generator instead.
+    """
+    writer = csv.writer(Echo())
+
+    async def lines():
+        async for row in asubmission_csv_rows(queryset):
+            yield writer.writerow(row)
+
+    return _csv_response(lines(), filename)
+
+
+def logbook_scope(request):
+    """Describe which logbook a request asks for: the page, host and filters it was made with."""
+    filters = sorted((key, value) for key, value in request.GET.items() if key not in NON_FILTER_PARAMS)
+    scope = json.dumps([request.path, request.get_host(), filters])
+    return hashlib.sha256(scope.encode()).hexdigest()[:16]
+
+
+def logbook_version(submissions):
+    """Fingerprint the submissions in range: any create, edit, approval or delete changes it."""
+    watermark = submissions.aggregate(last_modified=Max('updated_at'), total=Count('id'))
+    last_modified = watermark['last_modified'].isoformat() if watermark['last_modified'] else ''
+    version = f"{last_modified}|{watermark['total']}"
+    return hashlib.sha256(version.encode()).hexdigest()[:16]
+
+
+def _prune_logbooks(directory, scope):
+    """Delete older versions of the same logbook, since they can never be served again."""
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        if name.startswith(f'{scope}-'):
+            default_storage.delete(f'{directory}/{name}')
+
+
+def _paragraph(text, style):
+    return Paragraph(escape(str(text)).replace('\n', '<br/>'), style)
+
+
+def render_logbook_pdf(request, title, header_lines, submissions, group_by_student=False):
+    """Render a logbook of ``submissions`` to PDF bytes with reportlab."""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('LogTitle', parent=styles['Title'], textColor=colors.HexColor('#2563eb'))
+    student_style = ParagraphStyle(
+        'LogStudent', parent=styles['Heading2'], textColor=colors.HexColor('#2563eb'),
+        backColor=colors.HexColor('#e0e7ff'), borderPadding=6, spaceBefore=12, spaceAfter=10,
+    )
+    label_style = ParagraphStyle('LogLabel', parent=styles['Heading4'], textColor=colors.HexColor('#1e293b'), spaceAfter=2)
+    body_style = ParagraphStyle('LogBody', parent=styles['BodyText'], spaceAfter=3)
+
+    story = [Paragraph(escape(title), title_style)]
+    for line in header_lines:
+        story.append(_paragraph(line, body_style))
+    story.append(Spacer(1, 6 * mm))
+
+    current_student = None
+    empty = True
+    rows = submissions.values_list(*PDF_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for student_id, matric_number, first_name, last_name, email, date, overview, text, file, approved, remark in rows:
+        empty = False
+        if group_by_student and student_id != current_student:
+            current_student = student_id
+            full_name = f'{first_name} {last_name}'.strip() or email
+            story.append(_paragraph(f'{full_name} ({matric_number or "No Matric"})', student_style))
+        entry = [Paragraph(f"Date: {timezone.localtime(date).strftime('%A, %Y-%m-%d %H:%M')}", label_style)]
+        if overview:
+            entry.append(_paragraph(f'Overview: {overview}', body_style))
+        entry.append(_paragraph(f'Text: {text}', body_style))
+        if file:
+            url = escape(request.build_absolute_uri(default_storage.url(file)))
+            entry.append(Paragraph(f'File: <link href="{url}" color="blue">Download File</link>', body_style))
+        entry.append(Paragraph(
+            'Status: <font color="green">Approved</font>' if approved else 'Status: <font color="orange">Pending</font>',
+            body_style,
+        ))
+        if remark:
+            entry.append(_paragraph(f'Remark: {remark}', body_style))
+        entry.append(Spacer(1, 4 * mm))
+        story.append(KeepTogether(entry))
+    if empty:
+        story.append(Paragraph('No logs found.', body_style))
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, title=title, leftMargin=18 * mm, rightMargin=18 * mm).build(story)
+    return buffer.getvalue()
+
+
+def logbook_pdf_response(request, owner, submissions, title, header_lines, filename, group_by_student=False):
+    """
+    Serve a logbook PDF for ``owner``, generating it only when it isn't stored yet.
+
+    Artifacts are keyed by (owner, filter range, submission watermark), so a repeat
+    download is a single aggregate query plus a file read, and any change to a
+    submission in range produces a new key; the stale artifact is deleted then.
+    """
+    directory = f'{LOGBOOK_DIR}/{owner.pk}'
+    scope = logbook_scope(request)
+    name = f'{directory}/{scope}-{logbook_version(submissions)}.pdf'
+    if not default_storage.exists(name):
+        content = render_logbook_pdf(request, title, header_lines, submissions, group_by_student)
+        _prune_logbooks(directory, scope)
+        name = default_storage.save(name, ContentFile(content))
+    return FileResponse(
+        default_storage.open(name, 'rb'), content_type='application/pdf', as_attachment=True, filename=filename,
+    )
@@ -98,7 +98,6 @@ class CustomUserCreationForm(UserCreationForm):
         fields = ('fullname', 'email', 'department', 'user_type', 'title', 'matric_number','lecturer_id', 'password1', 'password2')
 
     def save(self, commit=True):
-        import uuid
         user = super().save(commit=False)
         fullname = self.cleaned_data.get('fullname')
         if fullname:
@@ -110,14 +109,8 @@ class CustomUserCreationForm(UserCreationForm):
         user.department = self.cleaned_data.get('department', '')
         # Generate a unique username if not set
         if not user.username:
-            base_username = user.email.split('@')[0]
-            unique_username = base_username
-            counter = 1
-            from .models import CustomUser
-            while CustomUser.objects.filter(username=unique_username).exists():
-                unique_username = f"{base_username}{counter}"
-                counter += 1
-            user.username = unique_username
+            from .roster import unique_usernames
+            user.username = unique_usernames([user.email])[user.email]
         if user.user_type == 'student':
             user.matric_number = self.cleaned_data.get('matric_number')
             user.title = ''
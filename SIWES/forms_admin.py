@@ -1,4 +1,5 @@
 from django import forms
+from .mapping import assign_students
 from .models import CustomUser
 
 class CustomUserForm(forms.ModelForm):
@@ -11,13 +12,8 @@ class CustomUserForm(forms.ModelForm):
             instance.save()
             # Save students for supervisors only if field exists in cleaned_data
             if hasattr(self, 'cleaned_data') and 'students' in self.cleaned_data:
-                students = self.cleaned_data['students']
-                # Set supervisor for selected students
-                for student in students:
-                    student.supervisor = instance
-                    student.save()
-                # Unassign students not selected
-                CustomUser.objects.filter(user_type='student', supervisor=instance).exclude(id__in=[s.id for s in students]).update(supervisor=None)
+                # Set supervisor for selected students and unassign the rest
+                assign_students(instance, self.cleaned_data['students'])
         return instance
     
     class Meta:
@@ -26,4 +22,10 @@ class CustomUserForm(forms.ModelForm):
             'email', 'password', 'user_type', 'title', 'department', 'matric_number',
             'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser',
             'groups', 'user_permissions', 'last_login', 'date_joined', 'lecturer_id',
-        ]
\ No newline at end of file
+        ]
+
+
+class RosterImportForm(forms.Form):
+    roster = forms.FileField(help_text='A .csv or .xlsx file of students and supervisors.')
+    map_students = forms.BooleanField(required=False, initial=True, help_text='Map unassigned students to supervisors by lecturer ID afterwards.')
+    dry_run = forms.BooleanField(required=False, help_text='Only check the roster for problems.')
@@ -0,0 +1,66 @@
+"""
+Version stamps for the cached dashboard fragments.
+
+Each student has a version in the default cache that is replaced by a fresh, unique
+value whenever one of their submissions is created, edited, approved, remarked or
+deleted. Fresh values rather than ``incr``, which file-based and local-memory caches
+do as a get and a set: two concurrent bumps could both land on the same next value,
+leaving a fragment rendered between them cached under it. Submission lists are
+cached under the versions of the students they show, so an unchanged dashboard costs
+one ``get_many`` plus the cached HTML. Individual cards are cached under the
+submission's own ``updated_at``, so a new log re-renders the list around cards that
+are still cached.
+
+The versions live in the cache next to the fragments, so every worker must share one
+cache (file-based or Redis); a per-process local-memory cache only suits a single worker.
+"""
+import hashlib
+import secrets
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+VERSION_KEY = 'siwes:submissions-version:{}'
+
+
+def _key(student_id):
+    return VERSION_KEY.format(student_id)
+
+
+def _fresh_version():
+    # Never a value an earlier fragment used, even for a version that was evicted or bumped at the same instant
+    return f'{time.time_ns():x}-{secrets.token_hex(4)}'
+
+
+def submission_versions(student_ids):
+    """
+    One version string for the submissions of ``student_ids``.
+
+    It changes when any of those students' submissions change, or when the set of
+    students itself changes (e.g. a student is reassigned to another supervisor).
+    """
+    keys = {student_id: _key(student_id) for student_id in sorted(set(student_ids))}
+    found = cache.get_many(keys.values())
+    missing = {key: _fresh_version() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    parts = ','.join(f'{student_id}:{found[key]}' for student_id, key in keys.items())
+    return hashlib.md5(parts.encode()).hexdigest()
+
+
+def _bump(student_ids):
+    cache.set_many({_key(student_id): _fresh_version() for student_id in set(student_ids)}, timeout=None)
+
+
+def bump_submission_versions(student_ids):
+    """
+    Invalidate the cached fragments of ``student_ids`` once the current transaction commits.
+
+    Bumping before the commit would let a concurrent request cache the old rows
+    under the new version.
+    """
+    student_ids = list(student_ids)
+    transaction.on_commit(lambda: _bump(student_ids))
@@ -0,0 +1,47 @@
+"""
+Password hashers whose cost comes from settings.
+
+Django's hashers fix their cost in class attributes; these read it from
+PBKDF2_ITERATIONS, ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM and
+BCRYPT_ROUNDS instead, so the cost can be tuned per deployment. A stored hash made at
+another cost, or with another algorithm than the first in PASSWORD_HASHERS, is still
+accepted and is re-hashed with the current policy on the user's next login (Django's
+check_password does this whenever a hasher's ``must_update`` says so).
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    @property
+    def rounds(self):
+        return settings.BCRYPT_ROUNDS
+
+
+def password_hashers(preferred):
+    """PASSWORD_HASHERS with ``preferred`` (a key of PASSWORD_HASHER_CHOICES) first, as the settings build it."""
+    choices = settings.PASSWORD_HASHER_CHOICES
+    if preferred not in choices:
+        raise ValueError(f"Unknown password hasher {preferred!r}; choose from {', '.join(choices)}.")
+    others = [path for name, path in choices.items() if name != preferred]
+    return [choices[preferred], *others, 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
@@ -0,0 +1,154 @@
+"""
+Image resizing with Pillow: responsive WebP variants of the static images, built
+ahead of time, and thumbnails of submission attachments, made on first view.
+
+Static variants are written next to the originals in SIWES/static/images/variants/
+with an index.json that the ``responsive_image`` template tag reads, so collectstatic
+hashes and compresses them like any other static file. Attachment previews are
+stored beside the attachments as ``submissions/previews/<file name>.webp``.
+"""
+import json
+import os
+import posixpath
+import re
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+STATIC_IMAGES_DIR = os.path.join(settings.BASE_DIR, 'SIWES', 'static', 'images')
+VARIANTS_DIR = 'variants'
+VARIANT_WIDTHS = (320, 640, 1024)
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+WEBP_QUALITY = 80
+
+PREVIEW_SIZE = (480, 480)
+PREVIEW_QUALITY = 70
+PREVIEWABLE_EXTENSIONS = RASTER_EXTENSIONS + ('.gif', '.webp', '.bmp', '.pdf')
+# Remembers attachments that couldn't be previewed, so they aren't retried on every view
+NO_PREVIEW_KEY = 'siwes:no-preview:{}'
+
+
+def _webp(image, quality):
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    out = BytesIO()
+    image.save(out, 'WEBP', quality=quality, method=6)
+    return out.getvalue()
+
+
+def _variant_name(name, width):
+    # srcset separates candidates by spaces and commas, so keep those out of the names
+    stem = re.sub(r'[^A-Za-z0-9_.-]+', '-', os.path.splitext(os.path.basename(name))[0]).strip('-')
+    return f'images/{VARIANTS_DIR}/{stem}-{width}w.webp'
+
+
+def build_static_variants(force=False):
+    """
+    Write WebP variants of each raster image in SIWES/static/images, at every width in
+    VARIANT_WIDTHS below the original's, and rewrite the index. Up-to-date variants are
+    kept unless ``force``. Returns the number of files written.
+    """
+    static_root = os.path.dirname(STATIC_IMAGES_DIR)
+    os.makedirs(os.path.join(STATIC_IMAGES_DIR, VARIANTS_DIR), exist_ok=True)
+    index, written = {}, 0
+    for filename in sorted(os.listdir(STATIC_IMAGES_DIR)):
+        if not filename.lower().endswith(RASTER_EXTENSIONS):
+            continue
+        source = os.path.join(STATIC_IMAGES_DIR, filename)
+        with Image.open(source) as image:
+            image.load()
+            widths = [width for width in VARIANT_WIDTHS if width < image.width] + [image.width]
+            variants = []
+            for width in widths:
+                name = _variant_name(filename, width)
+                path = os.path.join(static_root, name)
+                if force or not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source):
+                    resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+                    with open(path, 'wb') as out:
+                        out.write(_webp(resized, WEBP_QUALITY))
+                    written += 1
+                variants.append([width, name])
+        index[f'images/{filename}'] = variants
+    with open(os.path.join(STATIC_IMAGES_DIR, VARIANTS_DIR, 'index.json'), 'w') as out:
+        json.dump(index, out, indent=2, sort_keys=True)
+        out.write('\n')
+    return written
+
+
+@lru_cache(maxsize=None)
+def static_variants():
+    """{static image path: [[width, variant path], ...]} as last built."""
+    try:
+        with open(os.path.join(STATIC_IMAGES_DIR, VARIANTS_DIR, 'index.json')) as index:
+            return json.load(index)
+    except FileNotFoundError:
+        return {}
+
+
+def previewable(name):
+    return bool(name) and name.lower().endswith(PREVIEWABLE_EXTENSIONS)
+
+
+def preview_name(name):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'previews', f'{filename}.webp')
+
+
+def _first_page(fileobj):
+    # Rasterising PDFs needs pypdfium2; without it PDFs just get no preview
+    try:
+        import pypdfium2
+    except ImportError:
+        return None
+    pdf = pypdfium2.PdfDocument(fileobj.read())
+    try:
+        page = pdf[0]
+        scale = max(PREVIEW_SIZE) / max(page.get_size())
+        return page.render(scale=scale).to_pil()
+    finally:
+        pdf.close()
+
+
+def _render_preview(fileobj, name):
+    if name.lower().endswith('.pdf'):
+        image = _first_page(fileobj)
+        if image is None:
+            return None
+    else:
+        with Image.open(fileobj) as original:
+            # Phone photos are often stored sideways with an EXIF rotation
+            image = ImageOps.exif_transpose(original)
+    image.thumbnail(PREVIEW_SIZE, Image.LANCZOS)
+    return _webp(image, PREVIEW_QUALITY)
+
+
+def attachment_preview(field_file):
+    """
+    The storage name of a WebP preview of ``field_file``, making it on first use, or
+    None when the attachment can't be previewed (wrong type, unreadable, or a PDF
+    without pypdfium2).
+    """
+    name = preview_name(field_file.name)
+    storage = field_file.storage
+    if storage.exists(name):
+        return name
+    if not previewable(field_file.name) or cache.get(NO_PREVIEW_KEY.format(field_file.name)):
+        return None
+    try:
+        with field_file.open('rb') as original:
+            data = _render_preview(original, field_file.name)
+    # pypdfium2 raises RuntimeErrors for broken PDFs
+    except (OSError, RuntimeError, UnidentifiedImageError, Image.DecompressionBombError, ValueError):
+        data = None
+    if data is None:
+        cache.set(NO_PREVIEW_KEY.format(field_file.name), True, timeout=None)
+        return None
+    saved = storage.save(name, ContentFile(data))
+    if saved != name:
+        # Another request made it first; keep theirs
+        storage.delete(saved)
+    return name
@@ -0,0 +1,232 @@
+"""
+Per-request performance instrumentation.
+
+``RequestMetricsMiddleware`` times each request and, while it runs, every query on
+every connection and every top-level template render. The totals go out as one JSON
+log line on the ``SIWES.requests`` logger tagged with the URL name and user type and,
+with DEBUG on or to staff only, as a ``Server-Timing`` header that browser dev tools
+show per request.
+Queries slower than ``SLOW_QUERY_MS`` are logged with their SQL on ``SIWES.slow_queries``.
+
+The current request's metrics live in a context variable, which follows async views
+into the threads ``sync_to_async`` runs their queries in. Streaming responses (the CSV
+export) are logged when the stream ends, so their size and queries are counted too.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+request_logger = logging.getLogger('SIWES.requests')
+slow_query_logger = logging.getLogger('SIWES.slow_queries')
+
+# Stored at login so the log line can be tagged without loading the user
+USER_TYPE_SESSION_KEY = 'siwes_user_type'
+
+_current = ContextVar('siwes_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_started = None
+        self.view_time = 0.0
+        self.total_time = 0.0
+        self.size = 0
+        self.url_name = None
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += elapsed
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            # Only the SQL text: parameters can hold students' personal data
+            slow_query_logger.warning(json.dumps({
+                'url_name': metrics.url_name if metrics else None,
+                'duration_ms': round(elapsed * 1000, 1),
+                'alias': context['connection'].alias,
+                'sql': sql,
+            }))
+
+
+def instrument(connection):
+    # Wrappers outlive reconnects, so a connection only ever gets one
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def session_user_type(user):
+    return 'admin' if user.is_staff else user.user_type or 'unknown'
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing each render for the request metrics.
+
+    Includes and extends render inside their parent, so only the template a view
+    renders is timed and nothing is counted twice.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before the middleware was loaded missed connection_created
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        # Reset afterwards, or the next request this pooled thread serves would start under it
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+            return self.finish(request, response, metrics, self.user_type(request))
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        # Not reset afterwards: a streaming response is still being sent under it
+        _current.set(metrics)
+        response = await self.get_response(request)
+        return self.finish(request, response, metrics, await self.auser_type(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.url_name = request.resolver_match.url_name
+            metrics.view_started = time.perf_counter()
+
+    @staticmethod
+    def user_type(request):
+        session = request.session
+        if USER_TYPE_SESSION_KEY in session:
+            return session[USER_TYPE_SESSION_KEY]
+        if '_auth_user_id' not in session:
+            return 'anonymous'
+        # A session from before the type was stored at login. No user if a middleware
+        # answered before AuthenticationMiddleware ran
+        user = getattr(request, 'user', None)
+        if user is None:
+            return 'unknown'
+        return session_user_type(user) if user.is_authenticated else 'anonymous'
+
+    @staticmethod
+    async def auser_type(request):
+        session = request.session
+        user_type = await session.aget(USER_TYPE_SESSION_KEY)
+        if user_type is not None:
+            return user_type
+        if not await session.ahas_key('_auth_user_id'):
+            return 'anonymous'
+        if not hasattr(request, 'auser'):
+            return 'unknown'
+        user = await request.auser()
+        return session_user_type(user) if user.is_authenticated else 'anonymous'
+
+    def finish(self, request, response, metrics, user_type):
+        now = time.perf_counter()
+        metrics.total_time = now - metrics.started
+        if metrics.view_started is not None:
+            metrics.view_time = now - metrics.view_started
+        # The timings tell an outsider how heavy each page is to serve
+        if settings.DEBUG or user_type == 'admin':
+            response['Server-Timing'] = metrics.server_timing()
+        tags = {'method': request.method, 'path': request.path, 'user_type': user_type}
+        if not response.streaming:
+            metrics.size = len(response.content)
+            self.log(metrics, response, tags)
+        elif response.is_async:
+            response.streaming_content = self.acounted(response.streaming_content, metrics, response, tags)
+        else:
+            response.streaming_content = self.counted(response.streaming_content, metrics, response, tags)
+        return response
+
+    def counted(self, chunks, metrics, response, tags):
+        # The stream is read after __call__ has reset the request's metrics
+        _current.set(metrics)
+        try:
+            for chunk in chunks:
+                metrics.size += len(chunk)
+                yield chunk
+        finally:
+            _current.set(None)
+            self.log(metrics, response, tags, streamed=True)
+
+    async def acounted(self, chunks, metrics, response, tags):
+        try:
+            async for chunk in chunks:
+                metrics.size += len(chunk)
+                yield chunk
+        finally:
+            self.log(metrics, response, tags, streamed=True)
+
+    @staticmethod
+    def log(metrics, response, tags, streamed=False):
+        if streamed:
+            # The header went out before the body, so the log has the full figures
+            metrics.total_time = time.perf_counter() - metrics.started
+        request_logger.info(json.dumps({
+            'url_name': metrics.url_name,
+            **tags,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'template_ms': round(metrics.template_time * 1000, 1),
+            'view_ms': round(metrics.view_time * 1000, 1),
+            'total_ms': round(metrics.total_time * 1000, 1),
+            'bytes': metrics.size,
+            'streamed': streamed,
+        }))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from SIWES.archive import DATA_FILE, ArchiveError, archive_name, archive_session, archive_storage
+from SIWES.models import SiwesSession
+from SIWES.partitions import session_submissions
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the logs of closed SIWES sessions out of the database into compressed NDJSON '
+        'archives in the archive storage, with a manifest of their attachments. Without slugs, '
+        'archives every closed session that has ended and is not archived yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('sessions', nargs='*', help='Slugs of the sessions to archive')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        if options['sessions']:
+            sessions = list(SiwesSession.objects.filter(slug__in=options['sessions']))
+            unknown = set(options['sessions']) - {session.slug for session in sessions}
+            if unknown:
+                raise CommandError(f"No session with slug {', '.join(sorted(unknown))}.")
+        else:
+            sessions = list(SiwesSession.objects.filter(
+                closed=True, archived_at__isnull=True, ends_on__lt=timezone.localdate(),
+            ))
+        if not sessions:
+            self.stdout.write('No sessions to archive.')
+            return
+        for session in sessions:
+            if options['dry_run']:
+                self.stdout.write(
+                    f'{session}: would archive {session_submissions(session).count()} logs to {archive_name(session, "")}'
+                )
+                continue
+            try:
+                manifest = archive_session(session)
+            except ArchiveError as exc:
+                raise CommandError(str(exc))
+            size = archive_storage().size(archive_name(session, DATA_FILE))
+            self.stdout.write(self.style.SUCCESS(
+                f"{session}: archived {manifest['count']} logs of {len(manifest['students'])} students "
+                f"({size / 1024:.0f} KiB) to {archive_name(session, '')}"
+            ))
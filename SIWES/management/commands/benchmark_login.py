@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from SIWES.hashers import password_hashers
+from SIWES.models import CustomUser
+
+PASSWORD = 'benchmark-login-1'
+DEFAULT_POLICIES = (
+    'pbkdf2', 'pbkdf2:PBKDF2_ITERATIONS=600000', 'argon2', 'argon2:ARGON2_MEMORY_COST=65536',
+    'bcrypt', 'bcrypt:BCRYPT_ROUNDS=10', 'scrypt',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the cost of one password hash and of a full login through the login view, '
+        'in wall time and CPU time, for each password hashing policy. A policy is a hasher '
+        'name with optional cost settings, e.g. pbkdf2:PBKDF2_ITERATIONS=600000. '
+        'Nothing is kept: users and sessions are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*', default=DEFAULT_POLICIES, help=f"Hashers: {', '.join(settings.PASSWORD_HASHER_CHOICES)}")
+        parser.add_argument('--logins', type=int, default=10, help='Timed logins per policy')
+
+    @staticmethod
+    def parse(policy):
+        name, _, options = policy.partition(':')
+        overrides = {}
+        for option in filter(None, options.split(',')):
+            key, _, value = option.partition('=')
+            if not hasattr(settings, key.strip()):
+                raise CommandError(f'Unknown setting {key!r} in policy {policy!r}.')
+            overrides[key.strip()] = int(value)
+        return name, overrides
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'policy':<36} {'hash ms':>8} {'login p50':>10} {'login p95':>10} {'CPU ms':>8} {'logins/s/core':>14}"
+        ))
+        for policy in options['policies']:
+            name, overrides = self.parse(policy)
+            try:
+                hashers = password_hashers(name)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            with override_settings(PASSWORD_HASHERS=hashers, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **overrides):
+                try:
+                    encoded = make_password(PASSWORD)
+                except ValueError as exc:
+                    # The hasher's library isn't installed
+                    self.stdout.write(f'{policy:<36} {exc}')
+                    continue
+                with transaction.atomic():
+                    self.stdout.write(self.measure(policy, encoded, options['logins']))
+                    transaction.set_rollback(True)
+
+    def measure(self, policy, encoded, logins):
+        started = time.perf_counter()
+        check_password(PASSWORD, encoded)
+        hash_ms = (time.perf_counter() - started) * 1000
+
+        user = CustomUser.objects.create(
+            username='benchmark-login', email='benchmark-login@bench.logtrack.local', password=encoded,
+            user_type='student',
+        )
+        latencies, cpu = [], []
+        for _ in range(logins):
+            client = Client()
+            wall, process = time.perf_counter(), time.process_time()
+            response = client.post(reverse('login'), {'username': user.email, 'password': PASSWORD})
+            cpu.append((time.process_time() - process) * 1000)
+            latencies.append((time.perf_counter() - wall) * 1000)
+            if response.status_code != 302:
+                raise CommandError(f'Login failed under {policy} with status {response.status_code}.')
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        cpu_ms = statistics.median(cpu)
+        return (
+            f'{policy:<36} {hash_ms:>8.1f} {statistics.median(latencies):>10.1f} {p95:>10.1f} '
+            f'{cpu_ms:>8.1f} {1000 / cpu_ms if cpu_ms else 0:>14.1f}'
+        )
@@ -0,0 +1,90 @@
+import gzip
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from SIWES.fragments import FRAGMENT_TIMEOUT
+from SIWES.models import CustomUser, Submission
+from SIWES.pagination import PAGE_SIZE
+from SIWES.review import supervised_submissions
+from SIWES.seeding import _sentence, seed_cohort
+from SIWES.views import SUPERVISOR_CARD_FIELDS
+
+PREFIX = 'PAGESIZE'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the supervisor dashboard payload: bytes per submission card, the first page '
+        'as served (plain and gzipped), and all cards of a supervisor with 100 and 1,000 '
+        'submissions. Run it before and after a markup change to compare. Nothing is kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('counts', nargs='*', type=int, default=[100, 1000], help='Submissions per supervisor')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'logs':>6} {'B/card':>8} {'page B':>9} {'page gz B':>10} {'all cards B':>12} {'all cards gz B':>15}"
+        ))
+        # A dummy cache renders every card afresh and keeps the fragments out of the real cache
+        dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(CACHES=dummy_cache, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for count in options['counts']:
+                with transaction.atomic():
+                    self.stdout.write(self.measure(count, options['seed']))
+                    transaction.set_rollback(True)
+
+    def seed(self, count, seed):
+        """One supervisor with ``count`` logs across 20 students, a mix of pending, approved and remarked."""
+        rng = random.Random(seed)
+        (supervisor_id,), student_ids = seed_cohort(
+            supervisors=1, students_per_supervisor=20, days=0, prefix=PREFIX, seed=seed,
+        )
+        students = dict(CustomUser.objects.filter(pk__in=student_ids).values_list('pk', 'matric_number'))
+        rows = []
+        for n in range(count):
+            student_id = student_ids[n % len(student_ids)]
+            approved = rng.random() < 0.6
+            rows.append(Submission(
+                student_id=student_id, matric_number=students[student_id],
+                overview=_sentence(rng, 6), text=_sentence(rng, 60), approved=approved,
+                remark=_sentence(rng, 10) if approved and rng.random() < 0.5 else None,
+                file=f'submissions/{PREFIX.lower()}-evidence-{n}.png' if n % 5 == 0 else None,
+            ))
+        Submission.objects.bulk_create(rows)
+        return supervisor_id
+
+    def measure(self, count, seed):
+        supervisor_id = self.seed(count, seed)
+        supervisor = CustomUser.objects.get(pk=supervisor_id)
+        cards = [
+            render_to_string('SIWES/partials/supervisor_card.html', {
+                'submission': submission, 'fragment_timeout': FRAGMENT_TIMEOUT,
+            }).encode()
+            for submission in supervised_submissions(supervisor).select_related('student')
+            .only(*SUPERVISOR_CARD_FIELDS).order_by('-date', '-id')
+        ]
+        all_cards = b''.join(cards)
+
+        client = Client()
+        client.force_login(supervisor)
+        page = client.get(reverse('supervisor_dashboard')).content
+        page_gzipped = client.get(reverse('supervisor_dashboard'), headers={'Accept-Encoding': 'gzip'})
+        if page_gzipped.get('Content-Encoding') == 'gzip':
+            page_gz = len(page_gzipped.content)
+        else:
+            # Not compressed by the site: report what gzip would make of it
+            page_gz = len(gzip.compress(page))
+        return (
+            f'{count:>6} {len(all_cards) / len(cards):>8.0f} {len(page):>9} {page_gz:>10} '
+            f'{len(all_cards):>12} {len(gzip.compress(all_cards)):>15}'
+            f'   (page shows {min(count, PAGE_SIZE)} cards)'
+        )
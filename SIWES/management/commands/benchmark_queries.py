@@ -0,0 +1,94 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from SIWES.models import CustomUser, Submission
+from SIWES.pagination import PAGE_SIZE, CursorPage
+from SIWES.review import supervised_submissions
+from SIWES.seeding import seed_cohort
+from SIWES.views import SUPERVISOR_CARD_FIELDS, SUPERVISOR_LOG_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a realistic cohort and print EXPLAIN plans and timings for the hot Submission '
+        'queries, first with the access-path indexes and then with them dropped. '
+        'Everything is rolled back afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supervisors', type=int, default=20)
+        parser.add_argument('--students', type=int, default=40, help='Students per supervisor')
+        parser.add_argument('--days', type=int, default=120, help='Days of logs per student')
+        parser.add_argument('--repeat', type=int, default=15, help='Timed runs per query')
+        parser.add_argument('--no-plans', action='store_true', help='Only print timings')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded cohort instead of rolling back')
+
+    def hot_queries(self, supervisor, student):
+        """The Submission queries behind each view, as the views build them."""
+        supervised = supervised_submissions(supervisor)
+        newest_first = ('-date', '-id')
+        cards = supervised.select_related('student').only(*SUPERVISOR_CARD_FIELDS)
+        first_page = CursorPage(cards)
+        list(first_page)
+        week_start = timezone.now() - timedelta(days=7)
+        return [
+            ('student_dashboard', Submission.objects.filter(student=student).order_by(*newest_first)),
+            ('supervisor_dashboard first page', cards.order_by(*newest_first)[:PAGE_SIZE + 1]),
+            ('supervisor_dashboard next page', CursorPage(cards, first_page.next_cursor).queryset[:PAGE_SIZE + 1]),
+            ('supervisor_dashboard pending', cards.filter(approved=False).order_by(*newest_first)[:PAGE_SIZE + 1]),
+            ('supervisor_logs student filter', supervised.filter(matric_number=student.matric_number)
+                .only(*SUPERVISOR_LOG_FIELDS).order_by(*newest_first)[:PAGE_SIZE + 1]),
+            ('supervisor_logs last week', supervised.filter(date__gte=week_start)
+                .only(*SUPERVISOR_LOG_FIELDS).order_by(*newest_first)[:PAGE_SIZE + 1]),
+            ('bulk review pending for student', supervised.filter(matric_number=student.matric_number, approved=False)
+                .values_list('id', 'student_id')),
+        ]
+
+    def measure(self, queries, repeat, show_plans, label):
+        timings = {}
+        for name, queryset in queries:
+            if show_plans:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'[{label}] {name}'))
+                self.stdout.write(queryset.explain())
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(runs)
+        return timings
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            supervisor_ids, student_ids = seed_cohort(
+                supervisors=options['supervisors'], students_per_supervisor=options['students'],
+                days=options['days'], stdout=self.stdout,
+            )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            supervisor = CustomUser.objects.get(pk=supervisor_ids[len(supervisor_ids) // 2])
+            student = CustomUser.objects.get(pk=student_ids[len(student_ids) // 2])
+            queries = self.hot_queries(supervisor, student)
+
+            # Drop the indexes inside a savepoint so rolling it back restores them
+            with transaction.atomic():
+                after = self.measure(queries, options['repeat'], not options['no_plans'], 'with indexes')
+                with connection.cursor() as cursor:
+                    for index in Submission._meta.indexes:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+                before = self.measure(queries, options['repeat'], not options['no_plans'], 'without indexes')
+                transaction.set_rollback(True)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"\n{'query':<34} {'without (ms)':>13} {'with (ms)':>10} {'speedup':>8}"
+            ))
+            for name, _ in queries:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f'{name:<34} {before[name]:>13.2f} {after[name]:>10.2f} {speedup:>7.1f}x')
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from contextlib import suppress
+from datetime import date, timedelta
+from io import BytesIO
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+
+from SIWES import urls
+from SIWES.archive import archive_session
+from SIWES.images import preview_name
+from SIWES.models import ChunkedUpload, CustomUser, SiwesSession, Submission
+from SIWES.review import bulk_approve, supervised_submissions
+from SIWES.uploads import start_upload
+
+# Size of the body sent to the chunk and finalize scenarios
+UPLOAD_BYTES = 256 * 1024
+# Logs in the archived session read by the archive scenario
+ARCHIVED_LOGS = 20
+ARCHIVED_SESSION = 'benchmark-session'
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every route in SIWES/urls.py with the test client, logged in as the role the '
+        'route is for, against a cohort made by seed_cohort. Reports p50/p95/p99 latency, '
+        'queries and response bytes per route, and writes them as JSON to diff between commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='BENCH', help='Prefix of the seeded cohort to log in as')
+        parser.add_argument('--password', default='logtrack-bench', help='Password the cohort was seeded with')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per route')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per route first')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--only', nargs='*', default=(), help='Only run scenarios whose name contains one of these')
+        parser.add_argument('--output', default='route-benchmark.json', help="JSON results file, or '-' for none")
+
+    def scenarios(self):
+        """
+        (name, route, method, role, prepare) for every request we time.
+
+        ``prepare`` runs untimed before each request and returns the path and request
+        arguments, so routes that consume what they touch (deletes, uploads, logout) get
+        a fresh object every time. Roles are None for anonymous, 'student' or 'supervisor'.
+        """
+        student, supervisor = self.student, self.supervisor
+        uidb64 = urlsafe_base64_encode(force_bytes(student.pk))
+        token = default_token_generator.make_token(student)
+
+        def get(name, *args, query=None):
+            return lambda: {'path': reverse(name, args=args), 'data': query}
+
+        def login_post():
+            # A client of its own, so the anonymous client stays logged out
+            return {'path': reverse('login'), 'data': {'username': student.email, 'password': self.password},
+                    'client': Client()}
+
+        def logout():
+            client = Client()
+            client.force_login(student)
+            return {'path': reverse('logout'), 'client': client}
+
+        def new_log():
+            return {'path': reverse('student_dashboard'),
+                    'data': {'overview': 'Benchmark log', 'text': 'Worked on the route benchmark.'}}
+
+        def delete_log():
+            submission = self.new_pending()
+            return {'path': reverse('delete_submission', args=[submission.pk])}
+
+        def upload_start():
+            return {'path': reverse('upload_start'), 'data': {'filename': 'benchmark.bin', 'size': UPLOAD_BYTES}}
+
+        def upload_chunk():
+            upload = start_upload(student, 'benchmark.bin', UPLOAD_BYTES)
+            return {'path': reverse('upload_chunk', args=[upload.pk]), 'data': b'x' * UPLOAD_BYTES,
+                    'content_type': 'application/octet-stream', 'headers': {'Upload-Offset': '0'}}
+
+        def upload_finalize():
+            upload = start_upload(student, 'benchmark.bin', UPLOAD_BYTES)
+            ChunkedUpload.objects.filter(pk=upload.pk).update(offset=UPLOAD_BYTES)
+            return {'path': reverse('upload_finalize', args=[upload.pk])}
+
+        def edit_remark():
+            return {'path': reverse('ajax_edit_remark', args=[self.pending.pk]), 'data': {'remark': 'Benchmark remark'}}
+
+        def bulk_review():
+            ids = [self.new_pending().pk for _ in range(5)]
+            return {'path': reverse('bulk_review'), 'data': {'ids': ids, 'action': 'approve'}}
+
+        def api_unchanged():
+            # A poll that revalidates the page it already has
+            client = Client()
+            client.force_login(supervisor)
+            path = reverse('api_supervisor_submissions')
+            etag = client.get(path).headers['ETag']
+            return {'path': path, 'client': client, 'headers': {'If-None-Match': etag}}
+
+        def events():
+            # Time from connecting to receiving the card of a submission approved meanwhile
+            submission = self.new_pending()
+            return {'path': reverse('supervisor_events'), 'until_event': lambda: bulk_approve(
+                supervisor, supervised_submissions(supervisor).filter(pk=submission.pk),
+            )}
+
+        return [
+            ('landing', 'landing', 'GET', None, get('landing')),
+            ('login', 'login', 'GET', None, get('login')),
+            ('login:post', 'login', 'POST', None, login_post),
+            ('register', 'register', 'GET', None, get('register')),
+            ('rules', 'rules', 'GET', None, get('rules')),
+            ('password_reset', 'password_reset', 'GET', None, get('password_reset')),
+            ('password_reset_done', 'password_reset_done', 'GET', None, get('password_reset_done')),
+            ('password_reset_confirm', 'password_reset_confirm', 'GET', None, get('password_reset_confirm', uidb64, token)),
+            ('password_reset_complete', 'password_reset_complete', 'GET', None, get('password_reset_complete')),
+            ('accounts/login/', 'accounts/login/', 'GET', None, lambda: {'path': '/accounts/login/'}),
+            ('logout', 'logout', 'POST', 'student', logout),
+            ('student_dashboard', 'student_dashboard', 'GET', 'student', get('student_dashboard')),
+            ('student_dashboard:post', 'student_dashboard', 'POST', 'student', new_log),
+            ('student_dashboard:pdf', 'student_dashboard', 'GET', 'student', get('student_dashboard', query={'export': 'pdf'})),
+            ('edit_submission', 'edit_submission', 'GET', 'student', get('edit_submission', self.pending.pk)),
+            ('delete_submission', 'delete_submission', 'POST', 'student', delete_log),
+            ('attachment_preview', 'attachment_preview', 'GET', 'supervisor', get('attachment_preview', self.attachment.pk)),
+            ('upload_start', 'upload_start', 'POST', 'student', upload_start),
+            ('upload_chunk', 'upload_chunk', 'POST', 'student', upload_chunk),
+            ('upload_finalize', 'upload_finalize', 'POST', 'student', upload_finalize),
+            ('supervisor_dashboard', 'supervisor_dashboard', 'GET', 'supervisor', get('supervisor_dashboard')),
+            ('supervisor_dashboard:pending', 'supervisor_dashboard', 'GET', 'supervisor',
+                get('supervisor_dashboard', query={'status': 'pending'})),
+            ('supervisor_dashboard:csv', 'supervisor_dashboard', 'GET', 'supervisor',
+                get('supervisor_dashboard', query={'export': 'csv'})),
+            ('ajax_edit_remark', 'ajax_edit_remark', 'POST', 'supervisor', edit_remark),
+            ('bulk_review', 'bulk_review', 'POST', 'supervisor', bulk_review),
+            ('supervisor_events', 'supervisor_events', 'GET', 'supervisor', events),
+            ('supervisor_logs', 'supervisor_logs', 'GET', 'supervisor', get('supervisor_logs')),
+            ('supervisor_logs:search', 'supervisor_logs', 'GET', 'supervisor',
+                get('supervisor_logs', query={'q': 'log'})),
+            ('supervisor_logs:student', 'supervisor_logs', 'GET', 'supervisor',
+                get('supervisor_logs', query={'student': student.matric_number})),
+            ('supervisor_logs:pdf', 'supervisor_logs', 'GET', 'supervisor',
+                get('supervisor_logs', query={'student': student.matric_number, 'export': 'pdf'})),
+            ('api_student_submissions', 'api_student_submissions', 'GET', 'student', get('api_student_submissions')),
+            ('api_supervisor_submissions', 'api_supervisor_submissions', 'GET', 'supervisor',
+                get('api_supervisor_submissions')),
+            ('api_supervisor_submissions:304', 'api_supervisor_submissions', 'GET', 'supervisor', api_unchanged),
+            ('api_archived_submissions', 'api_archived_submissions', 'GET', 'supervisor',
+                get('api_archived_submissions', ARCHIVED_SESSION)),
+            ('health_db', 'health_db', 'GET', None, get('health_db')),
+        ]
+
+    def new_pending(self):
+        return Submission.objects.create(
+            student=self.student, matric_number=self.student.matric_number,
+            overview='Benchmark log', text='Created for the route benchmark.',
+        )
+
+    def new_archived_session(self):
+        """A session long past holding a few of the student's logs, archived into a scratch archive storage."""
+        SiwesSession.objects.filter(slug=ARCHIVED_SESSION).delete()
+        session = SiwesSession.objects.create(
+            name='Benchmark session', slug=ARCHIVED_SESSION, starts_on=date(2000, 1, 1), ends_on=date(2000, 12, 31),
+            closed=True,
+        )
+        start = session.bounds[0]
+        for day in range(ARCHIVED_LOGS):
+            Submission.objects.filter(pk=self.new_pending().pk).update(date=start + timedelta(days=day))
+        archive_session(session)
+        return session
+
+    def check_coverage(self, scenarios):
+        covered = {route for _, route, _, _, _ in scenarios}
+        missing = [pattern.name or str(pattern.pattern) for pattern in urls.urlpatterns
+                   if (pattern.name or str(pattern.pattern)) not in covered]
+        if missing:
+            raise CommandError(f"No benchmark scenario for: {', '.join(missing)}. Add one to scenarios().")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix'].lower()
+        self.password = options['password']
+        self.supervisor = CustomUser.objects.filter(username__startswith=f'{prefix}-sup', students__isnull=False).first()
+        if self.supervisor is None:
+            raise CommandError(f'No cohort with prefix {options["prefix"]}; run seed_cohort first.')
+        self.student = self.supervisor.students.order_by('pk').first()
+        self.pending = self.new_pending()
+        self.attachment = self.new_pending()
+        image = BytesIO()
+        Image.new('RGB', (1600, 1200), 'steelblue').save(image, 'PNG')
+        self.attachment.file.save('benchmark-evidence.png', ContentFile(image.getvalue()))
+        archive_root = tempfile.mkdtemp(prefix='logtrack-benchmark-')
+        archive_storage = override_settings(STORAGES={
+            **settings.STORAGES,
+            'archive': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': archive_root}},
+        })
+        archive_storage.enable()
+        self.new_archived_session()
+
+        scenarios = self.scenarios()
+        self.check_coverage(scenarios)
+        if options['only']:
+            scenarios = [s for s in scenarios if any(part in s[0] for part in options['only'])]
+        clients = {None: Client(), 'student': Client(), 'supervisor': Client()}
+        clients['student'].force_login(self.student)
+        clients['supervisor'].force_login(self.supervisor)
+
+        results = {}
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'scenario':<30} {'code':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>6} {'bytes':>11}"
+        ))
+        try:
+            # The test client's host is only allowed in tests
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for name, route, method, role, prepare in scenarios:
+                    for _ in range(options['warmup']):
+                        self.request(clients[role], method, prepare(), options['cold'])
+                    samples = [self.request(clients[role], method, prepare(), options['cold'])
+                               for _ in range(options['repeat'])]
+                    results[name] = self.summarize(route, method, role, samples)
+                    self.stdout.write(self.format_row(name, results[name]))
+        finally:
+            ChunkedUpload.objects.filter(owner=self.student).delete()
+            self.attachment.file.storage.delete(preview_name(self.attachment.file.name))
+            self.attachment.file.delete(save=False)
+            Submission.objects.filter(student=self.student, overview='Benchmark log').delete()
+            # Deleting the archived session also takes its logs out of the student's StudentStats
+            SiwesSession.objects.filter(slug=ARCHIVED_SESSION).delete()
+            shutil.rmtree(archive_root)
+            archive_storage.disable()
+
+        if options['output'] != '-':
+            with open(options['output'], 'w') as out:
+                json.dump({'meta': self.meta(options), 'routes': results}, out, indent=2, sort_keys=True)
+                out.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def request(self, client, method, spec, cold):
+        client = spec.get('client', client)
+        kwargs = {'data': spec.get('data'), 'headers': spec.get('headers')}
+        if 'content_type' in spec:
+            kwargs['content_type'] = spec['content_type']
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method.lower())(spec['path'], **kwargs)
+            # Streaming responses do their work as they are consumed
+            if not response.streaming:
+                body = response.content
+            elif 'until_event' in spec:
+                body = async_to_sync(self.afirst_event)(response.streaming_content, spec['until_event'])
+            elif response.is_async:
+                body = async_to_sync(self.aread)(response.streaming_content)
+            else:
+                body = b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return elapsed * 1000, len(queries), len(body), response.status_code
+
+    @staticmethod
+    async def aread(chunks):
+        return b''.join([chunk async for chunk in chunks])
+
+    @staticmethod
+    async def afirst_event(chunks, trigger):
+        """Read an event stream up to its first event, running ``trigger`` once it is open."""
+        chunks = aiter(chunks)
+        body = await anext(chunks)
+        await sync_to_async(trigger)()
+        async for chunk in chunks:
+            body += chunk
+            if chunk.startswith(b'event:'):
+                break
+        # Hang up the way the ASGI handler does when a client leaves: cancel the pending read,
+        # so the stream unwinds and unsubscribes
+        pending = asyncio.ensure_future(anext(chunks))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with suppress(asyncio.CancelledError, StopAsyncIteration):
+            await pending
+        return body
+
+    @staticmethod
+    def summarize(route, method, role, samples):
+        latencies = [sample[0] for sample in samples]
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = latencies[0]
+        return {
+            'route': route, 'method': method, 'role': role or 'anonymous',
+            'p50_ms': round(p50, 2), 'p95_ms': round(p95, 2), 'p99_ms': round(p99, 2),
+            'queries': statistics.median_low([sample[1] for sample in samples]),
+            'bytes': statistics.median_low([sample[2] for sample in samples]),
+            'status': Counter(sample[3] for sample in samples).most_common(1)[0][0],
+        }
+
+    def format_row(self, name, result):
+        return (
+            f"{name:<30} {result['status']:>4} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['queries']:>4} q {result['bytes']:>9} B"
+        )
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit, 'database': connection.vendor, 'cache': 'cold' if options['cold'] else 'warm',
+            'prefix': options['prefix'], 'repeat': options['repeat'], 'warmup': options['warmup'],
+            'students': self.supervisor.students.count(),
+            'submissions': Submission.objects.filter(student__supervisor=self.supervisor).count(),
+        }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from SIWES.images import build_static_variants, static_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Write resized WebP variants of the PNG/JPEG images in SIWES/static/images for the '
+        'responsive_image tag. Run before collectstatic; unchanged images are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild every variant')
+
+    def handle(self, *args, **options):
+        written = build_static_variants(force=options['force'])
+        static_variants.cache_clear()
+        variants = sum(len(widths) for widths in static_variants().values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{written} variants written; {variants} variants of {len(static_variants())} images indexed.'
+        ))
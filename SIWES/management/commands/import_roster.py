@@ -0,0 +1,52 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from SIWES.mapping import map_students
+from SIWES.roster import RosterError, load_roster
+
+
+class Command(BaseCommand):
+    help = (
+        'Create students and supervisors from a CSV or XLSX roster (see SIWES/roster.py for the '
+        'columns). Nothing is imported if any row is invalid. Users without a password column '
+        'get a set-password link, written to --links.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help='Path to a .csv or .xlsx file')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the roster')
+        parser.add_argument('--workers', type=int, help='Processes for password hashing (default: all CPUs)')
+        parser.add_argument('--links', default='set-password-links.csv', help='Where to write the set-password links')
+        parser.add_argument('--base-url', default='', help='Prepended to the links, e.g. https://logtrack.example.com')
+        parser.add_argument('--map', action='store_true', help='Then map unassigned students to supervisors by lecturer ID')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['roster'], 'rb') as roster:
+                result = load_roster(roster, options['roster'], options['workers'], options['dry_run'])
+        except (OSError, RosterError) as exc:
+            raise CommandError(str(exc))
+        if result.errors:
+            for line, message in result.errors:
+                self.stderr.write(f'line {line}: {message}')
+            raise CommandError(f'{len(result.errors)} problems in the roster; nothing was imported.')
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Dry run: {result.students} students and {result.supervisors} supervisors would be imported.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.students} students and {result.supervisors} supervisors '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+        if result.links:
+            with open(options['links'], 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(['email', 'set_password_url'])
+                writer.writerows((email, options['base_url'] + path) for email, path in result.links)
+            self.stdout.write(f"Wrote {len(result.links)} set-password links to {options['links']}.")
+        if options['map']:
+            self.stdout.write(map_students().summary())
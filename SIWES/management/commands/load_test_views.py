@@ -0,0 +1,192 @@
+import asyncio
+import random
+import statistics
+import string
+import sys
+import time
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from SIWES.models import CustomUser
+from SIWES.seeding import seed_cohort
+
+HOST = '127.0.0.1'
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the dashboards and review endpoints in-process, once as a single sync '
+        'WSGI worker handling one request at a time and once as a single ASGI process with '
+        '--concurrency requests in flight, and compare throughput and latency. '
+        'Use --db-latency-ms to simulate a remote database against a local one.'
+    )
+    # Seconds added to every query, to stand in for the round-trip to a remote database
+    latency = 0
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Requests per run')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight under ASGI')
+        parser.add_argument('--db-latency-ms', type=float, default=0, help='Delay added to every query')
+        parser.add_argument('--supervisors', type=int, default=2)
+        parser.add_argument('--students', type=int, default=20, help='Students per supervisor')
+        parser.add_argument('--days', type=int, default=20, help='Days of logs per student')
+        parser.add_argument('--mode', choices=('both', 'wsgi', 'asgi'), default='both')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded users and logs')
+
+    def handle(self, *args, **options):
+        prefix = 'LOAD' + ''.join(random.choices(string.ascii_uppercase, k=4))
+        supervisor_ids, student_ids = seed_cohort(
+            supervisors=options['supervisors'], students_per_supervisor=options['students'],
+            days=options['days'], prefix=prefix, stdout=self.stdout,
+        )
+        try:
+            plan = self.build_plan(supervisor_ids, student_ids, options['requests'], options['seed'])
+            self.latency = options['db_latency_ms'] / 1000
+            if self.latency:
+                connection_created.connect(self.add_latency, weak=False, dispatch_uid='load_test_latency')
+            results = {}
+            if options['mode'] in ('both', 'wsgi'):
+                results['wsgi (1 sync worker)'] = self.run_wsgi(plan)
+            if options['mode'] in ('both', 'asgi'):
+                results[f"asgi ({options['concurrency']} in flight)"] = asyncio.run(self.run_asgi(plan, options['concurrency']))
+            self.report(results)
+        finally:
+            connection_created.disconnect(dispatch_uid='load_test_latency')
+            for connection in connections.all():
+                if self.delay in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(self.delay)
+            if not options['keep']:
+                CustomUser.objects.filter(pk__in=student_ids + supervisor_ids).delete()
+
+    def delay(self, execute, sql, params, many, context):
+        time.sleep(self.latency)
+        return execute(sql, params, many, context)
+
+    def add_latency(self, sender, connection, **kwargs):
+        # Wrappers outlive reconnects, so only add it the first time a connection opens
+        if self.delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.delay)
+
+    def build_plan(self, supervisor_ids, student_ids, count, seed):
+        """A fixed mix of requests: students viewing and posting logs, supervisors reviewing."""
+        sessions = {}
+        for user in CustomUser.objects.filter(pk__in=supervisor_ids + student_ids):
+            client = Client()
+            client.force_login(user)
+            sessions[user.pk] = (user, client.cookies['sessionid'].value)
+        rng = random.Random(seed)
+        plan = []
+        for n in range(count):
+            roll = rng.random()
+            if roll < 0.45:
+                _, session = sessions[rng.choice(student_ids)]
+                plan.append(('GET', '/student/dashboard/', '', session))
+            elif roll < 0.65:
+                _, session = sessions[rng.choice(student_ids)]
+                body = urlencode({'overview': f'Load test log {n}', 'text': 'Worked on the load test.'})
+                plan.append(('POST', '/student/dashboard/', body, session))
+            elif roll < 0.85:
+                _, session = sessions[rng.choice(supervisor_ids)]
+                plan.append(('GET', '/supervisor/dashboard/', '', session))
+            elif roll < 0.95:
+                _, session = sessions[rng.choice(supervisor_ids)]
+                plan.append(('GET', '/supervisor/logs/', '', session))
+            else:
+                user, session = sessions[rng.choice(supervisor_ids)]
+                matric = CustomUser.objects.filter(supervisor=user).values_list('matric_number', flat=True).first()
+                body = urlencode({'student': matric, 'action': 'approve'})
+                plan.append(('POST', '/supervisor/ajax/bulk_review/', body, session))
+        return plan
+
+    @staticmethod
+    def headers(session, body):
+        # An unmasked CSRF secret is accepted in the header when it matches the cookie
+        csrf = 'a' * 32
+        headers = {'Cookie': f'sessionid={session}; csrftoken={csrf}', 'X-CSRFToken': csrf}
+        if body:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['Content-Length'] = str(len(body))
+        return headers
+
+    def run_wsgi(self, plan):
+        application = get_wsgi_application()
+        latencies, statuses = [], []
+        started = time.perf_counter()
+        for method, path, body, session in plan:
+            environ = {
+                'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(body.encode()), 'wsgi.errors': sys.stderr,
+                'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+            }
+            for name, value in self.headers(session, body).items():
+                key = name.upper().replace('-', '_')
+                environ[key if key in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{key}'] = value
+            status = []
+            request_started = time.perf_counter()
+            response = application(environ, lambda code, headers, exc_info=None: status.append(code))
+            for _ in response:
+                pass
+            response.close()
+            latencies.append(time.perf_counter() - request_started)
+            statuses.append(int(status[0].split()[0]))
+        return time.perf_counter() - started, latencies, statuses
+
+    async def run_asgi(self, plan, concurrency):
+        application = get_asgi_application()
+        slots = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], []
+
+        async def call(method, path, body, session):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+                'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+                'headers': [(name.lower().encode(), value.encode()) for name, value in self.headers(session, body).items()]
+                + [(b'host', HOST.encode())],
+                'server': (HOST, 80), 'client': (HOST, 50000),
+            }
+            done = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': body.encode(), 'more_body': False}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                    done.set()
+
+            async with slots:
+                request_started = time.perf_counter()
+                await application(scope, receive, send)
+                latencies.append(time.perf_counter() - request_started)
+                statuses.append(status[0])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call(*request) for request in plan))
+        return time.perf_counter() - started, latencies, statuses
+
+    def report(self, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{'server':<24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        ))
+        for name, (elapsed, latencies, statuses) in results.items():
+            quantiles = statistics.quantiles([latency * 1000 for latency in latencies], n=100)
+            errors = sum(1 for status in statuses if status >= 400)
+            self.stdout.write(
+                f'{name:<24} {len(latencies) / elapsed:>8.1f} {quantiles[49]:>8.1f} {quantiles[94]:>8.1f} '
+                f'{quantiles[98]:>8.1f} {errors:>7}'
+            )
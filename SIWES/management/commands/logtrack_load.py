@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from SIWES.transfer import TransferError, load
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a logtrack_dump directory into an empty, migrated database, keeping the ids, '
+        'and copy its attachments into media storage. Attachments already stored with the '
+        'same size are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory written by logtrack_dump')
+        parser.add_argument('--no-media', action='store_true', help="Don't copy the attachments")
+
+    def handle(self, *args, **options):
+        try:
+            result = load(options['directory'], media=not options['no_media'])
+        except TransferError as exc:
+            raise CommandError(str(exc))
+        seconds = result['seconds']
+        for name, count in result['tables'].items():
+            self.stdout.write(f'{name}: {count} rows in {seconds[name]:.1f} s')
+        self.stdout.write(f"Rebuilt stats and the search index in {seconds['rebuild']:.1f} s")
+        if 'attachments' in result:
+            attachments = result['attachments']
+            self.stdout.write(
+                f"attachments: {attachments['count']} ({attachments['bytes'] / 1024 / 1024:.1f} MiB), "
+                f"{attachments['copied']} copied in {seconds['media']:.1f} s"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Loaded {options['directory']} in {seconds['total']:.1f} s."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from SIWES.mapping import map_students
+from SIWES.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Assign students to the supervisor whose lecturer ID prefixes their matric number, '
+        'in one transaction. Use --dry-run to list the assignments and conflicts first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report without changing anything')
+        parser.add_argument('--reassign', action='store_true', help='Also move students who already have another supervisor')
+        parser.add_argument('--lecturer-id', nargs='*', help='Only assign students to these lecturers')
+
+    def handle(self, *args, **options):
+        supervisors = None
+        if options['lecturer_id']:
+            supervisors = CustomUser.objects.filter(lecturer_id__in=options['lecturer_id'])
+        plan = map_students(supervisors, reassign=options['reassign'], dry_run=options['dry_run'])
+        for supervisor_id, count in sorted(plan.per_supervisor.items(), key=lambda item: plan.supervisor_names[item[0]]):
+            self.stdout.write(f'{plan.supervisor_names[supervisor_id]:<40} {count:>6}')
+        for conflict in plan.conflicts:
+            self.stdout.write(self.style.WARNING(f'[{conflict.kind}] {conflict.message}'))
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefix}{plan.summary()}'))
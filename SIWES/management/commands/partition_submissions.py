@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from SIWES.partitions import partition_submission_table, unpartition_submission_table
+
+
+class Command(BaseCommand):
+    help = (
+        'Partition the submission table by SIWES session (PostgreSQL only; see SIWES.partitions). '
+        'Every row is copied under an exclusive lock, so run it in a maintenance window, after a backup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--undo', action='store_true', help='Turn the partitioned table back into a plain one')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='The database to partition')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError(f'Only PostgreSQL tables can be partitioned, not {connection.vendor} ones.')
+        if options['undo']:
+            done = unpartition_submission_table(connection)
+            self.stdout.write(self.style.SUCCESS('Unpartitioned the submission table.') if done
+                              else 'The submission table is not partitioned.')
+        else:
+            done = partition_submission_table(connection)
+            self.stdout.write(self.style.SUCCESS('Partitioned the submission table by session.') if done
+                              else 'The submission table is already partitioned.')
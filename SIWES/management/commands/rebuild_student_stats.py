@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from SIWES.stats import rebuild_student_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-student submission statistics table from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='student_ids', help='Only rebuild this student id (repeatable)')
+
+    def handle(self, *args, **options):
+        count = rebuild_student_stats(options['student_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} students.'))
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from SIWES.analytics import clear_rollups, rollup_days, rolled_up_through
+
+
+class Command(BaseCommand):
+    help = (
+        'Add the daily analytics rollups for every closed day since the last run. Run it '
+        'daily, after midnight; each run only reads the logs of the days it adds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Recompute the rollups from this day (YYYY-MM-DD) on')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every rollup from the first log on')
+
+    def handle(self, *args, **options):
+        if options['rebuild'] or options['since']:
+            clear_rollups(None if options['rebuild'] else options['since'])
+        days = rollup_days()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {days} days; the rollups now run through {rolled_up_through() or "no day yet"}.'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from SIWES.seeding import cohort_exists, delete_cohort, seed_cohort
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic cohort for benchmarks: supervisors, their students, and a log per '
+        'student per working day, some with attachments. Users are named after --prefix.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supervisors', type=int, default=5)
+        parser.add_argument('--students', type=int, default=40, help='Students per supervisor')
+        parser.add_argument('--days', type=int, default=120, help='Days of logs per student')
+        parser.add_argument('--attachment-every', type=int, default=10, help='Attach a file to every Nth log (0 for none)')
+        parser.add_argument('--approved-ratio', type=float, default=0.8, help='Share of logs older than a week that are approved')
+        parser.add_argument('--skip-ratio', type=float, default=0.1, help='Share of working days without a log')
+        parser.add_argument('--prefix', default='BENCH')
+        parser.add_argument('--password', default='logtrack-bench', help='Password for every seeded user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable cohorts')
+        parser.add_argument('--replace', action='store_true', help='Delete an existing cohort with this prefix first')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if cohort_exists(prefix):
+            if not options['replace']:
+                raise CommandError(f'A cohort with prefix {prefix} already exists; pass --replace or another --prefix.')
+            self.stdout.write(f'Deleted {delete_cohort(prefix)} rows of the previous {prefix} cohort.')
+        seed_cohort(
+            supervisors=options['supervisors'], students_per_supervisor=options['students'], days=options['days'],
+            prefix=prefix, password=options['password'], approved_ratio=options['approved_ratio'],
+            skip_ratio=options['skip_ratio'], seed=options['seed'], attachment_every=options['attachment_every'],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Log in as {prefix.lower()}.sup0@bench.logtrack.local or {prefix.lower()}.stu0.0@bench.logtrack.local '
+            f'with password {options["password"]!r}.'
+        ))
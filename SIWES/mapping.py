@@ -0,0 +1,141 @@
+"""
+Set-based mapping of students to supervisors by lecturer ID.
+
+A student belongs to the supervisor whose ``lecturer_id`` is a prefix of their matric
+number. ``plan_mapping`` resolves every student against every lecturer ID in memory,
+from two queries, and ``apply_mapping`` writes the result with batched updates in one
+transaction, so assigning a whole session's cohort costs a handful of statements
+rather than a count and an update per supervisor.
+
+Where lecturer IDs overlap (``CSC`` and ``CSC01``) the longest prefix wins, and the
+overlap is reported as a conflict so it can be checked in a dry run first.
+"""
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from .auth import forget_users
+from .models import CustomUser
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class Conflict:
+    kind: str
+    message: str
+
+
+@dataclass
+class MappingPlan:
+    # student id -> supervisor id, only for students whose supervisor changes
+    assignments: dict = field(default_factory=dict)
+    conflicts: list = field(default_factory=list)
+    per_supervisor: Counter = field(default_factory=Counter)
+    supervisor_names: dict = field(default_factory=dict)
+    already_mapped: int = 0
+    unmatched: int = 0
+
+    def summary(self):
+        return (
+            f'{len(self.assignments)} students to assign, {self.already_mapped} already with their supervisor, '
+            f'{self.unmatched} matching no lecturer ID, {len(self.conflicts)} conflicts.'
+        )
+
+
+def _longest_prefix_match(prefixes, lengths, matric_number):
+    for length in lengths:
+        supervisor_id = prefixes.get(matric_number[:length])
+        if supervisor_id is not None:
+            return supervisor_id
+    return None
+
+
+def plan_mapping(supervisors=None, reassign=False):
+    """
+    Work out which students move to which supervisor, without writing anything.
+
+    ``supervisors`` limits the assignments to those supervisors, but every supervisor's
+    lecturer ID still takes part in the matching, so a more specific lecturer elsewhere
+    keeps their students. Students who already have a different supervisor are left
+    alone, and counted as conflicts, unless ``reassign`` is set.
+    """
+    plan = MappingPlan()
+    all_supervisors = CustomUser.objects.filter(user_type='supervisor').exclude(lecturer_id__isnull=True)
+    prefixes, owners = {}, defaultdict(list)
+    for supervisor_id, lecturer_id, email in all_supervisors.values_list('pk', 'lecturer_id', 'email'):
+        lecturer_id = lecturer_id.strip()
+        if not lecturer_id:
+            continue
+        owners[lecturer_id].append(email)
+        prefixes.setdefault(lecturer_id, supervisor_id)
+        plan.supervisor_names[supervisor_id] = email
+    selected = None
+    if supervisors is not None:
+        selected = set(supervisors.filter(user_type='supervisor').values_list('pk', flat=True))
+
+    for lecturer_id, emails in owners.items():
+        if len(emails) > 1:
+            plan.conflicts.append(Conflict(
+                'duplicate', f"Lecturer ID {lecturer_id} is shared by {', '.join(emails)}; students go to {emails[0]}.",
+            ))
+    for longer in sorted(prefixes):
+        for shorter in (longer[:length] for length in range(1, len(longer))):
+            if shorter in prefixes:
+                plan.conflicts.append(Conflict(
+                    'overlap', f'Lecturer ID {shorter} overlaps {longer}; students matching {longer} go to '
+                    f'{plan.supervisor_names[prefixes[longer]]}.',
+                ))
+
+    lengths = sorted({len(prefix) for prefix in prefixes}, reverse=True)
+    reassigned = Counter()
+    students = CustomUser.objects.filter(user_type='student').exclude(matric_number__isnull=True)
+    for student_id, matric_number, current in students.values_list('pk', 'matric_number', 'supervisor_id'):
+        supervisor_id = _longest_prefix_match(prefixes, lengths, matric_number.strip())
+        if supervisor_id is None:
+            plan.unmatched += 1
+        elif supervisor_id == current:
+            plan.already_mapped += 1
+        elif selected is not None and supervisor_id not in selected:
+            continue
+        elif current is not None and not reassign:
+            reassigned[(current, supervisor_id)] += 1
+        else:
+            plan.assignments[student_id] = supervisor_id
+            plan.per_supervisor[supervisor_id] += 1
+    for (current, supervisor_id), count in reassigned.items():
+        plan.conflicts.append(Conflict(
+            'assigned', f'{count} students matching {plan.supervisor_names[supervisor_id]} are assigned to '
+            f'{plan.supervisor_names.get(current, "a supervisor without a lecturer ID")}; left as they are.',
+        ))
+    return plan
+
+
+def apply_mapping(plan):
+    """Write ``plan``'s assignments with batched updates in one transaction. Returns the count."""
+    students = [CustomUser(pk=student_id, supervisor_id=supervisor_id) for student_id, supervisor_id in plan.assignments.items()]
+    with transaction.atomic():
+        CustomUser.objects.bulk_update(students, ['supervisor'], batch_size=BATCH_SIZE)
+        forget_users(plan.assignments)
+    return len(students)
+
+
+def map_students(supervisors=None, reassign=False, dry_run=False):
+    """Plan and, unless ``dry_run``, apply the mapping against a consistent view of the users."""
+    with transaction.atomic():
+        plan = plan_mapping(supervisors, reassign=reassign)
+        if not dry_run:
+            apply_mapping(plan)
+    return plan
+
+
+def assign_students(supervisor, students):
+    """Make ``students`` exactly the students of ``supervisor``, in two updates."""
+    student_ids = [student.pk for student in students]
+    with transaction.atomic():
+        released = CustomUser.objects.filter(user_type='student', supervisor=supervisor).exclude(pk__in=student_ids)
+        released_ids = list(released.values_list('pk', flat=True))
+        CustomUser.objects.filter(pk__in=student_ids).update(supervisor=supervisor)
+        CustomUser.objects.filter(pk__in=released_ids).update(supervisor=None)
+        forget_users(student_ids + released_ids)
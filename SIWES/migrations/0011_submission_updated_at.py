@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SIWES", "0010_customuser_department"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import ExtractIsoWeekDay, TruncDate
+
+
+def backfill_student_stats(apps, schema_editor):
+    CustomUser = apps.get_model("SIWES", "CustomUser")
+    Submission = apps.get_model("SIWES", "Submission")
+    StudentStats = apps.get_model("SIWES", "StudentStats")
+    counts = {
+        row["student_id"]: row
+        for row in Submission.objects.values("student_id").annotate(
+            total=Count("id"),
+            approved=Count("id", filter=Q(approved=True)),
+            first=Min("date"),
+            last=Max("date"),
+        )
+    }
+    days_logged = dict(
+        Submission.objects.annotate(day=TruncDate("date"), weekday=ExtractIsoWeekDay("date"))
+        .filter(weekday__lt=6)
+        .values("student_id")
+        .annotate(days=Count("day", distinct=True))
+        .values_list("student_id", "days")
+    )
+    StudentStats.objects.bulk_create(
+        [
+            StudentStats(
+                student_id=student_id,
+                total=counts.get(student_id, {}).get("total", 0),
+                approved=counts.get(student_id, {}).get("approved", 0),
+                first_submission_at=counts.get(student_id, {}).get("first"),
+                last_submission_at=counts.get(student_id, {}).get("last"),
+                days_logged=days_logged.get(student_id, 0),
+            )
+            for student_id in CustomUser.objects.filter(user_type="student").values_list("pk", flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SIWES", "0011_submission_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentStats",
+            fields=[
+                (
+                    "student",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("approved", models.PositiveIntegerField(default=0)),
+                ("first_submission_at", models.DateTimeField(blank=True, null=True)),
+                ("last_submission_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "days_logged",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Distinct working days with at least one log"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Student Stats",
+                "verbose_name_plural": "Student Stats",
+            },
+        ),
+        migrations.RunPython(backfill_student_stats, migrations.RunPython.noop),
+    ]
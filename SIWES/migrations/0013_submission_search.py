@@ -0,0 +1,26 @@
+# Full-text search backends for Submission.overview and Submission.text
+
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from SIWES.search import install_search_backend
+
+    install_search_backend(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from SIWES.search import uninstall_search_backend
+
+    uninstall_search_backend(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SIWES", "0012_studentstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SIWES", "0013_submission_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["student", "-date", "-id"], name="submission_student_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["matric_number", "-date", "-id"], name="submission_matric_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                condition=models.Q(("approved", False)),
+                fields=["student", "-date"],
+                name="submission_pending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:57
+# SIWES sessions; partitioning the submission table by them is opt-in (see SIWES.partitions)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SIWES", "0015_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SiwesSession",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(help_text="e.g. 2025/2026", max_length=50, unique=True)),
+                ("slug", models.SlugField(help_text="Names the archive directory", unique=True)),
+                ("starts_on", models.DateField()),
+                ("ends_on", models.DateField(help_text="Last day of the session, inclusive")),
+                (
+                    "closed",
+                    models.BooleanField(
+                        default=False,
+                        help_text="No more logs or reviews are expected, so the session may be archived",
+                    ),
+                ),
+                ("archived_at", models.DateTimeField(blank=True, null=True)),
+                ("archived_count", models.PositiveIntegerField(default=0, help_text="Logs moved to the archive")),
+            ],
+            options={
+                "verbose_name": "SIWES Session",
+                "verbose_name_plural": "SIWES Sessions",
+                "ordering": ["-starts_on"],
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_reviewed_at(apps, schema_editor):
+    # The time of approval wasn't recorded before; the last update is the closest there is
+    Submission = apps.get_model("SIWES", "Submission")
+    Submission.objects.filter(approved=True, reviewed_at__isnull=True).update(reviewed_at=models.F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SIWES", "0016_siwessession"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DepartmentDay",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("department", models.CharField(blank=True, help_text="Blank for students without a department", max_length=100)),
+                ("students", models.PositiveIntegerField(default=0, help_text="Students in the department when the day was rolled up")),
+                ("students_logged", models.PositiveIntegerField(default=0, help_text="Students with at least one log that day")),
+                ("submissions", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Department Day",
+                "verbose_name_plural": "Department Days",
+            },
+        ),
+        migrations.CreateModel(
+            name="SupervisorDay",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("submissions", models.PositiveIntegerField(default=0, help_text="Logs created by the supervisor's students that day")),
+                ("reviewed", models.PositiveIntegerField(default=0, help_text="Logs approved that day")),
+                ("pending", models.PositiveIntegerField(default=0, help_text="Logs awaiting review at the end of the day")),
+                ("latency_seconds", models.PositiveBigIntegerField(default=0, help_text="Sum of the review latencies of the day's approvals")),
+                ("latency_histogram", models.JSONField(default=list, help_text="Approvals per review latency bucket (SIWES.analytics.LATENCY_BUCKETS)")),
+            ],
+            options={
+                "verbose_name": "Supervisor Day",
+                "verbose_name_plural": "Supervisor Days",
+            },
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="reviewed_at",
+            field=models.DateTimeField(blank=True, help_text="When the submission was approved", null=True),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(fields=["date"], name="submission_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(fields=["reviewed_at"], name="submission_reviewed_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="departmentday",
+            index=models.Index(fields=["day"], name="department_day_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="departmentday",
+            constraint=models.UniqueConstraint(fields=("department", "day"), name="department_day_unique"),
+        ),
+        migrations.AddField(
+            model_name="supervisorday",
+            name="supervisor",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="analytics_days", to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name="supervisorday",
+            index=models.Index(fields=["day"], name="supervisor_day_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="supervisorday",
+            constraint=models.UniqueConstraint(fields=("supervisor", "day"), name="supervisor_day_unique"),
+        ),
+        migrations.RunPython(backfill_reviewed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:34
+# Per-student counts of archived sessions, kept for rebuilding StudentStats (see SIWES.stats)
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SIWES", "0017_analytics_rollups"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("approved", models.PositiveIntegerField(default=0)),
+                ("first_submission_at", models.DateTimeField(blank=True, null=True)),
+                ("last_submission_at", models.DateTimeField(blank=True, null=True)),
+                ("days_logged", models.PositiveIntegerField(default=0, help_text="Distinct working days with at least one log")),
+                ("session", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="archived_stats", to="SIWES.siwessession")),
+                ("student", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="archived_stats", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "verbose_name": "Archived Stats",
+                "verbose_name_plural": "Archived Stats",
+                "constraints": [models.UniqueConstraint(fields=("session", "student"), name="archivedstats_session_student_uniq")],
+            },
+        ),
+    ]
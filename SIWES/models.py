@@ -1,5 +1,10 @@
-from django.db import models
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
 	class Meta:
@@ -25,15 +30,215 @@ class CustomUser(AbstractUser):
 
 # Submission model for student daily logs
 class Submission(models.Model):
+	class Meta:
+		indexes = [
+			# One student's logs newest first, as paged by (date, id) in every dashboard
+			models.Index(fields=['student', '-date', '-id'], name='submission_student_date_idx'),
+			# The student picker in the supervisor views filters by matric number
+			models.Index(fields=['matric_number', '-date', '-id'], name='submission_matric_date_idx'),
+			# Review queues only ever look at the small pending subset
+			models.Index(fields=['student', '-date'], condition=models.Q(approved=False), name='submission_pending_idx'),
+			# The analytics rollup reads one range of days at a time, by log date and by review date
+			models.Index(fields=['date'], name='submission_date_idx'),
+			models.Index(fields=['reviewed_at'], name='submission_reviewed_at_idx'),
+		]
 	student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='submissions')
 	matric_number = models.CharField(max_length=20)
 	overview = models.CharField(max_length=255, blank=True, null=True, help_text='Short summary of what you did today')
 	text = models.TextField()
 	file = models.FileField(upload_to='submissions/', blank=True, null=True)
 	date = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
 	approved = models.BooleanField(default=False)
 	reviewed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_submissions')
+	reviewed_at = models.DateTimeField(blank=True, null=True, help_text='When the submission was approved')
 	remark = models.TextField(blank=True, null=True, help_text='Supervisor remark or comment for this submission')
 
 	def __str__(self):
-		return f"{self.matric_number} - {self.date.strftime('%Y-%m-%d %H:%M') if self.date else ''}"
\ No newline at end of file
+		return f"{self.matric_number} - {self.date.strftime('%Y-%m-%d %H:%M') if self.date else ''}"
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		# Remember the approval state and remark as loaded, so signal handlers can tell approvals and remarks apart from edits
+		instance._loaded_approved = instance.approved if 'approved' in field_names else None
+		instance._loaded_remark = instance.remark if 'remark' in field_names else None
+		return instance
+
+	def save(self, *args, **kwargs):
+		# Approvals made without SIWES.review.bulk_approve (e.g. ticked in the admin) still get reviewed_at;
+		# the admin fills in reviewed_by, which the model can't know
+		was_approved = False if self._state.adding else getattr(self, '_loaded_approved', None)
+		if was_approved is not None and was_approved != self.approved:
+			if self.approved:
+				self.reviewed_at = self.reviewed_at or timezone.now()
+			else:
+				self.reviewed_at = self.reviewed_by = None
+			update_fields = kwargs.get('update_fields')
+			if update_fields is not None and 'approved' in update_fields:
+				kwargs['update_fields'] = {*update_fields, 'reviewed_at', 'reviewed_by'}
+		# Run the save and the StudentStats update from SIWES.signals in one transaction
+		with transaction.atomic():
+			super().save(*args, **kwargs)
+		self._loaded_approved = self.approved
+		self._loaded_remark = self.remark
+
+
+def working_days(start, end):
+	"""Number of Monday-to-Friday days from start to end, both inclusive."""
+	days = (end - start).days + 1
+	if days <= 0:
+		return 0
+	weeks, extra = divmod(days, 7)
+	return weeks * 5 + sum(1 for offset in range(extra) if (start.weekday() + offset) % 7 < 5)
+
+
+# Per-student rollup of submission counts, kept in step with Submission by SIWES.signals
+class StudentStats(models.Model):
+	class Meta:
+		verbose_name = 'Student Stats'
+		verbose_name_plural = 'Student Stats'
+	student = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+	total = models.PositiveIntegerField(default=0)
+	approved = models.PositiveIntegerField(default=0)
+	first_submission_at = models.DateTimeField(blank=True, null=True)
+	last_submission_at = models.DateTimeField(blank=True, null=True)
+	days_logged = models.PositiveIntegerField(default=0, help_text='Distinct working days with at least one log')
+
+	def __str__(self):
+		return f"{self.student_id}: {self.total} logs"
+
+	@property
+	def pending(self):
+		return self.total - self.approved
+
+	@property
+	def days_missed(self):
+		"""Working days since the first log without any log; today only counts once it has one."""
+		if not self.first_submission_at:
+			return 0
+		today = timezone.localdate()
+		expected = working_days(timezone.localdate(self.first_submission_at), today)
+		if today.weekday() < 5 and timezone.localdate(self.last_submission_at) != today:
+			expected -= 1
+		return max(0, expected - self.days_logged)
+
+
+# Daily rollups read by the admin analytics page (see SIWES.analytics). Rows are written once, for closed days only
+class DepartmentDay(models.Model):
+	class Meta:
+		verbose_name = 'Department Day'
+		verbose_name_plural = 'Department Days'
+		constraints = [models.UniqueConstraint(fields=['department', 'day'], name='department_day_unique')]
+		indexes = [models.Index(fields=['day'], name='department_day_idx')]
+	day = models.DateField()
+	department = models.CharField(max_length=100, blank=True, help_text='Blank for students without a department')
+	students = models.PositiveIntegerField(default=0, help_text='Students in the department when the day was rolled up')
+	students_logged = models.PositiveIntegerField(default=0, help_text='Students with at least one log that day')
+	submissions = models.PositiveIntegerField(default=0)
+
+	def __str__(self):
+		return f"{self.department or 'No department'} on {self.day}"
+
+	@property
+	def rate(self):
+		"""Share of the department's students who logged that day."""
+		return self.students_logged / self.students if self.students else 0
+
+
+class SupervisorDay(models.Model):
+	class Meta:
+		verbose_name = 'Supervisor Day'
+		verbose_name_plural = 'Supervisor Days'
+		constraints = [models.UniqueConstraint(fields=['supervisor', 'day'], name='supervisor_day_unique')]
+		indexes = [models.Index(fields=['day'], name='supervisor_day_idx')]
+	day = models.DateField()
+	supervisor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='analytics_days')
+	submissions = models.PositiveIntegerField(default=0, help_text="Logs created by the supervisor's students that day")
+	reviewed = models.PositiveIntegerField(default=0, help_text='Logs approved that day')
+	pending = models.PositiveIntegerField(default=0, help_text='Logs awaiting review at the end of the day')
+	latency_seconds = models.PositiveBigIntegerField(default=0, help_text="Sum of the review latencies of the day's approvals")
+	latency_histogram = models.JSONField(default=list, help_text='Approvals per review latency bucket (SIWES.analytics.LATENCY_BUCKETS)')
+
+	def __str__(self):
+		return f"{self.supervisor_id} on {self.day}"
+
+
+# A SIWES session: one cohort's training period. On PostgreSQL its logs form one partition of the submission table (see SIWES.partitions)
+class SiwesSession(models.Model):
+	class Meta:
+		verbose_name = 'SIWES Session'
+		verbose_name_plural = 'SIWES Sessions'
+		ordering = ['-starts_on']
+	name = models.CharField(max_length=50, unique=True, help_text='e.g. 2025/2026')
+	slug = models.SlugField(unique=True, help_text='Names the archive directory')
+	starts_on = models.DateField()
+	ends_on = models.DateField(help_text='Last day of the session, inclusive')
+	closed = models.BooleanField(default=False, help_text='No more logs or reviews are expected, so the session may be archived')
+	archived_at = models.DateTimeField(blank=True, null=True)
+	archived_count = models.PositiveIntegerField(default=0, help_text='Logs moved to the archive')
+
+	def __str__(self):
+		return self.name
+
+	def clean(self):
+		if self.starts_on and self.ends_on:
+			if self.ends_on < self.starts_on:
+				raise ValidationError({'ends_on': 'A session cannot end before it starts.'})
+			overlapping = SiwesSession.objects.filter(starts_on__lte=self.ends_on, ends_on__gte=self.starts_on).exclude(pk=self.pk)
+			if overlapping.exists():
+				raise ValidationError(f"Sessions cannot overlap; this one overlaps {', '.join(map(str, overlapping))}.")
+
+	@property
+	def bounds(self):
+		"""[start, end) of the session's logs as aware datetimes: midnight of starts_on to midnight after ends_on."""
+		return (
+			timezone.make_aware(datetime.combine(self.starts_on, time.min)),
+			timezone.make_aware(datetime.combine(self.ends_on + timedelta(days=1), time.min)),
+		)
+
+	@property
+	def archived(self):
+		return self.archived_at is not None
+
+
+# One student's logs in an archived session, counted before they left the database, so StudentStats
+# can still be rebuilt with them (see SIWES.stats); deleting the session forgets them
+class ArchivedStats(models.Model):
+	class Meta:
+		verbose_name = 'Archived Stats'
+		verbose_name_plural = 'Archived Stats'
+		constraints = [
+			models.UniqueConstraint(fields=['session', 'student'], name='archivedstats_session_student_uniq'),
+		]
+	session = models.ForeignKey(SiwesSession, on_delete=models.CASCADE, related_name='archived_stats')
+	student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_stats')
+	total = models.PositiveIntegerField(default=0)
+	approved = models.PositiveIntegerField(default=0)
+	first_submission_at = models.DateTimeField(blank=True, null=True)
+	last_submission_at = models.DateTimeField(blank=True, null=True)
+	days_logged = models.PositiveIntegerField(default=0, help_text='Distinct working days with at least one log')
+
+	def __str__(self):
+		return f"{self.session_id}/{self.student_id}: {self.total} logs"
+
+
+# An attachment arriving in chunks; the chunks received so far sit in the uploads storage (see SIWES.uploads)
+class ChunkedUpload(models.Model):
+	class Meta:
+		verbose_name = 'Chunked Upload'
+		verbose_name_plural = 'Chunked Uploads'
+	id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+	owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='uploads')
+	filename = models.CharField(max_length=255)
+	size = models.PositiveBigIntegerField(help_text='Total size in bytes, declared when the upload starts')
+	offset = models.PositiveBigIntegerField(default=0, help_text='Bytes received so far')
+	created_at = models.DateTimeField(auto_now_add=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	def __str__(self):
+		return f"{self.filename} ({self.offset}/{self.size})"
+
+	@property
+	def complete(self):
+		return self.offset == self.size
@@ -0,0 +1,109 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+# Number of submission cards shown per page on the supervisor views
+PAGE_SIZE = 25
+
+
+def encode_cursor(date, pk):
+    """Encode the (date, id) of the last row on a page into an opaque token."""
+    raw = f"{date.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (date, id) pair for a cursor token, or None if it is invalid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_str, pk = base64.urlsafe_b64decode(padded.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(date_str), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class CursorPage:
+    """
+    One page of submissions ordered newest first, paginated by keyset on (date, id).
+
+    Instead of OFFSET, the next page starts strictly after the last row of the
+    previous one, so the database only ever reads ``page_size + 1`` rows no matter
+    how deep into the history the supervisor goes. The page is evaluated lazily,
+    the first time it is iterated or asked whether there is a next page, or up
+    front with ``await page.aload()``.
+    """
+
+    def __init__(self, queryset, cursor=None, page_size=PAGE_SIZE, params=None):
+        self.cursor = cursor or ''
+        self.page_size = page_size
+        self.params = params
+        position = decode_cursor(cursor)
+        if position is not None:
+            date, pk = position
+            queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+        self.queryset = queryset.order_by('-date', '-id')
+        self._items = None
+        self._has_next = False
+
+    def _set_rows(self, rows):
+        self._has_next = len(rows) > self.page_size
+        self._items = rows[:self.page_size]
+
+    def _load(self):
+        if self._items is None:
+            self._set_rows(list(self.queryset[:self.page_size + 1]))
+        return self._items
+
+    async def aload(self):
+        """Evaluate the page with the async ORM; async views call this before rendering."""
+        if self._items is None:
+            self._set_rows([row async for row in self.queryset[:self.page_size + 1]])
+        return self
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __bool__(self):
+        return bool(self._load())
+
+    @property
+    def has_next(self):
+        self._load()
+        return self._has_next
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return ''
+        last = self._items[-1]
+        return encode_cursor(last.date, last.id)
+
+    def _query_with_cursor(self, cursor):
+        params = self.params.copy() if self.params is not None else None
+        if params is None:
+            return f'cursor={cursor}' if cursor else ''
+        params.pop('cursor', None)
+        if cursor:
+            params['cursor'] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        """Query string for the next page, keeping the current filters."""
+        return self._query_with_cursor(self.next_cursor)
+
+    @property
+    def first_query(self):
+        """Query string for the newest page, keeping the current filters."""
+        return self._query_with_cursor('')
@@ -0,0 +1,216 @@
+"""
+The submission table, partitioned by SIWES session.
+
+On PostgreSQL, ``manage.py partition_submissions`` turns ``SIWES_submission`` into a
+table range-partitioned on ``date``, with a DEFAULT partition for logs outside every
+session and one partition per session not yet archived; ``--undo`` turns it back
+into a plain table. Both copy every row under an exclusive lock, so they are opt-in
+and meant for a maintenance window, after a backup. Once partitioned, creating a
+SiwesSession adds a partition for its date range, moving the logs it covers out of
+the default partition; deleting one merges its logs back; archiving one drops it (see
+SIWES.archive). Date-filtered queries only visit the partitions in range, and each
+partition's indexes are the size of one cohort.
+
+PostgreSQL requires a partitioned table's primary key to include the partition key,
+so the key is (id, date). Ids still come from a single sequence and stay unique, and
+the ORM keeps using ``id`` alone. A foreign key to Submission would have to reference
+(id, date).
+
+Until then, and on SQLite, which has no partitioning, a session is just a date
+range served by the existing (student, date) indexes, and archiving deletes its
+rows, which keeps the table down to the open sessions all the same.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .search import SUBMISSION_TABLE
+
+DEFAULT_PARTITION = f'{SUBMISSION_TABLE}_default'
+# The table's name while it is rebuilt, and the name its new id sequence is created under
+REBUILD_TABLE = f'{SUBMISSION_TABLE}_rebuild'
+REBUILD_SEQUENCE = f'{SUBMISSION_TABLE}_id_rebuild_seq'
+SEQUENCE = f'{SUBMISSION_TABLE}_id_seq'
+
+
+def partition_name(session):
+    return f'{SUBMISSION_TABLE}_s{session.pk}'
+
+
+def session_submissions(session):
+    """The submissions dated within ``session``."""
+    from .models import Submission
+
+    start, end = session.bounds
+    return Submission.objects.filter(date__gte=start, date__lt=end)
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [f'"{SUBMISSION_TABLE}"'])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def _columns(connection, cursor, table):
+    """The quoted, comma-separated columns of ``table`` that can be written (not generated ones)."""
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position",
+        [table],
+    )
+    return ', '.join(connection.ops.quote_name(column) for column, in cursor.fetchall())
+
+
+def _bounds(connection, session):
+    return [connection.ops.adapt_datetimefield_value(value) for value in session.bounds]
+
+
+def _rebuild(connection, partitioned):
+    """
+    Recreate the submission table, partitioned by date or not, with the same rows,
+    indexes and foreign keys. Rows are copied, so this holds an exclusive lock for as
+    long as that takes; it is meant for partition_submissions only.
+    """
+    qn = connection.ops.quote_name
+    table = qn(SUBMISSION_TABLE)
+    with connection.cursor() as cursor:
+        columns = _columns(connection, cursor, SUBMISSION_TABLE)
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'", [table],
+        )
+        primary_key, = cursor.fetchone()
+        # Read before the rename, so the definitions already name the new table
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s',
+            [SUBMISSION_TABLE],
+        )
+        indexes = [(name, definition) for name, definition in cursor.fetchall() if name != primary_key]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {qn(REBUILD_TABLE)}')
+        partition_by = ' PARTITION BY RANGE ("date")' if partitioned else ''
+        cursor.execute(f'CREATE TABLE {table} (LIKE {qn(REBUILD_TABLE)} INCLUDING GENERATED){partition_by}')
+        if partitioned:
+            cursor.execute(f'CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT')
+        cursor.execute(f'CREATE SEQUENCE {qn(REBUILD_SEQUENCE)} OWNED BY {table}."id"')
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN \"id\" SET DEFAULT nextval('{qn(REBUILD_SEQUENCE)}')")
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {qn(REBUILD_TABLE)}')
+        cursor.execute(f"SELECT setval('{qn(REBUILD_SEQUENCE)}', COALESCE(MAX(\"id\"), 0) + 1, false) FROM {table}")
+        # Takes the old id sequence and, when undoing, the old partitions with it
+        cursor.execute(f'DROP TABLE {qn(REBUILD_TABLE)}')
+        cursor.execute(f'ALTER SEQUENCE {qn(REBUILD_SEQUENCE)} RENAME TO {qn(SEQUENCE)}')
+
+        key = '"id", "date"' if partitioned else '"id"'
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {qn(primary_key)} PRIMARY KEY ({key})')
+        for name, definition in indexes:
+            # A partitioned table's indexes are defined ON ONLY the parent
+            cursor.execute(definition.replace(' ON ONLY ', ' ON '))
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {qn(name)} {definition}')
+        cursor.execute(f'ANALYZE {table}')
+
+
+def partition_submission_table(connection):
+    """
+    Partition the submission table, giving each session not archived yet its
+    partition. Returns False if it already was partitioned.
+    """
+    from .models import SiwesSession
+
+    if connection.vendor != 'postgresql' or is_partitioned(connection):
+        return False
+    with transaction.atomic(using=connection.alias):
+        _rebuild(connection, partitioned=True)
+        for session in SiwesSession.objects.using(connection.alias).filter(archived_at__isnull=True):
+            add_session_partition(connection, session)
+    return True
+
+
+def unpartition_submission_table(connection):
+    """Turn the submission table back into a plain one. Returns False if it wasn't partitioned."""
+    if not is_partitioned(connection):
+        return False
+    with transaction.atomic(using=connection.alias):
+        _rebuild(connection, partitioned=False)
+    return True
+
+
+@contextmanager
+def _moving_rows(connection):
+    """
+    Check deferred foreign keys as rows move between partitions, the way
+    connection.check_constraints() does: PostgreSQL won't ALTER a table that has
+    pending trigger events.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    yield
+    with connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def add_session_partition(connection, session):
+    """Give ``session`` its own partition, moving the logs it covers out of the default one."""
+    if not is_partitioned(connection):
+        return
+    qn = connection.ops.quote_name
+    table, default, partition = qn(SUBMISSION_TABLE), qn(DEFAULT_PARTITION), qn(partition_name(session))
+    start, end = session.bounds
+    bounds = _bounds(connection, session)
+    with transaction.atomic(using=connection.alias), _moving_rows(connection), connection.cursor() as cursor:
+        columns = _columns(connection, cursor, SUBMISSION_TABLE)
+        # The default partition may not hold rows in the new range, so it steps aside while they move
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default}')
+        cursor.execute(
+            f"CREATE TABLE {partition} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {default} WHERE "date" >= %s AND "date" < %s', bounds,
+        )
+        cursor.execute(f'DELETE FROM {default} WHERE "date" >= %s AND "date" < %s', bounds)
+        cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT')
+
+
+def merge_session_partition(connection, session):
+    """Move ``session``'s logs back into the default partition and drop its partition."""
+    if not is_partitioned(connection):
+        return
+    qn = connection.ops.quote_name
+    table, partition = qn(SUBMISSION_TABLE), qn(partition_name(session))
+    with transaction.atomic(using=connection.alias), _moving_rows(connection), connection.cursor() as cursor:
+        columns = _columns(connection, cursor, SUBMISSION_TABLE)
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {partition}')
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {partition}')
+        cursor.execute(f'DROP TABLE {partition}')
+
+
+def lock_session(connection, session):
+    """Block writes to ``session``'s logs until the transaction ends, so an export is complete."""
+    if is_partitioned(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(partition_name(session))} IN SHARE MODE')
+
+
+def drop_session_rows(connection, session):
+    """
+    Remove ``session``'s logs from the database, without the per-row delete signals:
+    StudentStats keep counting them and no live events go out. On PostgreSQL this
+    drops the session's partition; elsewhere it deletes the rows in its range.
+    """
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if is_partitioned(connection):
+            cursor.execute(f'DROP TABLE {qn(partition_name(session))}')
+        else:
+            cursor.execute(
+                f'DELETE FROM {qn(SUBMISSION_TABLE)} WHERE "date" >= %s AND "date" < %s', _bounds(connection, session),
+            )
@@ -0,0 +1,40 @@
+"""
+Password hashing spread over a process pool, for bulk imports.
+
+Kept apart from the models: spawned workers import this module before Django is set
+up, so it must not pull in anything that needs the app registry.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.contrib.auth.hashers import make_password
+
+# Passwords per task sent to a hashing worker
+HASH_CHUNK_SIZE = 20
+
+
+def _setup_worker():
+    # Spawned workers start blank; PASSWORD_HASHERS comes from the parent's settings module
+    import django
+    django.setup()
+
+
+def _hash_chunk(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    make_password for each of ``passwords``, spread over ``workers`` processes.
+
+    PBKDF2 is meant to be slow, so hashing is CPU-bound and only more cores make it
+    faster; threads would queue on the GIL. Workers are spawned rather than forked,
+    as forking a threaded server process is unsafe.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) <= HASH_CHUNK_SIZE:
+        return _hash_chunk(passwords)
+    chunks = [passwords[start:start + HASH_CHUNK_SIZE] for start in range(0, len(passwords), HASH_CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=_setup_worker) as pool:
+        return [hashed for chunk in pool.map(_hash_chunk, chunks) for hashed in chunk]
@@ -0,0 +1,61 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .events import publish_submission_events
+from .fragments import bump_submission_versions
+from .models import Submission
+from .stats import record_approval_change
+
+# Keeps the id lists in each UPDATE well under database parameter limits
+UPDATE_BATCH_SIZE = 500
+
+
+def supervised_submissions(supervisor):
+    """Submissions a supervisor may review: those of their own students only."""
+    return Submission.objects.filter(student__supervisor=supervisor, student__user_type='student')
+
+
+def _locked_rows(submissions):
+    """(id, student id, supervisor id) of ``submissions``, locked; the supervisor ids address the live events."""
+    return list(submissions.select_for_update(of=('self',)).values_list('id', 'student_id', 'student__supervisor_id'))
+
+
+def _update_in_batches(ids, **values):
+    for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+        Submission.objects.filter(pk__in=ids[start:start + UPDATE_BATCH_SIZE]).update(**values)
+
+
+def bulk_approve(supervisor, submissions, remark=''):
+    """
+    Approve every pending submission in ``submissions`` with set-based UPDATEs.
+
+    Only rows still pending are touched, the remark is written only when one is
+    given, and StudentStats is adjusted per student in the same transaction.
+    Returns the ids that were approved.
+    """
+    with transaction.atomic():
+        rows = _locked_rows(submissions.filter(approved=False))
+        ids = [pk for pk, _, _ in rows]
+        now = timezone.now()
+        values = {'approved': True, 'reviewed_by': supervisor, 'reviewed_at': now, 'updated_at': now}
+        if remark:
+            values['remark'] = remark
+        _update_in_batches(ids, **values)
+        for student_id, count in Counter(student_id for _, student_id, _ in rows).items():
+            record_approval_change(student_id, count)
+        bump_submission_versions(student_id for _, student_id, _ in rows)
+        publish_submission_events('approved', rows)
+    return ids
+
+
+def bulk_remark(submissions, remark):
+    """Set the same remark on every submission in ``submissions``. Returns the ids updated."""
+    with transaction.atomic():
+        rows = _locked_rows(submissions)
+        ids = [pk for pk, _, _ in rows]
+        _update_in_batches(ids, remark=remark, updated_at=timezone.now())
+        bump_submission_versions(student_id for _, student_id, _ in rows)
+        publish_submission_events('remarked', rows)
+    return ids
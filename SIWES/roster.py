@@ -0,0 +1,261 @@
+"""
+Bulk import of students and supervisors from a CSV or XLSX roster.
+
+A roster has a header row naming its columns; ``email`` and ``user_type`` are required,
+and the others are those of the register form: ``fullname`` (or ``first_name`` and
+``last_name``), ``department``, ``title``, ``matric_number``, ``lecturer_id``. A student's
+``supervisor`` column may give their supervisor's lecturer ID, and a ``password``
+column may set passwords; rows without one get an unusable password and a
+set-password link instead.
+
+Every row is validated against the file and the database with a few set queries, so
+an intake either imports whole or reports all its problems. Usernames are resolved in
+bulk, passwords are hashed on a process pool, and users are written with bulk_create.
+"""
+import csv
+import io
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import CustomUser, StudentStats
+from .passwords import hash_passwords
+
+BATCH_SIZE = 1000
+COLUMNS = (
+    'email', 'user_type', 'fullname', 'first_name', 'last_name', 'department', 'title',
+    'matric_number', 'lecturer_id', 'supervisor', 'password',
+)
+USER_TYPES = {user_type for user_type, _ in CustomUser.USER_TYPE_CHOICES}
+
+
+class RosterError(Exception):
+    pass
+
+
+@dataclass
+class RosterRow:
+    line: int
+    email: str
+    user_type: str
+    first_name: str = ''
+    last_name: str = ''
+    department: str = ''
+    title: str = ''
+    matric_number: str = ''
+    lecturer_id: str = ''
+    supervisor: str = ''
+    password: str = ''
+
+
+@dataclass
+class ImportResult:
+    students: int = 0
+    supervisors: int = 0
+    # (line, message) for every invalid row; nothing is imported while there are any
+    errors: list = field(default_factory=list)
+    # (email, set-password path) for users imported without a password
+    links: list = field(default_factory=list)
+
+
+def read_roster(fileobj, filename):
+    """The roster's rows as dicts keyed by lower-cased column name, with their line numbers."""
+    if filename.lower().endswith('.xlsx'):
+        try:
+            import openpyxl
+        except ImportError:
+            raise RosterError('Reading .xlsx rosters needs openpyxl; install it or upload a CSV.')
+        sheet = openpyxl.load_workbook(fileobj, read_only=True, data_only=True).active
+        rows = [['' if value is None else str(value) for value in row] for row in sheet.iter_rows(values_only=True)]
+    elif filename.lower().endswith('.csv'):
+        text = fileobj.read()
+        if isinstance(text, bytes):
+            text = text.decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(text)))
+    else:
+        raise RosterError('Rosters must be .csv or .xlsx files.')
+    if not rows:
+        raise RosterError('The roster is empty.')
+    header = [name.strip().lower() for name in rows[0]]
+    missing = {'email', 'user_type'} - set(header)
+    if missing:
+        raise RosterError(f"The roster has no {' or '.join(sorted(missing))} column.")
+    return [
+        (line, dict(zip(header, (value.strip() for value in values))))
+        for line, values in enumerate(rows[1:], start=2)
+        if any(value.strip() for value in values)
+    ]
+
+
+def parse_roster(records):
+    """Validate ``records`` from read_roster. Returns (rows, errors)."""
+    rows, errors = [], []
+    for line, record in records:
+        row = RosterRow(line=line, email=record.get('email', ''), user_type=record.get('user_type', '').lower())
+        for name in COLUMNS[3:]:
+            setattr(row, name, record.get(name, ''))
+        if record.get('fullname'):
+            names = record['fullname'].split()
+            row.first_name, row.last_name = names[0], ' '.join(names[1:])
+        try:
+            validate_email(row.email)
+        except ValidationError:
+            errors.append((line, f'Invalid email {row.email!r}.'))
+            continue
+        if row.user_type not in USER_TYPES:
+            errors.append((line, f"user_type must be one of {', '.join(sorted(USER_TYPES))}, not {row.user_type!r}."))
+            continue
+        rows.append(row)
+    errors.extend(_duplicates(rows))
+    errors.sort()
+    return rows, errors
+
+
+def _duplicates(rows):
+    """Emails, matric numbers and lecturer IDs already taken, in the file or the database."""
+    errors = []
+    for attr in ('email', 'matric_number', 'lecturer_id'):
+        values = [(row.line, getattr(row, attr)) for row in rows if getattr(row, attr)]
+        # Emails are compared case-insensitively, in the file and against the database
+        if attr == 'email':
+            normalize, column = str.lower, Lower(attr)
+        else:
+            normalize, column = str, F(attr)
+        seen = {}
+        for line, value in values:
+            key = normalize(value)
+            if key in seen:
+                errors.append((line, f'{attr} {value} is repeated from line {seen[key]}.'))
+            else:
+                seen[key] = line
+        users = CustomUser.objects.annotate(key=column)
+        taken = set()
+        for start in range(0, len(values), BATCH_SIZE):
+            batch = [normalize(value) for _, value in values[start:start + BATCH_SIZE]]
+            taken.update(users.filter(key__in=batch).values_list('key', flat=True))
+        errors.extend((line, f'{attr} {value} is already registered.') for line, value in values if normalize(value) in taken)
+    lecturers = {row.lecturer_id for row in rows if row.user_type == 'supervisor' and row.lecturer_id}
+    wanted = {row.supervisor for row in rows if row.supervisor} - lecturers
+    lecturers.update(
+        CustomUser.objects.filter(user_type='supervisor', lecturer_id__in=wanted).values_list('lecturer_id', flat=True)
+    )
+    errors.extend(
+        (row.line, f'No supervisor has lecturer ID {row.supervisor}.')
+        for row in rows if row.supervisor and row.supervisor not in lecturers
+    )
+    return errors
+
+
+def unique_usernames(emails):
+    """
+    A free username for each email, from the part before the @ plus a counter if taken.
+
+    Costs one query for the bare names and one more for the names that clash, however
+    many emails there are, instead of an exists() per attempt.
+    """
+    bases = {email: email.split('@')[0] for email in emails}
+    taken = set(CustomUser.objects.filter(username__in=set(bases.values())).values_list('username', flat=True))
+    counts = {}
+    for base in bases.values():
+        counts[base] = counts.get(base, 0) + 1
+    clashing = sorted({base for base, count in counts.items() if count > 1 or base in taken})
+    # Long OR chains hit SQLite's expression depth limit, so these go in smaller batches
+    for start in range(0, len(clashing), 100):
+        prefixes = reduce(or_, (Q(username__startswith=base) for base in clashing[start:start + 100]))
+        taken.update(CustomUser.objects.filter(prefixes).values_list('username', flat=True))
+    usernames = {}
+    for email, base in bases.items():
+        username, counter = base, 1
+        while username in taken:
+            username = f'{base}{counter}'
+            counter += 1
+        taken.add(username)
+        usernames[email] = username
+    return usernames
+
+
+def _user(row, username, password):
+    student = row.user_type == 'student'
+    return CustomUser(
+        email=row.email, username=username, password=password, user_type=row.user_type,
+        first_name=row.first_name, last_name=row.last_name, department=row.department,
+        title='' if student else row.title,
+        matric_number=(row.matric_number or None) if student else None,
+        lecturer_id=None if student else (row.lecturer_id or None),
+    )
+
+
+def import_roster(rows, workers=None):
+    """
+    Create users for validated ``rows`` in one transaction.
+
+    Supervisors go in first so students can be linked to them by lecturer ID; students
+    without a supervisor column are left for map_students. Returns an ImportResult.
+    """
+    result = ImportResult()
+    usernames = unique_usernames([row.email for row in rows])
+    with_password = [row for row in rows if row.password]
+    hashes = dict(zip(
+        (row.email for row in with_password), hash_passwords([row.password for row in with_password], workers),
+    ))
+    with transaction.atomic():
+        supervisors = [row for row in rows if row.user_type == 'supervisor']
+        CustomUser.objects.bulk_create(
+            [_user(row, usernames[row.email], hashes.get(row.email) or make_password(None)) for row in supervisors],
+            batch_size=BATCH_SIZE,
+        )
+        result.supervisors = len(supervisors)
+
+        students = [row for row in rows if row.user_type == 'student']
+        wanted = {row.supervisor for row in students if row.supervisor}
+        supervisor_ids = dict(
+            CustomUser.objects.filter(user_type='supervisor', lecturer_id__in=wanted).values_list('lecturer_id', 'pk')
+        )
+        objects = []
+        for row in students:
+            user = _user(row, usernames[row.email], hashes.get(row.email) or make_password(None))
+            user.supervisor_id = supervisor_ids.get(row.supervisor)
+            objects.append(user)
+        CustomUser.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+        result.students = len(students)
+
+        # bulk_create skips the post_save signal that gives each student their stats row
+        emails = [row.email for row in rows]
+        created = []
+        for start in range(0, len(emails), BATCH_SIZE):
+            created.extend(CustomUser.objects.filter(email__in=emails[start:start + BATCH_SIZE]))
+        StudentStats.objects.bulk_create(
+            [StudentStats(student_id=user.pk) for user in created if user.user_type == 'student'], batch_size=BATCH_SIZE,
+        )
+    for user in created:
+        if not user.has_usable_password():
+            result.links.append((user.email, set_password_path(user)))
+    return result
+
+
+def set_password_path(user):
+    """The password reset confirm page for ``user``; valid for PASSWORD_RESET_TIMEOUT."""
+    uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+    return reverse('password_reset_confirm', args=[uidb64, default_token_generator.make_token(user)])
+
+
+def load_roster(fileobj, filename, workers=None, dry_run=False):
+    """Read, validate and, unless there are errors or ``dry_run``, import a roster file."""
+    rows, errors = parse_roster(read_roster(fileobj, filename))
+    if errors or dry_run:
+        result = ImportResult(errors=errors)
+        result.students = sum(1 for row in rows if row.user_type == 'student')
+        result.supervisors = len(rows) - result.students
+        return result
+    return import_roster(rows, workers)
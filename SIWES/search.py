@@ -0,0 +1,136 @@
+"""
+Full-text search over Submission.overview and Submission.text.
+
+PostgreSQL keeps a generated, weighted ``tsvector`` column with a GIN index on the
+submission table. SQLite keeps an external-content FTS5 table synced by triggers.
+Both are installed by migration 0013 and ranked so the best matches come first.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Ranked searches return the best matches only, not the whole history
+SEARCH_RESULT_LIMIT = 100
+
+SUBMISSION_TABLE = 'SIWES_submission'
+FTS_TABLE = 'SIWES_submission_fts'
+
+POSTGRES_INSTALL = [
+    f"""
+    ALTER TABLE "{SUBMISSION_TABLE}" ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(overview, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(text, '')), 'B')
+    ) STORED
+    """,
+    f'CREATE INDEX IF NOT EXISTS submission_search_gin ON "{SUBMISSION_TABLE}" USING GIN (search_vector)',
+]
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS submission_search_gin',
+    f'ALTER TABLE "{SUBMISSION_TABLE}" DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS "{FTS_TABLE}" USING fts5(
+        overview, text, content='{SUBMISSION_TABLE}', content_rowid='id', tokenize='porter unicode61'
+    )
+"""
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS submission_fts_insert AFTER INSERT ON "{SUBMISSION_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}" (rowid, overview, text) VALUES (new.id, new.overview, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS submission_fts_delete AFTER DELETE ON "{SUBMISSION_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}", rowid, overview, text) VALUES ('delete', old.id, old.overview, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS submission_fts_update AFTER UPDATE OF overview, text ON "{SUBMISSION_TABLE}" BEGIN
+        INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}", rowid, overview, text) VALUES ('delete', old.id, old.overview, old.text);
+        INSERT INTO "{FTS_TABLE}" (rowid, overview, text) VALUES (new.id, new.overview, new.text);
+    END
+    """,
+]
+SQLITE_TRIGGER_NAMES = ('submission_fts_insert', 'submission_fts_delete', 'submission_fts_update')
+SQLITE_UNINSTALL = [f'DROP TRIGGER IF EXISTS {name}' for name in SQLITE_TRIGGER_NAMES] + [
+    f'DROP TABLE IF EXISTS "{FTS_TABLE}"',
+]
+
+
+def install_search_backend(connection):
+    """
+    Create the search column/index or FTS table and its triggers if they are missing.
+
+    Safe to call repeatedly. On SQLite it also runs after every migrate, because
+    rebuilding the submission table for an ALTER drops its triggers; the FTS index
+    is rebuilt from the table whenever a trigger had to be recreated.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_INSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                SQLITE_TRIGGER_NAMES,
+            )
+            if cursor.fetchone()[0] == len(SQLITE_TRIGGER_NAMES):
+                return
+            cursor.execute(SQLITE_TABLE)
+            for statement in SQLITE_TRIGGERS:
+                cursor.execute(statement)
+            cursor.execute(f'INSERT INTO "{FTS_TABLE}" ("{FTS_TABLE}") VALUES (\'rebuild\')')
+
+
+def uninstall_search_backend(connection):
+    statements = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def fts5_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_submissions(queryset, query):
+    """
+    Filter ``queryset`` to submissions matching ``query`` and annotate ``search_rank``.
+
+    Higher ranks are better matches; callers order by ``-search_rank``.
+    """
+    vendor = connections[queryset.db].vendor
+    column = f'"{SUBMISSION_TABLE}"."search_vector"'
+    if vendor == 'postgresql':
+        tsquery = "websearch_to_tsquery('english', %s)"
+        return queryset.filter(
+            RawSQL(f'{column} @@ {tsquery}', (query,), output_field=BooleanField()),
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank({column}, {tsquery})', (query,), output_field=FloatField()),
+        )
+    if vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+        # Joined rather than looked up per row, so the MATCH runs once and bm25() reads the
+        # same cursor; the ORM has no other way to join a table without a model
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'"{FTS_TABLE}" MATCH %s', f'"{FTS_TABLE}".rowid = "{SUBMISSION_TABLE}"."id"'],
+            params=[match],
+            # bm25() is lower for better matches, so flip the sign
+            select={'search_rank': f'-bm25("{FTS_TABLE}")'},
+        )
+    return queryset.filter(Q(overview__icontains=query) | Q(text__icontains=query)).annotate(
+        search_rank=Value(0.0, output_field=FloatField()),
+    )
@@ -0,0 +1,135 @@
+"""
+Synthetic cohorts for benchmarks: supervisors, their students and a run of daily logs.
+
+Rows are written with bulk_create, so StudentStats is rebuilt and the dashboard
+fragment versions are bumped for the new students at the end instead of by the
+per-row signals.
+"""
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .fragments import bump_submission_versions
+from .models import CustomUser, Submission
+from .stats import rebuild_student_stats
+
+BATCH_SIZE = 2000
+
+WORDS = (
+    'django migrations models views templates forms admin queries index postgres api '
+    'networking routers switches cabling firewall server linux deployment docker backups '
+    'accounting ledger invoices payroll audit spreadsheet report meeting client site visit '
+    'surveying drawings autocad inspection concrete wiring maintenance testing debugging'
+).split()
+
+
+@contextmanager
+def explicit_dates():
+    """Let seeded rows keep the dates we give them instead of auto_now/auto_now_add."""
+    fields = [Submission._meta.get_field('date'), Submission._meta.get_field('updated_at')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def seed_cohort(supervisors=5, students_per_supervisor=40, days=120, prefix='BENCH', password='logtrack-bench',
+                approved_ratio=0.8, skip_ratio=0.1, seed=0, attachment_every=0, stdout=None):
+    """
+    Create ``supervisors`` supervisors with ``students_per_supervisor`` students each, and
+    one log per student per working day over the last ``days`` days.
+
+    Older logs are mostly approved, the most recent week stays pending, and roughly
+    ``skip_ratio`` of days are missed. With ``attachment_every`` set, every Nth log gets
+    a small text attachment saved through default storage. Returns (supervisor ids, student ids).
+    """
+    rng = random.Random(seed)
+    hashed = make_password(password)
+    prefix = prefix.upper()
+    with transaction.atomic():
+        supervisor_rows = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{prefix.lower()}-sup{s}', email=f'{prefix.lower()}.sup{s}@bench.logtrack.local',
+                password=hashed, user_type='supervisor', title='Dr', first_name='Supervisor', last_name=str(s),
+                department=f'Department {s % 4}', lecturer_id=f'{prefix}{s:03}',
+            )
+            for s in range(supervisors)
+        ], batch_size=BATCH_SIZE)
+        supervisor_ids = list(
+            CustomUser.objects.filter(lecturer_id__in=[sup.lecturer_id for sup in supervisor_rows])
+            .order_by('lecturer_id').values_list('pk', flat=True)
+        )
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{prefix.lower()}-stu{s}-{n}', email=f'{prefix.lower()}.stu{s}.{n}@bench.logtrack.local',
+                password=hashed, user_type='student', first_name='Student', last_name=f'{s}-{n}',
+                department=f'Department {s % 4}', matric_number=f'{prefix}{s:03}{n:04}', supervisor_id=supervisor_id,
+            )
+            for s, supervisor_id in enumerate(supervisor_ids)
+            for n in range(students_per_supervisor)
+        ], batch_size=BATCH_SIZE)
+        students = list(
+            CustomUser.objects.filter(user_type='student', matric_number__startswith=prefix)
+            .values_list('pk', 'matric_number', 'supervisor_id')
+        )
+
+        today = timezone.localdate()
+        attachment = None
+        if attachment_every:
+            attachment = default_storage.save(f'submissions/{prefix.lower()}-evidence.txt', ContentFile(_sentence(rng, 200)))
+        batch = []
+        created = 0
+        with explicit_dates():
+            for offset in range(days, 0, -1):
+                day = today - timedelta(days=offset)
+                if day.weekday() >= 5:
+                    continue
+                for student_id, matric_number, supervisor_id in students:
+                    if rng.random() < skip_ratio:
+                        continue
+                    moment = timezone.make_aware(datetime.combine(day, time(8 + rng.randrange(9), rng.randrange(60))))
+                    approved = offset > 7 and rng.random() < approved_ratio
+                    created += 1
+                    batch.append(Submission(
+                        student_id=student_id, matric_number=matric_number,
+                        overview=_sentence(rng, 6), text=_sentence(rng, 60),
+                        file=attachment if attachment_every and created % attachment_every == 0 else None,
+                        date=moment, updated_at=moment + timedelta(hours=1) if approved else moment,
+                        approved=approved,
+                        reviewed_by_id=supervisor_id if approved else None,
+                        reviewed_at=moment + timedelta(hours=1) if approved else None,
+                    ))
+                    if len(batch) >= BATCH_SIZE:
+                        Submission.objects.bulk_create(batch)
+                        batch = []
+            Submission.objects.bulk_create(batch)
+        student_ids = [pk for pk, _, _ in students]
+        rebuild_student_stats(student_ids)
+        bump_submission_versions(student_ids)
+    if stdout:
+        stdout.write(f'Seeded {len(supervisor_ids)} supervisors, {len(student_ids)} students, {created} submissions.')
+    return supervisor_ids, student_ids
+
+
+def cohort_exists(prefix='BENCH'):
+    return CustomUser.objects.filter(username__startswith=f'{prefix.lower()}-').exists()
+
+
+def delete_cohort(prefix='BENCH'):
+    """Delete the users of a cohort made by seed_cohort; their logs and stats go with them."""
+    deleted, _ = CustomUser.objects.filter(username__startswith=f'{prefix.lower()}-').delete()
+    return deleted
@@ -0,0 +1,129 @@
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import auth, events, fragments, instrumentation, partitions, search, stats, uploads
+from .models import ChunkedUpload, CustomUser, SiwesSession, StudentStats, Submission
+
+
+@receiver(post_save, sender=CustomUser)
+def create_student_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_type == 'student':
+        StudentStats.objects.get_or_create(student=instance)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user(sender, instance, raw=False, **kwargs):
+    # Covers profile edits, password changes and the last_login update on every login
+    if not raw:
+        auth.forget_users([instance.pk])
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        auth.forget_users([user.pk])
+
+
+@receiver(post_save, sender=Submission)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.record_created(instance)
+        return
+    loaded_approved = getattr(instance, '_loaded_approved', None)
+    if loaded_approved is None:
+        # Approval state wasn't loaded, so the change can't be worked out incrementally
+        stats.rebuild_student_stats([instance.student_id])
+    elif loaded_approved != instance.approved:
+        stats.record_approval_change(instance.student_id, 1 if instance.approved else -1)
+
+
+@receiver(post_delete, sender=Submission)
+def update_stats_on_delete(sender, instance, **kwargs):
+    stats.record_deleted(instance)
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def invalidate_dashboard_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fragments.bump_submission_versions([instance.student_id])
+
+
+def submission_event_type(instance, created):
+    if created:
+        return 'created'
+    if getattr(instance, '_loaded_approved', None) is False and instance.approved:
+        return 'approved'
+    if getattr(instance, '_loaded_remark', instance.remark) != instance.remark:
+        return 'remarked'
+    return 'edited'
+
+
+@receiver(post_save, sender=Submission)
+def publish_submission_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        events.publish_submission_events(submission_event_type(instance, created), [(instance.pk, instance.student_id)])
+
+
+@receiver(post_delete, sender=Submission)
+def publish_submission_deleted(sender, instance, **kwargs):
+    events.publish_submission_events('deleted', [(instance.pk, instance.student_id)])
+
+
+@receiver(post_delete, sender=ChunkedUpload)
+def remove_upload_chunks(sender, instance, **kwargs):
+    # Only once the delete has committed, so a rolled-back attach keeps its bytes.
+    # The id is read now because Django clears the pk after deleting.
+    upload_id = instance.pk
+    transaction.on_commit(lambda: uploads.remove_chunks(upload_id))
+
+
+@receiver(post_save, sender=SiwesSession)
+def add_session_partition(sender, instance, created, raw=False, using='default', **kwargs):
+    if created and not raw:
+        partitions.add_session_partition(connections[using], instance)
+
+
+@receiver(pre_delete, sender=SiwesSession)
+def merge_session_partition(sender, instance, using='default', **kwargs):
+    # An archived session's partition is already gone
+    if not instance.archived:
+        partitions.merge_session_partition(connections[using], instance)
+
+
+@receiver(pre_delete, sender=SiwesSession)
+def remember_archived_students(sender, instance, **kwargs):
+    # Read before the delete cascades to the session's ArchivedStats
+    instance._archived_student_ids = list(instance.archived_stats.values_list('student_id', flat=True))
+
+
+@receiver(post_delete, sender=SiwesSession)
+def forget_archived_logs(sender, instance, **kwargs):
+    # Deleting an archived session forgets its logs, so its students' stats no longer count them
+    student_ids = getattr(instance, '_archived_student_ids', None)
+    if student_ids:
+        stats.rebuild_student_stats(student_ids)
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using='default', **kwargs):
+    # SQLite drops the FTS triggers whenever a migration rebuilds the submission table
+    if sender.name == 'SIWES' and connections[using].vendor == 'sqlite':
+        search.install_search_backend(connections[using])
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.instrument(connection)
+
+
+@receiver(user_logged_in)
+def remember_user_type(sender, request, user, **kwargs):
+    # Lets the request log tag requests by role without loading the user
+    request.session[instrumentation.USER_TYPE_SESSION_KEY] = instrumentation.session_user_type(user)
@@ -0,0 +1,99 @@
+// Chunked, resumable attachment uploads for forms marked with data-chunked-upload="<start url>".
+// The chosen file is sent in chunks before the form is submitted; a dropped connection
+// resumes from the offset the server reports, even after a page reload. The form then
+// posts only the upload id, which the view attaches to the submission.
+(function() {
+  var MAX_RETRIES = 8;
+
+  function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+  }
+
+  function call(url, options) {
+    return fetch(url, Object.assign({ credentials: 'same-origin' }, options)).then(response =>
+      response.json().then(data => ({ ok: response.ok, status: response.status, data: data }))
+    );
+  }
+
+  function fail(result) {
+    var error = new Error(result.data.error || 'Upload failed.');
+    // Client errors won't go away by retrying
+    error.fatal = result.status >= 400 && result.status < 500;
+    return error;
+  }
+
+  async function upload(form, file, progress) {
+    var base = form.dataset.chunkedUpload;
+    var headers = { 'X-CSRFToken': form.querySelector('input[name=csrfmiddlewaretoken]').value };
+    var resumeKey = 'logtrack-upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+    var id = localStorage.getItem(resumeKey);
+    var state = null;
+    if (id) {
+      var resumed = await call(base + id + '/', { headers: headers });
+      state = resumed.ok ? resumed.data : null;
+    }
+    if (!state) {
+      var started = await call(base, {
+        method: 'POST',
+        headers: headers,
+        body: new URLSearchParams({ filename: file.name, size: file.size })
+      });
+      if (!started.ok) throw fail(started);
+      state = started.data;
+      localStorage.setItem(resumeKey, state.id);
+    }
+    id = state.id;
+    var offset = state.offset;
+    var failures = 0;
+    while (offset < file.size) {
+      progress('Uploading file... ' + Math.floor(offset * 100 / file.size) + '%');
+      try {
+        var sent = await call(base + id + '/', {
+          method: 'POST',
+          headers: Object.assign({ 'Content-Type': 'application/octet-stream', 'Upload-Offset': offset }, headers),
+          body: file.slice(offset, offset + state.chunk_size)
+        });
+        // 409 means the server has a different offset, e.g. a chunk whose reply was lost
+        if (!sent.ok && sent.status !== 409) throw fail(sent);
+        offset = sent.data.offset;
+        failures = 0;
+      } catch (error) {
+        if (error.fatal || ++failures > MAX_RETRIES) throw error;
+        progress('Connection lost, retrying...');
+        await sleep(Math.min(30000, 1000 * Math.pow(2, failures)));
+        try {
+          var current = await call(base + id + '/', { headers: headers });
+          if (current.ok) offset = current.data.offset;
+        } catch (ignored) {}
+      }
+    }
+    var finished = await call(base + id + '/finalize/', { method: 'POST', headers: headers });
+    if (!finished.ok) throw fail(finished);
+    localStorage.removeItem(resumeKey);
+    return id;
+  }
+
+  document.addEventListener('submit', function(e) {
+    var form = e.target;
+    if (!form.matches('form[data-chunked-upload]')) return;
+    var input = form.querySelector('input[type=file][name=file]');
+    if (!input || !input.files.length) return;
+    e.preventDefault();
+    var button = form.querySelector('[type=submit]');
+    var status = form.querySelector('.upload-status');
+    var progress = function(text) { if (status) status.textContent = text; };
+    if (button) button.disabled = true;
+    upload(form, input.files[0], progress)
+      .then(id => {
+        form.querySelector('input[name=upload_id]').value = id;
+        // The file is already on the server, so don't send it again
+        input.disabled = true;
+        progress('Saving...');
+        form.submit();
+      })
+      .catch(error => {
+        progress('Upload failed: ' + error.message + ' Submit again to resume.');
+        if (button) button.disabled = false;
+      });
+  });
+})();
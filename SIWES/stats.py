@@ -0,0 +1,150 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import ExtractIsoWeekDay, TruncDate
+from django.utils import timezone
+
+from .models import ArchivedStats, CustomUser, StudentStats, Submission
+
+
+def _day_bounds(moment):
+    """Start and end of the local calendar day containing ``moment``."""
+    start = timezone.make_aware(datetime.combine(timezone.localdate(moment), time.min))
+    return start, start + timedelta(days=1)
+
+
+def _is_working_day(moment):
+    return timezone.localdate(moment).weekday() < 5
+
+
+def _has_other_log_that_day(submission):
+    start, end = _day_bounds(submission.date)
+    return Submission.objects.filter(
+        student_id=submission.student_id, date__gte=start, date__lt=end,
+    ).exclude(pk=submission.pk).exists()
+
+
+def record_created(submission):
+    """Count a newly created submission in its student's stats."""
+    StudentStats.objects.get_or_create(student_id=submission.student_id)
+    new_day = _is_working_day(submission.date) and not _has_other_log_that_day(submission)
+    StudentStats.objects.filter(student_id=submission.student_id).update(
+        total=F('total') + 1,
+        approved=F('approved') + int(submission.approved),
+        days_logged=F('days_logged') + int(new_day),
+        last_submission_at=submission.date,
+    )
+    StudentStats.objects.filter(student_id=submission.student_id, first_submission_at__isnull=True).update(
+        first_submission_at=submission.date,
+    )
+
+
+def record_approval_change(student_id, delta):
+    """Move ``delta`` submissions of a student from pending to approved (or back if negative)."""
+    StudentStats.objects.filter(student_id=student_id).update(approved=F('approved') + delta)
+
+
+def record_deleted(submission):
+    """Remove a deleted submission from its student's stats."""
+    stats = StudentStats.objects.filter(student_id=submission.student_id)
+    lost_day = _is_working_day(submission.date) and not _has_other_log_that_day(submission)
+    stats.update(
+        total=F('total') - 1,
+        approved=F('approved') - int(submission.approved),
+        days_logged=F('days_logged') - int(lost_day),
+    )
+    # The first or last log may have gone, so re-read the bounds from what is left, archived logs included
+    live = Submission.objects.filter(student_id=submission.student_id).aggregate(first=Min('date'), last=Max('date'))
+    archived = ArchivedStats.objects.filter(student_id=submission.student_id).aggregate(
+        first=Min('first_submission_at'), last=Max('last_submission_at'),
+    )
+    stats.update(
+        first_submission_at=min(filter(None, (live['first'], archived['first'])), default=None),
+        last_submission_at=max(filter(None, (live['last'], archived['last'])), default=None),
+    )
+
+
+def _submission_counts(submissions):
+    """Per-student counts of ``submissions``, keyed by student id, from two grouped queries."""
+    counts = {
+        row.pop('student_id'): row
+        for row in submissions.values('student_id').annotate(
+            total=Count('id'),
+            approved=Count('id', filter=Q(approved=True)),
+            first_submission_at=Min('date'),
+            last_submission_at=Max('date'),
+        )
+    }
+    days_logged = (
+        submissions.annotate(day=TruncDate('date'), weekday=ExtractIsoWeekDay('date'))
+        .filter(weekday__lt=6)
+        .values('student_id')
+        .annotate(days=Count('day', distinct=True))
+        .values_list('student_id', 'days')
+    )
+    for student_id, days in days_logged:
+        counts[student_id]['days_logged'] = days
+    return counts
+
+
+def record_archived(session, submissions):
+    """
+    Keep the per-student counts of ``session``'s logs, ``submissions``, before they
+    leave the database; StudentStats go on counting them and rebuilds add them back.
+    """
+    ArchivedStats.objects.bulk_create([
+        ArchivedStats(session=session, student_id=student_id, **counts)
+        for student_id, counts in _submission_counts(submissions).items()
+    ], batch_size=1000)
+
+
+def _archived_counts(student_ids=None):
+    """The archived sessions' counts summed per student; sessions never overlap, so their days add up."""
+    archived = ArchivedStats.objects.all()
+    if student_ids is not None:
+        archived = archived.filter(student_id__in=student_ids)
+    return {
+        row.pop('student_id'): row
+        for row in archived.values('student_id').annotate(
+            total=Sum('total'),
+            approved=Sum('approved'),
+            first_submission_at=Min('first_submission_at'),
+            last_submission_at=Max('last_submission_at'),
+            days_logged=Sum('days_logged'),
+        )
+    }
+
+
+def rebuild_student_stats(student_ids=None):
+    """
+    Recompute StudentStats from the Submission table and the archived sessions'
+    ArchivedStats with a few grouped queries.
+
+    Rebuilds every student when ``student_ids`` is None. Returns the number of rows written.
+    """
+    students = CustomUser.objects.filter(user_type='student')
+    submissions = Submission.objects.all()
+    if student_ids is not None:
+        students = students.filter(pk__in=student_ids)
+        submissions = submissions.filter(student_id__in=student_ids)
+    live = _submission_counts(submissions)
+    archived = _archived_counts(student_ids)
+    rows = []
+    for student_id in students.values_list('pk', flat=True).iterator():
+        parts = [counts[student_id] for counts in (live, archived) if student_id in counts]
+        rows.append(StudentStats(
+            student_id=student_id,
+            total=sum(part['total'] for part in parts),
+            approved=sum(part['approved'] for part in parts),
+            first_submission_at=min(filter(None, (part['first_submission_at'] for part in parts)), default=None),
+            last_submission_at=max(filter(None, (part['last_submission_at'] for part in parts)), default=None),
+            days_logged=sum(part.get('days_logged', 0) for part in parts),
+        ))
+    with transaction.atomic():
+        existing = StudentStats.objects.all()
+        if student_ids is not None:
+            existing = existing.filter(student_id__in=student_ids)
+        existing.delete()
+        StudentStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,30 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from SIWES.images import previewable as is_previewable
+from SIWES.images import static_variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(path, sizes='100vw', **attrs):
+    """
+    A <picture> for a static image that offers its WebP variants by width, falling
+    back to the original. Other keyword arguments become attributes of the <img>.
+
+        {% responsive_image 'images/transparentlogbook.png' sizes='50vw' alt='Logbook' %}
+    """
+    img_attrs = format_html_join('', ' {}="{}"', sorted(attrs.items()))
+    img = format_html('<img src="{}"{}>', static(path), img_attrs)
+    variants = static_variants().get(path)
+    if not variants:
+        return img
+    srcset = ', '.join(f'{static(name)} {width}w' for width, name in variants)
+    return format_html('<picture><source type="image/webp" srcset="{}" sizes="{}">{}</picture>', srcset, sizes, img)
+
+
+@register.filter
+def previewable(field_file):
+    return bool(field_file) and is_previewable(field_file.name)
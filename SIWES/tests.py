@@ -1,3 +1,274 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .archive import archive_session
+from .models import ArchivedStats, ChunkedUpload, CustomUser, SiwesSession, StudentStats, Submission
+from .review import bulk_approve, bulk_remark, supervised_submissions
+from .stats import rebuild_student_stats
+from .views import API_PAGE_SIZE
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def stats_of(student):
+    stats = StudentStats.objects.get(student=student)
+    return stats.total, stats.approved, stats.days_logged, stats.first_submission_at, stats.last_submission_at
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SIWESTestCase(TestCase):
+    """Two supervisors with one student each."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.supervisor = cls.make_user('sup.a', 'supervisor')
+        cls.other_supervisor = cls.make_user('sup.b', 'supervisor')
+        cls.student = cls.make_user('stu.a', 'student', supervisor=cls.supervisor, matric_number='U2024/0001')
+        cls.other_student = cls.make_user('stu.b', 'student', supervisor=cls.other_supervisor, matric_number='U2024/0002')
+
+    @staticmethod
+    def make_user(name, user_type, **fields):
+        return CustomUser.objects.create_user(
+            username=name, email=f'{name}@test.logtrack.local', password='correct horse', user_type=user_type, **fields,
+        )
+
+    def log(self, student, **fields):
+        return Submission.objects.create(student=student, matric_number=student.matric_number, text='Fixed a router', **fields)
+
+
+class ReviewScopingTests(SIWESTestCase):
+    """Supervisors may only review the logs of their own students."""
+
+    def setUp(self):
+        self.mine = self.log(self.student)
+        self.theirs = self.log(self.other_student)
+        self.client.force_login(self.supervisor)
+
+    def test_supervised_submissions(self):
+        self.assertEqual(list(supervised_submissions(self.supervisor)), [self.mine])
+
+    def test_bulk_review_ignores_other_supervisors_submissions(self):
+        response = self.client.post(reverse('bulk_review'), {'action': 'approve', 'ids': [self.mine.pk, self.theirs.pk]})
+        self.assertEqual(response.status_code, 200)
+        self.mine.refresh_from_db()
+        self.theirs.refresh_from_db()
+        self.assertTrue(self.mine.approved)
+        self.assertEqual(self.mine.reviewed_by, self.supervisor)
+        self.assertFalse(self.theirs.approved)
+
+    def test_bulk_review_remark_ignores_other_supervisors_submissions(self):
+        self.client.post(reverse('bulk_review'), {'action': 'remark', 'remark': 'Good', 'ids': [self.mine.pk, self.theirs.pk]})
+        self.assertEqual(Submission.objects.get(pk=self.mine.pk).remark, 'Good')
+        self.assertIsNone(Submission.objects.get(pk=self.theirs.pk).remark)
+
+    def test_bulk_review_by_student_is_refused(self):
+        self.client.force_login(self.student)
+        response = self.client.post(reverse('bulk_review'), {'action': 'approve', 'ids': [self.mine.pk]})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Submission.objects.get(pk=self.mine.pk).approved)
+
+    def test_edit_remark_on_other_supervisors_submission_is_404(self):
+        response = self.client.post(reverse('ajax_edit_remark', args=[self.theirs.pk]), {'remark': 'Rewritten'})
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(Submission.objects.get(pk=self.theirs.pk).remark)
+
+    def test_edit_remark_on_own_submission(self):
+        response = self.client.post(reverse('ajax_edit_remark', args=[self.mine.pk]), {'remark': ' Well done '})
+        self.assertEqual(response.json(), {'success': True, 'remark': 'Well done'})
+        self.assertEqual(Submission.objects.get(pk=self.mine.pk).remark, 'Well done')
+
+    def test_approve_id_of_other_supervisors_submission_is_not_found(self):
+        response = self.client.post(reverse('supervisor_dashboard'), {'approve_id': self.theirs.pk})
+        self.assertRedirects(response, reverse('supervisor_dashboard'), fetch_redirect_response=False)
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)], ['Submission not found.'])
+        self.assertFalse(Submission.objects.get(pk=self.theirs.pk).approved)
+
+    def test_approve_id_of_own_submission(self):
+        self.client.post(reverse('supervisor_dashboard'), {'approve_id': self.mine.pk, 'remark': 'Fine'})
+        self.mine.refresh_from_db()
+        self.assertTrue(self.mine.approved)
+        self.assertEqual(self.mine.remark, 'Fine')
+        self.assertEqual(self.mine.reviewed_by, self.supervisor)
+        self.assertIsNotNone(self.mine.reviewed_at)
+
+
+class StudentStatsTests(SIWESTestCase):
+    """The signal and bulk-review bookkeeping must agree with a rebuild from scratch."""
+
+    def assertStatsMatchRebuild(self, student):
+        counted = stats_of(student)
+        rebuild_student_stats([student.pk])
+        self.assertEqual(counted, stats_of(student))
+
+    def test_created(self):
+        first, second = self.log(self.student), self.log(self.student)
+        stats = StudentStats.objects.get(student=self.student)
+        self.assertEqual((stats.total, stats.approved, stats.pending), (2, 0, 2))
+        self.assertEqual((stats.first_submission_at, stats.last_submission_at), (first.date, second.date))
+        self.assertStatsMatchRebuild(self.student)
+
+    def test_approved_by_save_and_unapproved(self):
+        submission = self.log(self.student)
+        submission.approved = True
+        submission.save()
+        self.assertEqual(StudentStats.objects.get(student=self.student).approved, 1)
+        self.assertIsNotNone(submission.reviewed_at)
+        submission.approved = False
+        submission.save()
+        self.assertEqual(StudentStats.objects.get(student=self.student).approved, 0)
+        self.assertIsNone(submission.reviewed_at)
+        self.assertStatsMatchRebuild(self.student)
+
+    def test_bulk_approve_counts_each_submission_once(self):
+        submissions = [self.log(self.student) for _ in range(3)]
+        bulk_approve(self.supervisor, supervised_submissions(self.supervisor).filter(pk__in=[s.pk for s in submissions[:2]]))
+        # Already approved rows are skipped rather than counted again
+        bulk_approve(self.supervisor, supervised_submissions(self.supervisor))
+        bulk_remark(supervised_submissions(self.supervisor), 'Noted')
+        self.assertEqual(StudentStats.objects.get(student=self.student).approved, 3)
+        self.assertStatsMatchRebuild(self.student)
+
+    def test_deleted(self):
+        first, second = self.log(self.student, approved=True), self.log(self.student)
+        first.delete()
+        stats = StudentStats.objects.get(student=self.student)
+        self.assertEqual((stats.total, stats.approved, stats.first_submission_at), (1, 0, second.date))
+        second.delete()
+        self.assertEqual(stats_of(self.student), (0, 0, 0, None, None))
+        self.assertStatsMatchRebuild(self.student)
+
+    def test_days_logged_counts_working_days_once(self):
+        # Monday of last week, in the morning so an hour later is still the same day
+        monday = timezone.make_aware(datetime.combine(
+            timezone.localdate() - timedelta(days=timezone.localdate().weekday() + 7), time(9),
+        ))
+        for date in (monday, monday + timedelta(hours=1), monday + timedelta(days=1), monday + timedelta(days=5)):
+            Submission.objects.filter(pk=self.log(self.student).pk).update(date=date)
+        rebuild_student_stats([self.student.pk])
+        # Monday twice, Tuesday and a Saturday
+        self.assertEqual(StudentStats.objects.get(student=self.student).days_logged, 2)
+
+
+class ArchivedStatsTests(SIWESTestCase):
+    """Archived sessions keep counting in StudentStats, through rebuilds too."""
+
+    def setUp(self):
+        archive_root = tempfile.mkdtemp(prefix='logtrack-test-archive-')
+        self.addCleanup(shutil.rmtree, archive_root)
+        storages = override_settings(STORAGES={
+            **settings.STORAGES,
+            'archive': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': archive_root}},
+        })
+        storages.enable()
+        self.addCleanup(storages.disable)
+        past = timezone.now() - timedelta(days=40)
+        for offset in range(3):
+            Submission.objects.filter(pk=self.log(self.student, approved=offset == 0).pk).update(date=past + timedelta(days=offset))
+        self.recent = self.log(self.student)
+        rebuild_student_stats()
+        self.session = SiwesSession.objects.create(
+            name='2025/2026', slug='2025-2026', starts_on=timezone.localdate(past), ends_on=timezone.localdate(past) + timedelta(days=7),
+            closed=True,
+        )
+
+    def test_rebuild_keeps_archived_logs(self):
+        before = stats_of(self.student)
+        archive_session(self.session)
+        self.assertEqual(Submission.objects.filter(student=self.student).count(), 1)
+        self.assertEqual(stats_of(self.student), before)
+        rebuild_student_stats()
+        self.assertEqual(stats_of(self.student), before)
+
+    def test_deleting_a_live_log_keeps_archived_first_log(self):
+        first = stats_of(self.student)[3]
+        archive_session(self.session)
+        self.recent.delete()
+        self.assertEqual(stats_of(self.student)[:2], (3, 1))
+        self.assertEqual(stats_of(self.student)[3], first)
+
+    def test_deleting_archived_session_forgets_its_logs(self):
+        archive_session(self.session)
+        SiwesSession.objects.get(pk=self.session.pk).delete()
+        self.assertFalse(ArchivedStats.objects.exists())
+        self.assertEqual(stats_of(self.student)[:2], (1, 0))
+
+
+class SubmissionsAPITests(SIWESTestCase):
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def test_etag_revalidation(self):
+        submission = self.log(self.student)
+        url = reverse('api_student_submissions')
+        response = self.client.get(url)
+        etag = response.headers['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response.headers)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        submission.text = 'Fixed two routers'
+        submission.save()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_cursor_pages_cover_every_log_once(self):
+        # Equal dates, so the pages must break ties by id
+        ids = [self.log(self.student).pk for _ in range(API_PAGE_SIZE * 2 + 1)]
+        Submission.objects.filter(pk__in=ids).update(date=timezone.now())
+        seen, cursor = [], None
+        while True:
+            page = self.client.get(reverse('api_student_submissions'), {'cursor': cursor} if cursor else {}).json()
+            seen += [row['id'] for row in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, sorted(ids, reverse=True))
+
+    def test_supervisor_sees_own_students_only(self):
+        self.log(self.student)
+        self.log(self.other_student)
+        self.client.force_login(self.supervisor)
+        page = self.client.get(reverse('api_supervisor_submissions')).json()
+        self.assertEqual({row['id'] for row in page['results']}, set(
+            Submission.objects.filter(student=self.student).values_list('pk', flat=True),
+        ))
+
+
+class ChunkedUploadTests(SIWESTestCase):
+    def setUp(self):
+        upload_root = tempfile.mkdtemp(prefix='logtrack-test-uploads-')
+        self.addCleanup(shutil.rmtree, upload_root)
+        storages = override_settings(STORAGES={
+            **settings.STORAGES,
+            'uploads': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': upload_root}},
+        })
+        storages.enable()
+        self.addCleanup(storages.disable)
+        self.client.force_login(self.student)
+        response = self.client.post(reverse('upload_start'), {'filename': 'evidence.txt', 'size': 10})
+        self.url = reverse('upload_chunk', args=[response.json()['id']])
+
+    def append(self, offset, data):
+        return self.client.post(
+            self.url, data, content_type='application/octet-stream', headers={'Upload-Offset': str(offset)},
+        )
+
+    def test_chunks_at_the_wrong_offset_are_refused_with_the_resume_offset(self):
+        self.assertEqual(self.append(0, b'hello').json()['offset'], 5)
+        # A retried chunk
+        response = self.append(0, b'hello')
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 5))
+        # A chunk from too far ahead
+        response = self.append(8, b'ld')
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 5))
+        self.assertEqual(self.append(5, b'world').json()['offset'], 10)
+
+    def test_other_users_cannot_append(self):
+        self.client.force_login(self.other_student)
+        self.assertEqual(self.append(0, b'hello').status_code, 404)
+        self.assertEqual(ChunkedUpload.objects.get().offset, 0)
@@ -0,0 +1,320 @@
+"""
+Streaming dump and load of LogTrack's data, for backups and for moving a campus
+between databases; dumpdata/loaddata build every object in memory and save rows one
+at a time, which takes hours for a full campus.
+
+``dump`` writes a directory holding:
+
+``<table>.ndjson.gz``
+    One JSON array of column values per row, in primary key order, for each of
+    TABLES. The rows are read in chunks from a server-side cursor, inside one
+    read-only transaction so the tables agree with each other.
+``media/``
+    The attachments of the dumped logs, under their storage names. Files already
+    there with the same size are not copied again, so dumping into the same
+    directory again only copies new attachments.
+``manifest.json``
+    The columns and row count of each table, and the attachment totals. It is
+    written last and removed first, so a directory without one is an incomplete dump.
+
+``load`` streams the tables back into an empty, migrated database in one
+transaction, primary keys included: with COPY on PostgreSQL and batched
+executemany elsewhere. Django creates foreign keys DEFERRABLE INITIALLY DEFERRED
+and they are only checked at the end, so a student may come before their supervisor
+in the users table. Sequences are reset past the loaded ids, StudentStats and the
+search index are rebuilt, and only attachments missing from media storage, or of a
+different size there, are copied. StudentStats are rebuilt from the logs and the
+dumped ArchivedStats, so archived sessions keep counting.
+
+Users' groups and permissions, StudentStats, rollups and uploads in progress are not
+dumped; ``rollup_analytics --rebuild`` recomputes the rollups, though only from the
+logs still in the database. Archives (see SIWES.archive) live in their own storage,
+which is backed up as such.
+"""
+import gzip
+import json
+import os
+import shutil
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import auth, fragments, partitions, search
+from .exports import EXPORT_CHUNK_SIZE
+from .models import ArchivedStats, CustomUser, SiwesSession, Submission
+from .stats import rebuild_student_stats
+
+DUMP_FORMAT = 1
+MANIFEST_FILE = 'manifest.json'
+MEDIA_DIR = 'media'
+# Loaded in this order; the sessions come first so each session's partition exists before its logs arrive
+TABLES = (
+    ('sessions', SiwesSession), ('users', CustomUser), ('archived_stats', ArchivedStats), ('submissions', Submission),
+)
+# Rows per executemany where COPY isn't available
+LOAD_BATCH_SIZE = 5000
+# gzip level of the table files: compressing dominates a dump's time, and level 1 still shrinks the JSON six-fold
+DUMP_COMPRESSLEVEL = 1
+# Values of these field types are stored as strings and converted back on load
+CONVERTED_TYPES = ('DateTimeField', 'DateField', 'TimeField', 'DecimalField')
+
+
+class TransferError(Exception):
+    pass
+
+
+def _table_file(name):
+    return f'{name}.ndjson.gz'
+
+
+def _encode(value):
+    # Full precision, unlike DjangoJSONEncoder, which cuts datetimes to milliseconds
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _same_size(path, size):
+    try:
+        return os.path.getsize(path) == size
+    except OSError:
+        return False
+
+
+def _dump_table(path, model, compresslevel, on_row=None):
+    fields = model._meta.concrete_fields
+    rows = model._base_manager.order_by('pk').values_list(*(field.attname for field in fields))
+    count = 0
+    partial = path.with_name(f'{path.name}.partial')
+    with gzip.open(partial, 'wt', encoding='utf-8', compresslevel=compresslevel) as data:
+        for values in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            data.write(json.dumps(values, default=_encode, ensure_ascii=False, separators=(',', ':')) + '\n')
+            count += 1
+            if on_row is not None:
+                on_row(values)
+    os.replace(partial, path)
+    return {'file': path.name, 'columns': [field.column for field in fields], 'count': count}
+
+
+def _dump_attachments(directory, names):
+    """Copy the attachments ``names`` from media storage into ``directory``, skipping those already there."""
+    totals = {'count': 0, 'copied': 0, 'bytes': 0, 'missing': []}
+    for name in names:
+        try:
+            size = default_storage.size(name)
+        except OSError:
+            totals['missing'].append(name)
+            continue
+        totals['count'] += 1
+        totals['bytes'] += size
+        target = directory / name
+        if _same_size(target, size):
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(f'{target.name}.partial')
+        with default_storage.open(name, 'rb') as source, open(partial, 'wb') as copy:
+            shutil.copyfileobj(source, copy)
+        os.replace(partial, target)
+        totals['copied'] += 1
+    return totals
+
+
+def dump(directory, media=True, compresslevel=DUMP_COMPRESSLEVEL):
+    """Dump TABLES, and the attachments unless ``media`` is False, into ``directory``. Returns the manifest."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / MANIFEST_FILE).unlink(missing_ok=True)
+    started = time.monotonic()
+    attachments = {}
+    file_index = [field.attname for field in Submission._meta.concrete_fields].index('file')
+
+    def collect(values):
+        if values[file_index]:
+            attachments[values[file_index]] = None
+
+    tables = {}
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Must be the transaction's first statement; every table then reads the same snapshot
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        for name, model in TABLES:
+            tables[name] = _dump_table(
+                directory / _table_file(name), model, compresslevel, collect if model is Submission else None,
+            )
+    manifest = {
+        'format': DUMP_FORMAT,
+        'created_at': timezone.now().isoformat(),
+        'vendor': connection.vendor,
+        'tables': tables,
+        'attachments': _dump_attachments(directory / MEDIA_DIR, attachments) if media else None,
+        'seconds': round(time.monotonic() - started, 3),
+    }
+    with open(directory / MANIFEST_FILE, 'w') as file:
+        json.dump(manifest, file, indent=1)
+    return manifest
+
+
+def load_manifest(directory):
+    try:
+        with open(Path(directory) / MANIFEST_FILE) as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        raise TransferError(f'{directory} has no {MANIFEST_FILE}: it is not a dump, or an incomplete one.') from None
+    if manifest.get('format') != DUMP_FORMAT:
+        raise TransferError(f'{directory} is a dump of format {manifest.get("format")}, not {DUMP_FORMAT}.')
+    return manifest
+
+
+def _columns(model, entry):
+    """The fields matching the dumped columns, in the dump's order; any left out must be nullable."""
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    unknown = [column for column in entry['columns'] if column not in fields]
+    if unknown:
+        raise TransferError(f'{model._meta.db_table} has no column {", ".join(unknown)}; migrate the database first.')
+    missing = [column for column, field in fields.items() if column not in entry['columns'] and not field.null]
+    if missing:
+        raise TransferError(f'The dump of {model._meta.db_table} lacks the required column {", ".join(missing)}.')
+    return [fields[column] for column in entry['columns']]
+
+
+def _converter(field):
+    """The function turning a dumped value of ``field`` into what the database driver takes."""
+    ops = connection.ops
+    # The two types of most columns skip the field's own conversions, which cost more than the insert
+    if field.get_internal_type() == 'DateTimeField':
+        return lambda value: ops.adapt_datetimefield_value(datetime.fromisoformat(value))
+    if field.get_internal_type() == 'DateField':
+        return lambda value: ops.adapt_datefield_value(date.fromisoformat(value))
+    return lambda value: field.get_db_prep_value(field.to_python(value), connection)
+
+
+def _rows(path, fields):
+    """The rows of a table file, as the values the database driver takes."""
+    converters = [
+        (index, _converter(field)) for index, field in enumerate(fields)
+        if field.get_internal_type() in CONVERTED_TYPES
+    ]
+    with gzip.open(path, 'rt', encoding='utf-8') as data:
+        for line in data:
+            values = json.loads(line)
+            for index, convert in converters:
+                if values[index] is not None:
+                    values[index] = convert(values[index])
+            yield values
+
+
+def _insert(model, fields, rows):
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = ', '.join(qn(field.column) for field in fields)
+    count = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+                for values in rows:
+                    copy.write_row(values)
+                    count += 1
+            return count
+        sql = f'INSERT INTO {table} ({columns}) VALUES ({", ".join(["%s"] * len(fields))})'
+        batch = []
+        for values in rows:
+            batch.append(values)
+            if len(batch) == LOAD_BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+    return count
+
+
+def _load_attachments(directory):
+    """Copy the dumped attachments into media storage, skipping those already there with the same size."""
+    totals = {'count': 0, 'copied': 0, 'bytes': 0}
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith('.partial'):
+                continue
+            path = Path(root) / filename
+            name = path.relative_to(directory).as_posix()
+            size = path.stat().st_size
+            totals['count'] += 1
+            totals['bytes'] += size
+            if default_storage.exists(name):
+                try:
+                    if default_storage.size(name) == size:
+                        continue
+                except (OSError, NotImplementedError):
+                    pass
+                default_storage.delete(name)
+            with open(path, 'rb') as source:
+                saved = default_storage.save(name, File(source, name=name))
+            if saved != name:
+                raise TransferError(f'Media storage saved {name} as {saved}.')
+            totals['copied'] += 1
+    return totals
+
+
+def load(directory, media=True):
+    """
+    Load the dump in ``directory`` into the database, which must hold no sessions,
+    users or logs yet, and its attachments into media storage unless ``media`` is
+    False. Returns the rows loaded per table, the attachment totals and timings.
+    """
+    directory = Path(directory)
+    manifest = load_manifest(directory)
+    columns = {name: _columns(model, manifest['tables'][name]) for name, model in TABLES}
+    for name, model in TABLES:
+        if model._base_manager.exists():
+            raise TransferError(f'The database already has {model._meta.verbose_name_plural}; load into an empty one.')
+
+    started = time.monotonic()
+    result = {'tables': {}, 'seconds': {}}
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+        else:
+            # The FTS triggers would index the logs one by one; one rebuild afterwards is far faster
+            search.uninstall_search_backend(connection)
+        for name, model in TABLES:
+            table_started = time.monotonic()
+            path = directory / manifest['tables'][name]['file']
+            result['tables'][name] = _insert(model, columns[name], _rows(path, columns[name]))
+            result['seconds'][name] = time.monotonic() - table_started
+            if model is SiwesSession:
+                for session in SiwesSession.objects.filter(archived_at__isnull=True):
+                    partitions.add_session_partition(connection, session)
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(), [model for _, model in TABLES]):
+                cursor.execute(statement)
+        try:
+            connection.check_constraints(table_names=[model._meta.db_table for _, model in TABLES])
+        except IntegrityError as exc:
+            raise TransferError(f'The dump is inconsistent: {exc}') from exc
+
+        finishing = time.monotonic()
+        search.install_search_backend(connection)
+        rebuild_student_stats()
+        # A cache shared with the database this one replaces may still hold its users and fragments
+        auth.forget_users(CustomUser.objects.values_list('pk', flat=True))
+        fragments.bump_submission_versions(Submission.objects.values_list('student_id', flat=True).distinct())
+        result['seconds']['rebuild'] = time.monotonic() - finishing
+
+    if media and (directory / MEDIA_DIR).is_dir():
+        media_started = time.monotonic()
+        result['attachments'] = _load_attachments(directory / MEDIA_DIR)
+        result['seconds']['media'] = time.monotonic() - media_started
+    result['seconds']['total'] = time.monotonic() - started
+    return result
@@ -0,0 +1,191 @@
+"""
+Chunked, resumable uploads for submission attachments.
+
+A client starts an upload with its name and size, appends chunks at the offset the
+server reports, and after a dropped connection asks for that offset and carries on.
+Each chunk is spooled from the request (to disk past SPOOL_SIZE, never held whole in
+memory) and saved as its own file, ``<upload id>/<offset>.chunk``, in the ``uploads``
+storage, since storage backends can't append. A complete upload's chunks are joined
+into the submission's FileField storage, and attached in the same transaction that
+saves the submission.
+
+Consecutive chunks may reach different instances, so the ``uploads`` storage must be
+shared by all of them (see STORAGES in the settings); the local directory it
+defaults to only serves a single instance.
+"""
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import ChunkedUpload
+
+# Suggested to clients; any size up to MAX_CHUNK_SIZE is accepted
+CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+# Bytes copied from the request at a time
+COPY_BUFFER_SIZE = 64 * 1024
+# A chunk larger than this is spooled to a temporary file rather than memory before it is stored
+SPOOL_SIZE = 1024 * 1024
+STALE_AFTER = timedelta(days=1)
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        # For a 409, the offset the client should resume from
+        self.offset = offset
+
+
+def upload_storage():
+    return storages['uploads']
+
+
+def chunk_dir(upload_id):
+    return str(upload_id)
+
+
+def chunk_name(upload_id, offset):
+    # Zero-padded so the names sort in offset order
+    return f'{chunk_dir(upload_id)}/{offset:012d}.chunk'
+
+
+def incomplete_upload_error(upload):
+    return UploadError(
+        f'Upload is incomplete: {upload.offset} of {upload.size} bytes received.', status=409, offset=upload.offset,
+    )
+
+
+def start_upload(owner, filename, size):
+    """Register a new upload of ``size`` bytes."""
+    filename = get_valid_filename(os.path.basename(filename or ''))
+    if not filename:
+        raise UploadError('A file name is required.')
+    if size <= 0 or size > MAX_UPLOAD_SIZE:
+        raise UploadError(f'Files must be between 1 byte and {MAX_UPLOAD_SIZE // (1024 * 1024)} MB.')
+    return ChunkedUpload.objects.create(owner=owner, filename=filename, size=size)
+
+
+def get_upload(owner, upload_id, for_update=False):
+    uploads = ChunkedUpload.objects.select_for_update() if for_update else ChunkedUpload.objects.all()
+    try:
+        return uploads.get(pk=upload_id, owner=owner)
+    except (ChunkedUpload.DoesNotExist, ValidationError):
+        # A malformed id is as unknown as a missing one
+        raise UploadError('Upload not found.', status=404)
+
+
+def append_chunk(owner, upload_id, offset, stream, length):
+    """
+    Copy ``length`` bytes from ``stream`` into the upload at ``offset``.
+
+    ``offset`` must equal the bytes already received, so a retried or duplicated chunk
+    is refused instead of corrupting the file; the client then resumes from the
+    offset in the error. A chunk stored by an attempt that failed to commit is
+    replaced by the next one, which starts at the same offset. Returns the updated
+    upload.
+    """
+    with transaction.atomic():
+        upload = get_upload(owner, upload_id, for_update=True)
+        if offset != upload.offset:
+            raise UploadError(f'Expected offset {upload.offset}.', status=409, offset=upload.offset)
+        if length <= 0 or length > MAX_CHUNK_SIZE:
+            raise UploadError(f'Chunks must be between 1 byte and {MAX_CHUNK_SIZE // (1024 * 1024)} MB.')
+        if upload.offset + length > upload.size:
+            raise UploadError('Chunk runs past the declared file size.')
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as chunk:
+            remaining = length
+            while remaining:
+                data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                chunk.write(data)
+                remaining -= len(data)
+            received = length - remaining
+            if not received:
+                return upload
+            chunk.seek(0)
+            storage = upload_storage()
+            name = chunk_name(upload.pk, upload.offset)
+            storage.delete(name)
+            if storage.save(name, File(chunk)) != name:
+                raise UploadError('The chunk could not be stored.', status=500)
+        upload.offset += received
+        upload.save(update_fields=['offset', 'updated_at'])
+    return upload
+
+
+def _join_chunks(upload, target):
+    """Copy the upload's chunks, in order, into the file ``target``."""
+    storage = upload_storage()
+    _, names = storage.listdir(chunk_dir(upload.pk))
+    position = 0
+    for filename in sorted(names):
+        offset = int(filename.split('.')[0])
+        if offset >= upload.size:
+            continue
+        if offset != position:
+            raise incomplete_upload_error(upload)
+        with storage.open(f'{chunk_dir(upload.pk)}/{filename}', 'rb') as chunk:
+            while data := chunk.read(COPY_BUFFER_SIZE):
+                target.write(data)
+                position += len(data)
+    if position != upload.size:
+        raise incomplete_upload_error(upload)
+
+
+def attach_upload(upload, submission):
+    """
+    Save ``submission`` with the complete ``upload`` as its file.
+
+    The file is copied into storage first; the submission row and the removal of the
+    upload then commit together, and the stored copy is deleted again if they don't.
+    """
+    if not upload.complete:
+        raise incomplete_upload_error(upload)
+    with tempfile.TemporaryFile() as joined:
+        _join_chunks(upload, joined)
+        joined.seek(0)
+        submission.file.save(upload.filename, File(joined), save=False)
+    stored = submission.file.name
+    try:
+        with transaction.atomic():
+            submission.save()
+            upload.delete()
+    except Exception:
+        submission.file.storage.delete(stored)
+        raise
+    return submission
+
+
+def remove_chunks(upload_id):
+    storage = upload_storage()
+    try:
+        _, names = storage.listdir(chunk_dir(upload_id))
+    except FileNotFoundError:
+        return
+    for filename in names:
+        storage.delete(f'{chunk_dir(upload_id)}/{filename}')
+    try:
+        # Directories only exist on disk; other backends have nothing left to remove
+        storage.delete(chunk_dir(upload_id))
+    except (OSError, NotImplementedError):
+        pass
+
+
+def purge_stale_uploads(older_than=STALE_AFTER):
+    """Delete uploads nobody has touched for ``older_than``; their chunks go with them."""
+    stale = ChunkedUpload.objects.filter(updated_at__lt=timezone.now() - older_than)
+    count = 0
+    for upload in stale.iterator():
+        upload.delete()
+        count += 1
+    return count
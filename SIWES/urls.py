@@ -18,7 +18,17 @@ urlpatterns = [
     path('student/dashboard/', views.student_dashboard, name='student_dashboard'),
     path('student/submission/<int:submission_id>/edit/', views.edit_submission, name='edit_submission'),
     path('student/delete_submission/<int:submission_id>/', views.delete_submission, name='delete_submission'),
+    path('submission/<int:submission_id>/preview/', views.attachment_preview, name='attachment_preview'),
+    path('student/uploads/', views.upload_start, name='upload_start'),
+    path('student/uploads/<uuid:upload_id>/', views.upload_chunk, name='upload_chunk'),
+    path('student/uploads/<uuid:upload_id>/finalize/', views.upload_finalize, name='upload_finalize'),
     path('supervisor/dashboard/', views.supervisor_dashboard, name='supervisor_dashboard'),
     path('supervisor/ajax/edit_remark/<int:submission_id>/', views.ajax_edit_remark, name='ajax_edit_remark'),
+    path('supervisor/ajax/bulk_review/', views.bulk_review, name='bulk_review'),
+    path('supervisor/events/', views.supervisor_events, name='supervisor_events'),
     path('supervisor/logs/', views.supervisor_logs, name='supervisor_logs'),
+    path('api/v1/student/submissions/', views.api_student_submissions, name='api_student_submissions'),
+    path('api/v1/supervisor/submissions/', views.api_supervisor_submissions, name='api_supervisor_submissions'),
+    path('api/v1/archive/<slug:session>/submissions/', views.api_archived_submissions, name='api_archived_submissions'),
+    path('healthz/db', views.health_db, name='health_db'),
 ]
\ No newline at end of file
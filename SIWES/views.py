@@ -1,92 +1,116 @@
 # Ensure login_required is imported at the top
+import asyncio
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import never_cache
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse, HttpResponse
+from django.db import connection
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from .api import (
+    SUBMISSION_FIELDS, archived_submissions_etag, archived_submissions_payload, filter_submissions, submissions_etag,
+    submissions_payload, submissions_watermark,
+)
+from .archive import ArchiveError, archived_count, load_manifest, read_archive
 from .forms_edit import SubmissionEditForm
+from .pagination import CursorPage
+from .events import RESET, broker, get_backend
+from .exports import astream_submissions_csv, logbook_pdf_response
+from .fragments import FRAGMENT_TIMEOUT, submission_versions
+from .images import attachment_preview as attachment_preview_name
+from .review import bulk_approve, bulk_remark, supervised_submissions
+from .search import SEARCH_RESULT_LIMIT
+from .uploads import (
+    CHUNK_SIZE, UploadError, append_chunk, attach_upload, get_upload, incomplete_upload_error, start_upload,
+)
+
+# Columns rendered for each student in the supervisor views' student pickers
+STUDENT_LIST_FIELDS = ('id', 'matric_number', 'first_name', 'last_name', 'email')
+# Columns rendered on supervisor_logs cards
+SUPERVISOR_LOG_FIELDS = ('id', 'matric_number', 'date', 'overview', 'text', 'file', 'approved', 'remark')
+# Per-student counts read from the StudentStats rollup instead of scanning submissions
+STUDENT_STATS_FIELDS = ('stats__total', 'stats__approved', 'stats__first_submission_at', 'stats__last_submission_at', 'stats__days_logged')
+# Columns needed to show a submission's student by name
+STUDENT_NAME_FIELDS = ('student__id', 'student__first_name', 'student__last_name', 'student__email')
+# Columns rendered on supervisor_dashboard cards, including the student's name; updated_at keys the card cache
+SUPERVISOR_CARD_FIELDS = ('id', 'matric_number', 'date', 'updated_at', 'text', 'file', 'approved', 'remark') + STUDENT_NAME_FIELDS
+# Seconds browsers may reuse an attachment preview redirect
+PREVIEW_MAX_AGE = 60 * 60 * 24
+# Page size of the JSON API; clients follow next_cursor for more
+API_PAGE_SIZE = 50
+# Seconds clients may reuse a page of an archived session, which never changes
+ARCHIVE_MAX_AGE = 60 * 60
+# Seconds between the comments that stop proxies closing an idle event stream
+EVENTS_KEEPALIVE = 20
+# Milliseconds browsers wait before reconnecting a dropped event stream
+EVENTS_RETRY_MS = 5000
+# Submissions an event stream renders cards for at once; past this it sends their ids only
+EVENTS_CARD_LIMIT = 50
 
 @login_required
-def supervisor_logs(request):
-    user = request.user
+async def supervisor_logs(request):
+    user = await request.auser()
     if not hasattr(user, 'user_type') or user.user_type != 'supervisor':
         from django.contrib import messages
         messages.error(request, 'You do not have permission to access this page.')
         from django.shortcuts import redirect
         return redirect('landing')
-    students = CustomUser.objects.filter(user_type='student', supervisor=user)
-    submissions = Submission.objects.filter(student__in=students)
-    selected_student = request.GET.get('student')
+    students = [
+        student async for student in
+        CustomUser.objects.filter(user_type='student', supervisor=user)
+        .select_related('stats').only(*STUDENT_LIST_FIELDS, *STUDENT_STATS_FIELDS)
+    ]
+    submissions = supervised_submissions(user)
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
-    status_filter = request.GET.get('status')
-    from datetime import datetime, timedelta
-    if selected_student:
-        submissions = submissions.filter(matric_number=selected_student)
-    if start_date:
-        try:
-            start = datetime.strptime(start_date, '%Y-%m-%d')
-            submissions = submissions.filter(date__gte=start)
-        except Exception:
-            pass
-    if end_date:
-        try:
-            end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            submissions = submissions.filter(date__lt=end)
-        except Exception:
-            pass
-    if status_filter == 'approved':
-        submissions = submissions.filter(approved=True)
-    elif status_filter == 'pending':
-        submissions = submissions.filter(approved=False)
-    submissions = submissions.order_by('-date')
+    query = request.GET.get('q', '').strip()
+    submissions = filter_submissions(submissions, request.GET).order_by('-date')
     # PDF export
     if request.GET.get('export') == 'pdf':
-        from django.template.loader import render_to_string
-        from django.http import HttpResponse
-        
-        # Build absolute file URLs for each submission
-        submissions_with_urls = []
-        for s in submissions:
-            file_url = request.build_absolute_uri(s.file.url) if s.file else None
-            submissions_with_urls.append({
-                'matric_number': s.matric_number,
-                'student': s.student,
-                'date': s.date,
-                'overview': s.overview,
-                'text': s.text,
-                'file_url': file_url,
-                'approved': s.approved,
-                'remark': s.remark,
-            })
-        
-        # Render your existing template to string
-        html_string = render_to_string('SIWES/supervisor_logs_pdf.html', {
-            'user': user,
-            'students': students,
-            'submissions': submissions_with_urls,
-            'start_date': start_date,
-            'end_date': end_date,
-        })
-        
-        # Return as HTML with PDF-like styling (your template already has print-friendly CSS)
-        response = HttpResponse(html_string, content_type='text/html')
-        response['Content-Disposition'] = 'inline; filename="student_logs.html"'
-        return response
-    return render(request, 'SIWES/supervisor_logs.html', {
+        header_lines = [f'Supervisor: {user.get_full_name() or user.email}']
+        if query:
+            header_lines.append(f'Search: {query}')
+        if start_date:
+            header_lines.append(f'Start Date: {start_date}')
+        if end_date:
+            header_lines.append(f'End Date: {end_date}')
+        return await sync_to_async(logbook_pdf_response)(
+            request, user, submissions.order_by('student__matric_number', 'student_id', '-date'),
+            'Student Logs Report', header_lines, 'student_logs.pdf', group_by_student=True,
+        )
+    if query:
+        # Ranked matches replace the date-ordered pages while searching
+        page = [
+            submission async for submission in
+            submissions.only(*SUPERVISOR_LOG_FIELDS).order_by('-search_rank', '-date', '-id')[:SEARCH_RESULT_LIMIT]
+        ]
+    else:
+        page = await CursorPage(submissions.only(*SUPERVISOR_LOG_FIELDS), request.GET.get('cursor'), params=request.GET).aload()
+    return await arender(request, 'SIWES/supervisor_logs.html', {
         'user': user,
         'students': students,
-        'submissions': submissions,
+        'submissions': page,
+        'query': query,
+        'search_limit': SEARCH_RESULT_LIMIT,
         'start_date': start_date,
         'end_date': end_date,
     })
-from .models import Submission , CustomUser
+from .models import Submission , CustomUser, SiwesSession
 from django.shortcuts import render, redirect
-from django.contrib.auth import authenticate, login as auth_login
+from django.contrib.auth import login as auth_login
 from django.contrib import messages
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
 from django.contrib.auth.views import PasswordResetView
 from .custom_password_reset_form import CustomPasswordResetForm
 from django.shortcuts import get_object_or_404
 
+# The async views render in a worker thread, since templates may still read lazy querysets
+arender = sync_to_async(render)
+
 
 # Student can delete their own unapproved submission
 @login_required
@@ -103,16 +127,305 @@ def delete_submission(request, submission_id):
 
 # AJAX endpoint for inline supervisor remark editing
 @login_required
-def ajax_edit_remark(request, submission_id):
-    if request.method == 'POST' and request.user.user_type == 'supervisor':
-        submission = get_object_or_404(Submission, id=submission_id)
+async def ajax_edit_remark(request, submission_id):
+    user = await request.auser()
+    if request.method == 'POST' and user.user_type == 'supervisor':
+        # Other supervisors' submissions 404, as if they didn't exist
+        submission = supervised_submissions(user).filter(pk=submission_id)
+        if not await submission.aexists():
+            raise Http404('Submission not found.')
         remark = request.POST.get('remark', '').strip()
-        submission.remark = remark
-        submission.save()
-        return JsonResponse({'success': True, 'remark': submission.remark})
+        await sync_to_async(bulk_remark)(submission, remark)
+        return JsonResponse({'success': True, 'remark': remark})
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
 
+# Bulk review endpoint: approve or remark many submissions in one request
+@login_required
+@require_POST
+async def bulk_review(request):
+    user = await request.auser()
+    if user.user_type != 'supervisor':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=403)
+    action = request.POST.get('action', 'approve')
+    remark = request.POST.get('remark', '').strip()
+    submissions = supervised_submissions(user)
+    ids = request.POST.getlist('ids')
+    selected_student = request.POST.get('student')
+    from datetime import datetime, timedelta
+    if ids:
+        if not all(pk.isdigit() for pk in ids):
+            return JsonResponse({'success': False, 'error': 'Invalid submission ids.'}, status=400)
+        submissions = submissions.filter(pk__in=ids)
+    elif selected_student:
+        # e.g. "approve all pending for student X in range"
+        submissions = submissions.filter(matric_number=selected_student)
+        try:
+            if request.POST.get('start_date'):
+                submissions = submissions.filter(date__gte=datetime.strptime(request.POST['start_date'], '%Y-%m-%d'))
+            if request.POST.get('end_date'):
+                end = datetime.strptime(request.POST['end_date'], '%Y-%m-%d') + timedelta(days=1)
+                submissions = submissions.filter(date__lt=end)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid date range.'}, status=400)
+    else:
+        return JsonResponse({'success': False, 'error': 'Select submissions or a student.'}, status=400)
+    if action == 'approve':
+        updated = await sync_to_async(bulk_approve)(user, submissions, remark)
+    elif action == 'remark' and remark:
+        updated = await sync_to_async(bulk_remark)(submissions, remark)
+    else:
+        return JsonResponse({'success': False, 'error': 'Invalid action.'}, status=400)
+    return JsonResponse({'success': True, 'action': action, 'updated': len(updated), 'ids': updated, 'remark': remark})
+
+
+def _upload_error(exc):
+    data = {'success': False, 'error': str(exc)}
+    if exc.offset is not None:
+        # Tell the client where to resume
+        data['offset'] = exc.offset
+    return JsonResponse(data, status=exc.status)
+
+
+def _upload_state(upload):
+    return {'success': True, 'id': str(upload.pk), 'offset': upload.offset, 'size': upload.size, 'chunk_size': CHUNK_SIZE}
+
+
+# Chunked attachment uploads: start one, append chunks at the server's offset, then finalize
+@login_required
+@require_POST
+def upload_start(request):
+    if request.user.user_type != 'student':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=403)
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid file size.'}, status=400)
+    try:
+        upload = start_upload(request.user, request.POST.get('filename'), size)
+    except UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(_upload_state(upload), status=201)
+
+
+# GET reports how much has arrived; POST appends the raw request body at the Upload-Offset header
+@login_required
+def upload_chunk(request, upload_id):
+    try:
+        if request.method == 'GET':
+            return JsonResponse(_upload_state(get_upload(request.user, upload_id)))
+        if request.method != 'POST':
+            return JsonResponse({'success': False, 'error': 'Invalid request'}, status=405)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Upload-Offset and Content-Length are required.'}, status=400)
+        upload = append_chunk(request.user, upload_id, offset, request, length)
+    except UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse(_upload_state(upload))
+
+
+# Check an upload is complete, optionally attaching it straight to one of the student's pending logs
+@login_required
+@require_POST
+def upload_finalize(request, upload_id):
+    user = request.user
+    try:
+        upload = get_upload(user, upload_id)
+        if not upload.complete:
+            raise incomplete_upload_error(upload)
+        submission_id = request.POST.get('submission')
+        if not submission_id:
+            return JsonResponse(_upload_state(upload))
+        submission = get_object_or_404(Submission, id=submission_id, student=user)
+        if submission.approved:
+            return JsonResponse({'success': False, 'error': 'You cannot edit an approved submission.'}, status=400)
+        attach_upload(upload, submission)
+    except UploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse({'success': True, 'id': str(upload_id), 'submission': submission.id, 'file': submission.file.url})
+
+
+async def _submissions_api_response(request, user, submissions):
+    """
+    A page of ``submissions`` as JSON, or a bare 304 when the client's ETag still
+    matches; the rows are only read for a 200.
+    """
+    submissions = filter_submissions(submissions, request.GET)
+    watermark = await sync_to_async(submissions_watermark)(submissions)
+    etag = submissions_etag(user, request.GET, watermark)
+    # No Last-Modified: at whole seconds it would call an edit in the same second as the
+    # client's last fetch unchanged, and deletions don't move it at all
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        page = await CursorPage(
+            submissions.only(*SUBMISSION_FIELDS), request.GET.get('cursor'), page_size=API_PAGE_SIZE,
+        ).aload()
+        response = JsonResponse(submissions_payload(page, watermark))
+        response.headers['ETag'] = etag
+    # Cached copies must be revalidated, which is what makes polling cheap
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# JSON API: the student's own submissions, with the student dashboard's filters
+@login_required
+async def api_student_submissions(request):
+    user = await request.auser()
+    if user.user_type != 'student':
+        return JsonResponse({'success': False, 'error': 'Only students have their own submissions.'}, status=403)
+    return await _submissions_api_response(request, user, Submission.objects.filter(student=user))
+
+
+# JSON API: submissions of the supervisor's students, with the supervisor views' filters
+@login_required
+async def api_supervisor_submissions(request):
+    user = await request.auser()
+    if user.user_type != 'supervisor':
+        return JsonResponse({'success': False, 'error': 'Only supervisors have supervised submissions.'}, status=403)
+    return await _submissions_api_response(request, user, supervised_submissions(user))
+
+
+def _archived_page(session, manifest, student_ids, offset):
+    rows = list(islice(read_archive(session, student_ids, manifest), offset, offset + API_PAGE_SIZE + 1))
+    return rows[:API_PAGE_SIZE], (offset + API_PAGE_SIZE if len(rows) > API_PAGE_SIZE else None)
+
+
+# JSON API: the user's logs from an archived SIWES session; supervisors see their students', or one ?student=<matric number>'s
+@login_required
+async def api_archived_submissions(request, session):
+    user = await request.auser()
+    session = await SiwesSession.objects.filter(slug=session, archived_at__isnull=False).afirst()
+    if session is None:
+        raise Http404('No such archived session')
+    if user.user_type == 'student':
+        student_ids = [user.pk]
+    else:
+        students = CustomUser.objects.filter(supervisor=user, user_type='student')
+        if request.GET.get('student'):
+            students = students.filter(matric_number=request.GET['student'])
+        student_ids = [pk async for pk in students.values_list('pk', flat=True)]
+    try:
+        manifest = await sync_to_async(load_manifest)(session)
+    except ArchiveError as exc:
+        return JsonResponse({'success': False, 'error': str(exc)}, status=503)
+    etag = archived_submissions_etag(user, request.GET, manifest)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            offset = max(0, int(request.GET.get('offset', 0)))
+        except ValueError:
+            offset = 0
+        rows, next_offset = await sync_to_async(_archived_page)(session, manifest, student_ids, offset)
+        response = JsonResponse(archived_submissions_payload(session, rows, archived_count(manifest, student_ids), next_offset))
+        response.headers['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=ARCHIVE_MAX_AGE)
+    return response
+
+
+def _render_supervisor_cards(supervisor, submission_ids):
+    """
+    The dashboard cards of those of ``submission_ids`` that are (still) ``supervisor``'s,
+    by id, read with one query.
+    """
+    try:
+        submissions = (
+            supervised_submissions(supervisor).select_related('student').only(*SUPERVISOR_CARD_FIELDS)
+            .filter(pk__in=submission_ids)
+        )
+        return {
+            submission.pk: {
+                'matric_number': submission.matric_number,
+                'approved': submission.approved,
+                'html': render_to_string('SIWES/partials/supervisor_card.html', {
+                    'submission': submission, 'fragment_timeout': FRAGMENT_TIMEOUT,
+                }),
+            }
+            for submission in submissions
+        }
+    finally:
+        _release_connection()
+
+
+def _release_connection():
+    # A stream can stay open for hours; it shouldn't hold a connection between events
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def _pending_events(first, queue):
+    """``first`` and whatever else is already queued, with runs of one event type merged."""
+    merged = [first]
+    while not queue.empty():
+        event = queue.get_nowait()
+        if event['type'] == 'reset':
+            return [RESET]
+        if event['type'] == merged[-1]['type']:
+            merged[-1] = {**merged[-1], 'submissions': merged[-1]['submissions'] + event['submissions']}
+        else:
+            merged.append(event)
+    return merged
+
+
+async def _supervisor_event_stream(supervisor):
+    async with broker.subscribe(supervisor.pk) as queue:
+        # Sent once subscribed, so anything committed after the client sees it is delivered
+        yield f'retry: {EVENTS_RETRY_MS}\n\n'
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            for event in [RESET] if first['type'] == 'reset' else _pending_events(first, queue):
+                if event['type'] == 'reset':
+                    yield 'event: reset\ndata: {}\n\n'
+                    return
+                submissions = [{'id': pk, 'student': student_id} for pk, student_id in event['submissions']]
+                # Cards for a few submissions; a bulk change is sent as ids for the page to patch or refetch
+                if event['type'] != 'deleted' and len(submissions) <= EVENTS_CARD_LIMIT:
+                    cards = await sync_to_async(_render_supervisor_cards)(supervisor, [entry['id'] for entry in submissions])
+                    submissions = [{**entry, **cards[entry['id']]} for entry in submissions if entry['id'] in cards]
+                    if not submissions:
+                        continue
+                yield f"event: {event['type']}\ndata: {json.dumps({'submissions': submissions})}\n\n"
+
+
+# Server-Sent Events: changes to the supervisor's students' submissions, as they commit
+@login_required
+async def supervisor_events(request):
+    user = await request.auser()
+    if user.user_type != 'supervisor':
+        return JsonResponse({'success': False, 'error': 'Only supervisors can follow submission events.'}, status=403)
+    await sync_to_async(_release_connection)()
+    get_backend().start()
+    response = StreamingHttpResponse(_supervisor_event_stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tells nginx-style proxies to pass events through as they come
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Inline thumbnail of a submission's attachment, made on first request and then served from storage
+@login_required
+def attachment_preview(request, submission_id):
+    user = request.user
+    if user.user_type == 'supervisor':
+        submissions = supervised_submissions(user)
+    else:
+        submissions = Submission.objects.filter(student=user)
+    submission = get_object_or_404(submissions.only('id', 'file'), id=submission_id)
+    name = attachment_preview_name(submission.file) if submission.file else None
+    if name is None:
+        raise Http404('No preview for this attachment.')
+    response = redirect(submission.file.storage.url(name))
+    # A preview never changes under its name, so browsers needn't ask again for a while
+    patch_cache_control(response, private=True, max_age=PREVIEW_MAX_AGE)
+    return response
+
+
 # Student can edit their submission if not approved
 @login_required
 def edit_submission(request, submission_id):
@@ -124,7 +437,15 @@ def edit_submission(request, submission_id):
     if request.method == 'POST':
         form = SubmissionEditForm(request.POST, request.FILES, instance=submission)
         if form.is_valid():
-            form.save()
+            upload_id = request.POST.get('upload_id')
+            if upload_id:
+                try:
+                    attach_upload(get_upload(user, upload_id), form.save(commit=False))
+                except UploadError as exc:
+                    messages.error(request, str(exc))
+                    return redirect('edit_submission', submission_id=submission.id)
+            else:
+                form.save()
             messages.success(request, 'Submission updated successfully!')
             return redirect('student_dashboard')
     else:
@@ -141,18 +462,16 @@ def landing(request):
 def login(request):
     if request.method == 'POST':
         form = CustomAuthenticationForm(request, data=request.POST)
+        # is_valid() authenticates; use its user rather than running the hasher a second time
         if form.is_valid():
-            user = authenticate(request, username=form.cleaned_data['username'], password=form.cleaned_data['password'])
-            if user is not None:
-                auth_login(request, user)
-                if user.user_type == 'student':
-                    return redirect('student_dashboard')
-                elif user.user_type == 'supervisor':
-                    return redirect('supervisor_dashboard')
-                else:
-                    return redirect('landing')
+            user = form.get_user()
+            auth_login(request, user)
+            if user.user_type == 'student':
+                return redirect('student_dashboard')
+            elif user.user_type == 'supervisor':
+                return redirect('supervisor_dashboard')
             else:
-                messages.error(request, 'Invalid email or password.')
+                return redirect('landing')
         else:
             messages.error(request, 'Invalid login details.')
     else:
@@ -161,8 +480,8 @@ def login(request):
 
 # Student dashboard view
 @login_required
-def student_dashboard(request):
-    user = request.user
+async def student_dashboard(request):
+    user = await request.auser()
     # Only allow students
     if not hasattr(user, 'user_type') or user.user_type != 'student':
         messages.error(request, 'You do not have permission to access the student dashboard.')
@@ -171,71 +490,49 @@ def student_dashboard(request):
         overview = request.POST.get('overview', '').strip()
         text = request.POST.get('text')
         file = request.FILES.get('file')
+        upload_id = request.POST.get('upload_id')
         if text:
-            Submission.objects.create(
+            submission = Submission(
                 student=user,
                 matric_number=user.matric_number,
                 overview=overview,
                 text=text,
                 file=file
             )
+            if upload_id:
+                # Attachment sent beforehand through the chunked upload endpoints
+                try:
+                    upload = await sync_to_async(get_upload)(user, upload_id)
+                    await sync_to_async(attach_upload)(upload, submission)
+                except UploadError as exc:
+                    messages.error(request, str(exc))
+                    return redirect('student_dashboard')
+            else:
+                await submission.asave()
             messages.success(request, 'Submission successful!')
             return redirect('student_dashboard')
         else:
             messages.error(request, 'Please enter your daily log.')
     # Date filter
-    from datetime import datetime, timedelta
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     submissions = Submission.objects.filter(student=user)
-    if start_date:
-        try:
-            start = datetime.strptime(start_date, '%Y-%m-%d')
-            submissions = submissions.filter(date__gte=start)
-        except Exception:
-            pass
-    if end_date:
-        try:
-            end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            submissions = submissions.filter(date__lt=end)
-        except Exception:
-            pass
-    submissions = submissions.order_by('-date')
+    submissions = filter_submissions(submissions, {'start_date': start_date, 'end_date': end_date}).order_by('-date')
+    supervisor = None
+    if user.supervisor_id:
+        supervisor = await CustomUser.objects.filter(pk=user.supervisor_id).afirst()
     # PDF export for student
     if request.GET.get('export') == 'pdf':
-        from django.template.loader import render_to_string
-        from django.http import HttpResponse
-        
-        # Build submissions data with file URLs
-        submissions_with_urls = []
-        for s in submissions:
-            file_url = request.build_absolute_uri(s.file.url) if s.file else None
-            submissions_with_urls.append({
-                'date': s.date,
-                'overview': s.overview,
-                'text': s.text,
-                'file_url': file_url,
-                'approved': s.approved,
-                'remark': s.remark,
-            })
-        
-        supervisor = user.supervisor if hasattr(user, 'supervisor') else None
-        
-        # Render your existing template to string
-        html_string = render_to_string('SIWES/student_logs_pdf.html', {
-            'submissions': submissions_with_urls, 
-            'user': user, 
-            'supervisor': supervisor
-        })
-        
-        # Return as HTML with PDF-like styling (your template already has print-friendly CSS)
-        response = HttpResponse(html_string, content_type='text/html')
-        response['Content-Disposition'] = 'inline; filename="my_logs.html"'
-        return response
-    supervisor = user.supervisor if hasattr(user, 'supervisor') else None
-    return render(request, 'SIWES/student_dashboard.html', {
+        header_lines = [f'{user.get_full_name() or user.email} ({user.matric_number})']
+        if supervisor:
+            header_lines.append(f"Supervisor: {supervisor.title + ' ' if supervisor.title else ''}{supervisor.get_full_name() or supervisor.email}")
+        return await sync_to_async(logbook_pdf_response)(request, user, submissions, 'Student Log', header_lines, 'my_logs.pdf')
+    # The list is left lazy: it is only read if its cached fragment has gone stale
+    return await arender(request, 'SIWES/student_dashboard.html', {
         'user': user,
         'submissions': submissions,
+        'submissions_version': await sync_to_async(submission_versions)([user.pk]),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
         'supervisor': supervisor,
         'start_date': start_date,
         'end_date': end_date,
@@ -243,10 +540,8 @@ def student_dashboard(request):
 
 # Supervisor dashboard view
 @login_required
-def supervisor_dashboard(request):
-    import csv
-    # from django.http import HttpResponse
-    user = request.user
+async def supervisor_dashboard(request):
+    user = await request.auser()
     # Only allow supervisors
     if not hasattr(user, 'user_type') or user.user_type != 'supervisor':
         messages.error(request, 'You do not have permission to access the supervisor dashboard.')
@@ -255,16 +550,17 @@ def supervisor_dashboard(request):
     if request.method == 'POST' and 'approve_id' in request.POST:
         approve_id = request.POST.get('approve_id')
         remark = request.POST.get('remark', '').strip()
-        try:
-            submission = Submission.objects.get(id=approve_id)
-            submission.approved = True
-            submission.reviewed_by = user
-            if remark:
-                submission.remark = remark
-            submission.save()
-            messages.success(request, f'Submission {submission.id} approved!')
-        except Submission.DoesNotExist:
+        submission = supervised_submissions(user).filter(pk=approve_id) if approve_id and approve_id.isdigit() else None
+        if submission is None or not await submission.aexists():
             messages.error(request, 'Submission not found.')
+        elif await sync_to_async(bulk_approve)(user, submission, remark):
+            messages.success(request, f'Submission {approve_id} approved!')
+        elif remark:
+            # Already approved, by an earlier click or another tab: the remark still applies
+            await sync_to_async(bulk_remark)(submission, remark)
+            messages.success(request, f'Submission {approve_id} was already approved; its remark was updated.')
+        else:
+            messages.info(request, f'Submission {approve_id} was already approved.')
         return redirect('supervisor_dashboard')
 
     students = []
@@ -273,43 +569,31 @@ def supervisor_dashboard(request):
     status_filter = request.GET.get('status')
     selected_student = request.GET.get('student')
     if user.user_type == 'supervisor':
-        students = CustomUser.objects.filter(user_type='student', supervisor=user)
-        submissions = Submission.objects.filter(student__in=students)
-        if selected_student:
-            submissions = submissions.filter(matric_number=selected_student)
-        if filter_date:
-            from datetime import datetime, timedelta
-            start = datetime.strptime(filter_date, '%Y-%m-%d')
-            end = start + timedelta(days=1)
-            submissions = submissions.filter(date__gte=start, date__lt=end)
-        if status_filter == 'approved':
-            submissions = submissions.filter(approved=True)
-        elif status_filter == 'pending':
-            submissions = submissions.filter(approved=False)
-        submissions = submissions.order_by('-date')
+        students = [
+            student async for student in
+            CustomUser.objects.filter(user_type='student', supervisor=user)
+            .select_related('stats').only(*STUDENT_LIST_FIELDS, *STUDENT_STATS_FIELDS)
+        ]
+        submissions = supervised_submissions(user)
+        submissions = submissions.select_related('student').only(*SUPERVISOR_CARD_FIELDS)
+        submissions = filter_submissions(submissions, {
+            'student': selected_student, 'filter_date': filter_date, 'status': status_filter,
+        }).order_by('-date')
 
     # CSV export
     if request.GET.get('export') == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="submissions.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Matric Number', 'Student Name', 'Date', 'Text', 'File', 'Approved', 'Remark'])
-        for s in submissions:
-            writer.writerow([
-                s.matric_number,
-                s.student.get_full_name() if s.student.get_full_name() else s.student.email,
-                s.date,
-                s.text,
-                s.file.url if s.file else '',
-                'Yes' if s.approved else 'No',
-                s.remark or ''
-            ])
-        return response
-
-    return render(request, 'SIWES/supervisor_dashboard.html', {
+        return astream_submissions_csv(submissions)
+
+    # The page is left lazy: it is only read if its cached fragment has gone stale
+    page = CursorPage(submissions, request.GET.get('cursor'), params=request.GET)
+    pending_reviews = sum(student.stats.pending for student in students if hasattr(student, 'stats'))
+    return await arender(request, 'SIWES/supervisor_dashboard.html', {
         'user': user,
         'students': students,
-        'submissions': submissions,
+        'pending_reviews': pending_reviews,
+        'submissions': page,
+        'submissions_version': await sync_to_async(submission_versions)([student.id for student in students]),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
         'filter_date': filter_date,
         'status_filter': status_filter,
         'selected_student': selected_student,
@@ -329,4 +613,54 @@ def register(request):
     return render(request, 'SIWES/register.html', {'form': form})
 
 def rules(request):
-    return render(request, 'SIWES/rules.html')
\ No newline at end of file
+    return render(request, 'SIWES/rules.html')
+
+
+# Round-trips timed by the database health probe
+HEALTH_PROBES = 3
+
+
+# Database health probe: connection and query round-trip latency, plus pool usage on PostgreSQL
+@never_cache
+def health_db(request):
+    import statistics
+    import time
+    from django.db import DatabaseError, connection
+    try:
+        started = time.perf_counter()
+        connection.ensure_connection()
+        connect_ms = (time.perf_counter() - started) * 1000
+        timings = []
+        with connection.cursor() as cursor:
+            for _ in range(HEALTH_PROBES):
+                started = time.perf_counter()
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+                timings.append((time.perf_counter() - started) * 1000)
+    except DatabaseError as exc:
+        return JsonResponse({'status': 'error', 'vendor': connection.vendor, 'error': exc.__class__.__name__}, status=503)
+    data = {
+        'status': 'ok',
+        'vendor': connection.vendor,
+        # Includes the pool checkout or a fresh handshake when there was no open connection
+        'connect_ms': round(connect_ms, 2),
+        'round_trip_ms': {
+            'min': round(min(timings), 2),
+            'median': round(statistics.median(timings), 2),
+            'max': round(max(timings), 2),
+        },
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+    }
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        stats = pool.get_stats()
+        size, idle = stats.get('pool_size', 0), stats.get('pool_available', 0)
+        data['pool'] = {
+            'min_size': pool.min_size,
+            'max_size': pool.max_size,
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'waiting': stats.get('requests_waiting', 0),
+        }
+    return JsonResponse(data)
@@ -2,6 +2,9 @@
 echo "Starting build process..."
 pip install -r requirements.txt
 
+echo "Building WebP image variants..."
+python manage.py build_image_variants
+
 echo "Running collectstatic..."
 python manage.py collectstatic --noinput
 